@@ -1,3 +1,5 @@
+import time
+STARTUP_T0 = time.perf_counter() # [功能 46] 量 time-to-first-playable-frame 的起點 (含 import)
 import pygame
 import sys
 # 匯入你農出的 5 大模組 (假設檔案都在同一個目錄)
@@ -6,88 +8,229 @@ from world_gen import GameXWorldGen
 from visuals import GameXVisuals
 from interaction import GameXInteraction
 from system import GameXSystem
+from chunk_data import GameXWorldMap
+from streaming import GameXChunkStreamer
+from region import open_store, close_store
+from mesher import GameXMesher
+from renderer import GameXRenderer
+from compositor import GameXCompositor
+from profiler import GameXProfiler
+from entities import GameXEntities
+from fluids import GameXFluids
+from lighting import GameXLighting
+from worldedit import GameXWorldEdit
+from governor import GameXQualityGovernor
+from visuals import BLOCK_COLORS, DEFAULT_BLOCK_COLOR
+from physics import TICK_DT
+
+# 啟動畫面期間，每一幀給區塊併入與建網格的時間 (毫秒)
+PRELOAD_BUDGET_MS = 12.0
 
 class GameXMain:
-    def __init__(self):
+    def __init__(self, seed=888, world_dir="world", workers=True, splash=True):
         # 1. 系統初始化 (System Initialization)
+        self.startup = {"import_ms": (time.perf_counter() - STARTUP_T0) * 1000}
         self.w, self.h = 1024, 768
         self.screen = pygame.display.set_mode((self.w, self.h), pygame.RESIZABLE)
         
         # 2. 實例化所有模組 [功能 41-50]
         self.system = GameXSystem(self)
         self.physics = GameXPhysics()
-        self.world_gen = GameXWorldGen(seed=888)
+        self.world_gen = GameXWorldGen(seed=seed)
+        if workers:
+            self.world_gen.start_workers() # [功能 44] 背景區塊生成
+        self.world_dir = world_dir
+        if world_dir is not None:
+            self.world_gen.attach_store(open_store(world_dir)) # [功能 40] region 存檔
+            self.world_gen.store.log = self.system.log_error  # [功能 49] 寫檔失敗記進日誌
         self.visuals = GameXVisuals(self.w, self.h)
         self.interaction = GameXInteraction()
         
         # 3. 遊戲狀態
         self.clock = pygame.time.Clock()
         self.is_running = True
-        self.world_map = {}
+        self.world_map = GameXWorldMap()
+        # [功能 11] 視距內的區塊串流
+        self.streamer = GameXChunkStreamer(self.world_gen, self.world_map)
+        # [功能 41-43] 區塊網格：載入/卸載/修改時標記重建
+        self.mesher = GameXMesher(self.world_map)
+        self.streamer.on_load.append(self.mesher.on_chunk_loaded)
+        self.streamer.on_unload.append(self.mesher.on_chunk_unloaded)
+        self.renderer = GameXRenderer(self.visuals, self.mesher)
+        self.entities = GameXEntities() # [功能 27, 38] 碎片與掉落物
+        self.fluids = GameXFluids(self.world_map) # [功能 20] 水的流動 (只算被擾動的格子)
+        self.fluids.on_change.append(self.mesher.mark_block_dirty)
+        # [功能 21] 天空光/方塊光：區塊併入時補上邊界，方塊改變時增量更新
+        self.lighting = GameXLighting(self.world_map)
+        self.streamer.on_load.append(self.lighting.on_chunk_loaded)
+        self.lighting.on_change.append(self.mesher.mark_dirty)
+        self.fluids.on_change.append(self.lighting.block_changed)
+        # [功能 45] /fill、/replace、/clone、/undo：每個區塊整塊寫入，只標記一次重建
+        self.world_edit = GameXWorldEdit(self.world_map)
+        self.world_edit.on_change.append(self.mesher.mark_dirty)
+        self.world_edit.lighting, self.world_edit.fluids = self.lighting, self.fluids
+        # [功能 50] Mod 事件：挖掘/放置、區塊生成、物理 tick、指令
+        self.interaction.events = self.physics.events = self.world_gen.events = self.system.events
+        # [功能 48] 各階段計時 (預設關閉；F3 或 /perf on 開啟)
+        self.profiler = GameXProfiler()
+        if self.world_gen.workers is not None:
+            self.world_gen.workers.profiler = self.profiler
+        self.compositor = GameXCompositor(self.renderer, self.interaction, self.profiler)
+        self.compositor.overlays.append(self.profiler)
+        # [功能 48] 依每幀工作時間調整視距、霧距、碎片數與每幀預算 (狀態顯示在 F3 覆蓋層與日誌)
+        self.governor = GameXQualityGovernor(self.streamer, self.mesher, self.visuals, self.entities,
+                                             budget_ms=1000 / self.system.fps_cap)
+        self.governor.log = self.system.log_error
+        self.profiler.status.append(self.governor.status)
         
-        # 4. 啟動 Logo [功能 46]
-        self.system.show_splash_screen(self.screen, "logo.png")
+        self.splash = splash
+        self.first_frame = True
+        self.startup["init_ms"] = (time.perf_counter() - STARTUP_T0) * 1000 - self.startup["import_ms"]
 
-    def run(self):
+    def start(self):
+        # 4. 啟動 Logo [功能 46]，同時在背景準備出生點周圍的區塊
+        self.preload(self.splash)
         # 初始化地圖
         cx, cz = 0, 0
-        self.world_map = self.world_gen.request_chunk(cx, cz)
-        
-        while self.is_running:
-            # A. 事件處理 (Event Handling)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.is_running = False
-                
-                # 滑鼠點擊 [功能 31, 32]
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    res = self.interaction.raycast(
-                        self.physics.pos, self.physics.look_x, 
-                        self.physics.look_y, self.world_map, event.button
-                    )
-                    # 如果挖掘，產生粒子 [功能 27]
-                    if res and res["action"] == "break":
-                        # 這裡可以呼叫 visuals 產生粒子
-                        pass
-
-                # 快速鍵切換 [功能 35]
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_F2: # 截圖 [功能 47]
-                        self.system.take_screenshot(self.screen)
-                    if event.key in [pygame.K_1, pygame.K_2, pygame.K_3]:
-                        self.interaction.change_selection(event.key - pygame.K_1)
-
-            # B. 物理與控制更新 [功能 1-10]
-            keys = pygame.key.get_pressed()
-            rel_x, rel_y = pygame.mouse.get_rel()
-            self.physics.apply_mouse_movement(rel_x, rel_y)
-            self.physics.update(keys, self.world_map)
-            
-            # C. 動態地圖更新 [功能 11, 44]
-            new_cx = int(self.physics.pos[0] // 8)
-            new_cz = int(self.physics.pos[2] // 8)
-            # 背景讀取新區塊
-            self.system.load_data_async(self.world_gen.request_chunk, new_cx, new_cz)
+        self.streamer.load_now(cx, cz) # 出生點區塊 (通常已預先載入)
+        self.physics.spawn(self.world_map, cx, cz)
 
-            # D. 渲染管線 (Rendering Pipeline) [功能 21-30]
-            sky_data = self.world_gen.get_environment_state(pygame.time.get_ticks() / 1000)
-            self.screen.fill(sky_data["sky_color"])
-            
-            # 這裡執行方塊渲染 (結合 Visuals 的光影與霧氣)
-            # 1. 取得玩家周邊方塊
-            # 2. 進行面剔除 [功能 42, 43]
-            # 3. 繪製方塊與外框 [功能 26]
-            
-            # E. 介面渲染 [功能 36, 37]
-            self.interaction.draw_crosshair(self.screen)
-            self.interaction.draw_hud(self.screen)
+    def preload(self, splash=True):
+        """
+        出生點視距內的區塊交給工作行程生成 (或從存檔讀取)，併入世界並建好網格。
+        有啟動畫面時跟淡入動畫同時進行：最短顯示時間到了且出生區域就緒就進入遊戲。
+        """
+        start = time.perf_counter()
+        spawn = (0.0, 0.0, 0.0)
+        budgets = self.streamer.budget_ms, self.mesher.budget_ms
+        self.streamer.budget_ms = self.mesher.budget_ms = PRELOAD_BUDGET_MS
+
+        def step():
+            self.streamer.update(spawn)
+            if not self.streamer.ready: # 沒有完成的區塊可以併入：主執行緒幫忙生成
+                self.streamer.generate_pending(PRELOAD_BUDGET_MS / 2)
+            self.mesher.update(self.streamer.center)
+            ready = not self.streamer.pending_count and not self.mesher.dirty
+            if ready and "spawn_ready_ms" not in self.startup:
+                self.startup["spawn_ready_ms"] = (time.perf_counter() - STARTUP_T0) * 1000
+            return ready
 
-            pygame.display.flip()
+        if splash:
+            self.system.show_splash_screen(self.screen, "logo.png", ready=step)
+        else:
+            while not step():
+                time.sleep(0.001) # 等工作行程
+        self.streamer.budget_ms, self.mesher.budget_ms = budgets
+        self.startup["preload_ms"] = (time.perf_counter() - start) * 1000
+        self.startup["preloaded_chunks"] = len(self.world_map.chunks)
+
+    def run(self):
+        self.start()
+        while self.is_running:
+            self.frame(pygame.event.get(), pygame.key.get_pressed(), pygame.mouse.get_rel(),
+                       self.clock.get_time() / 1000, pygame.time.get_ticks() / 1000)
             self.clock.tick(self.system.fps_cap)
 
+        self.shutdown()
         pygame.quit()
         sys.exit()
 
+    def shutdown(self):
+        self.world_gen.stop_workers()
+        self.system.events.flush()   # 延後的 mod 事件可能還會改方塊，存檔之前先跑完
+        if self.world_dir is not None:
+            self.world_gen.save_dirty(background=False)
+            close_store(self.world_dir)
+
+    def frame(self, events, keys, mouse_rel, dt, game_time):
+        """
+        跑一幀 (A-E)。輸入 (事件、按鍵、滑鼠位移) 與時間都由呼叫端提供，
+        基準測試可以在 dummy 視訊驅動下重播固定的輸入。
+        """
+        prof = self.profiler
+        frame_start = time.perf_counter()
+        self.system.events.begin_frame()
+        with prof.span("frame"):
+            with prof.span("events"):
+                # A. 事件處理 (Event Handling)
+                for event in events:
+                    if event.type == pygame.QUIT:
+                        self.is_running = False
+                    # 視窗縮放或重新露出：下一幀所有圖層重畫
+                    if event.type in (pygame.VIDEORESIZE, pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                        self.compositor.invalidate()
+            
+                    # 滑鼠點擊 [功能 31, 32]
+                    if event.type == pygame.MOUSEBUTTONDOWN:
+                        res = self.interaction.raycast(
+                            self.physics.render_pos, self.physics.look_x, 
+                            self.physics.look_y, self.world_map, event.button
+                        )
+                        if res:
+                            self.mesher.mark_block_dirty(res["pos"])
+                            self.fluids.block_changed(res["pos"])
+                            self.lighting.block_changed(res["pos"])
+                        # 如果挖掘，產生粒子 [功能 27] 與掉落物 [功能 38]
+                        if res and res["action"] == "break":
+                            color = BLOCK_COLORS.get(res["type"], DEFAULT_BLOCK_COLOR)
+                            self.entities.spawn_block_particles(res["pos"], color)
+                            self.entities.spawn_item(res["pos"], res["type"])
+
+                    # 快速鍵切換 [功能 35]
+                    if event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_F2: # 截圖 [功能 47]
+                            self.system.take_screenshot(self.screen)
+                        if event.key == pygame.K_F5: # 背景增量存檔 [功能 40]
+                            self.world_gen.save_dirty(background=True)
+                        if event.key == pygame.K_F3: # 效能分析覆蓋層 [功能 48]
+                            self.profiler.toggle_overlay()
+                        if pygame.K_1 <= event.key <= pygame.K_9:
+                            self.interaction.change_selection(event.key - pygame.K_1)
+
+            with prof.span("physics"):
+                # B. 物理與控制更新 [功能 1-10]
+                rel_x, rel_y = mouse_rel
+                self.physics.apply_mouse_movement(rel_x, rel_y)
+                # 固定時間步長：依上一幀實際經過的時間補算物理 tick
+                ticks = self.physics.update(keys, self.world_map, dt)
+                damage = self.physics.take_damage() # [功能 6] 摔落傷害
+                if damage:
+                    self.interaction.hp = max(0, self.interaction.hp - damage)
+            with prof.span("entities"):
+                for _ in range(ticks): # 實體跟著物理 tick 批次更新
+                    self.entities.update(TICK_DT, self.world_map)
+                for name in self.entities.pickup(self.physics.center):
+                    if name not in self.interaction.inventory:
+                        self.interaction.inventory.append(name)
+            with prof.span("fluids"):
+                for _ in range(ticks):
+                    self.fluids.tick()
+
+            with prof.span("streaming"):
+                # C. 動態地圖更新 [功能 11, 44]
+                # 維持玩家周圍一圈區塊，完成的區塊依每幀預算併入世界
+                self.streamer.update(self.physics.pos)
+            with prof.span("mesher"):
+                # 只重建被標記為髒的區塊網格 (有時間預算)
+                self.mesher.update(self.streamer.center)
+
+            # D. 渲染管線 (Rendering Pipeline) [功能 21-30]
+            sky_data = self.world_gen.get_environment_state(game_time)
+            # 天空/星空圖層 [功能 28] 上投影快取的區塊網格 (已完成面剔除 [功能 42, 43])，
+            # E. 再疊上介面 [功能 36, 37]；每層都有快取，畫面沒變就不重畫也不送出
+            rects = self.compositor.compose(self.screen, self.physics.render_pos, self.physics.look_x,
+                                            self.physics.look_y, sky_data, self.entities)
+            self.compositor.present(self.screen, rects)
+        self.governor.update((time.perf_counter() - frame_start) * 1000)
+
+        if self.first_frame:
+            # [功能 46] 從程式啟動到第一個可以操作的畫面
+            self.first_frame = False
+            self.startup["ttfpf_ms"] = (time.perf_counter() - STARTUP_T0) * 1000
+            self.system.log_error(f"Time to first playable frame: {self.startup['ttfpf_ms']:.0f} ms "
+                                  f"(spawn area {self.startup['preloaded_chunks']} chunks in "
+                                  f"{self.startup['preload_ms']:.0f} ms)")
+
 if __name__ == "__main__":
     game = GameXMain()
     game.run()
\ No newline at end of file
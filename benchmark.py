@@ -0,0 +1,665 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from chunk_data import CHUNK_SIZE, CHUNK_MIN_Y, CHUNK_HEIGHT, GameXWorldMap
+from world_gen import GameXWorldGen
+
+# --- 基準測試常數 ---
+BENCH_SEED = 888
+BENCH_PROBES = 200000
+BENCH_FRAMES = 120
+BENCH_SCREEN = (1024, 768)
+BENCH_REPEAT = 3            # 微基準取最好的一次，降低雜訊
+BENCH_RAYS = 20000
+BENCH_TICKS = 6000
+BENCH_OUTPUT = "bench_results.json"
+BENCH_THRESHOLD = 0.20      # 比基準差超過 20% 算退步
+
+# 重播給 GameXMain 的固定輸入：(幀數, 按住的鍵, 每幀滑鼠位移, 這段第一幀送出的滑鼠按鍵)
+BENCH_SCRIPT = (
+    (60, (), (0, 0), None),                     # 站著不動
+    (90, ("K_w",), (4, 0), None),               # 邊走邊轉
+    (30, ("K_w", "K_SPACE"), (0, 0), None),     # 跳著前進
+    (30, (), (0, 40), 1),                       # 低頭挖一格
+    (30, (), (0, 0), 3),                        # 放回去
+    (90, ("K_w", "K_LSHIFT"), (-3, -40), None), # 抬頭衝刺
+)
+
+# 迴歸檢查的指標 ("項目.欄位")；_per_s / fps 越高越好，其餘 (_ms) 越低越好
+BENCH_GATED = (
+    "worldgen.chunks_per_s", "worldgen.batch_chunks_per_s",
+    "raycast.rays_per_s", "raycast.batch_rays_per_s",
+    "physics.ticks_per_s",
+    "save_load.save_ms", "save_load.load_ms",
+    "frame.frame_ms_avg", "frame.frame_ms_p95",
+    "render.frame_ms_avg",
+    "startup.spawn_ready_ms", "startup.ttfpf_ms",
+    "worldedit.fill_ms",
+    "server.tick_ms_p50", "server.down_kbps_per_client",
+)
+
+def _measure_alloc(build):
+    """回傳 build() 的結果與它持有的記憶體 (bytes)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+def _lookup_rate(store, probes):
+    """回傳每秒 `in` + 取值的查詢次數"""
+    start = time.perf_counter()
+    hits = 0
+    for key in probes:
+        if key in store:
+            store[key]
+            hits += 1
+    return len(probes) / (time.perf_counter() - start), hits
+
+# --- [功能 11] 區塊儲存：dict-of-tuples vs 陣列 + 調色盤 ---
+def bench_chunk_storage(radius=4, seed=BENCH_SEED, probes=BENCH_PROBES):
+    """比較舊的 dict 佈局與 GameXChunk 的記憶體與查詢吞吐量"""
+    gen = GameXWorldGen(seed=seed)
+    chunks = [gen.request_chunk(cx, cz)
+              for cx in range(-radius, radius) for cz in range(-radius, radius)]
+
+    legacy, legacy_bytes = _measure_alloc(lambda: {k: v for c in chunks for k, v in c.items()})
+
+    def build_map():
+        world_map = GameXWorldMap()
+        for c in chunks:
+            world_map.add_chunk(c.copy())
+        return world_map
+    world_map, chunk_bytes = _measure_alloc(build_map)
+
+    rng = random.Random(seed)
+    span = radius * CHUNK_SIZE
+    keys = [(rng.randrange(-span, span), rng.randrange(CHUNK_MIN_Y, CHUNK_MIN_Y + CHUNK_HEIGHT),
+             rng.randrange(-span, span)) for _ in range(probes)]
+
+    dict_rate, dict_hits = _lookup_rate(legacy, keys)
+    chunk_rate, chunk_hits = _lookup_rate(world_map, keys)
+    assert dict_hits == chunk_hits, "storage layouts disagree"
+
+    # 批次查詢：同一批座標一次丟給 contains_many
+    xs, ys, zs = zip(*keys)
+    start = time.perf_counter()
+    batch_hits = int(world_map.contains_many(xs, ys, zs).sum())
+    batch_rate = len(keys) / (time.perf_counter() - start)
+    assert batch_hits == dict_hits, "batch lookup disagrees"
+
+    return {
+        "chunks": len(chunks),
+        "blocks": len(legacy),
+        "dict_bytes": legacy_bytes,
+        "chunk_bytes": chunk_bytes,
+        "dict_bytes_per_block": legacy_bytes / max(1, len(legacy)),
+        "chunk_bytes_per_block": chunk_bytes / max(1, len(legacy)),
+        "dict_lookups_per_s": dict_rate,
+        "chunk_lookups_per_s": chunk_rate,
+        "chunk_batch_lookups_per_s": batch_rate,
+    }
+
+# --- [功能 42, 43] 渲染：README 的「渲染距離 8 Chunks 穩定 120 FPS」 ---
+def _bench_scene(radius, seed):
+    """載入半徑 radius 的區塊並建好全部網格，回傳 (生成器, 世界, 網格器, 建網格毫秒)"""
+    from mesher import GameXMesher
+
+    gen = GameXWorldGen(seed=seed)
+    world_map = GameXWorldMap()
+    mesher = GameXMesher(world_map, budget_ms=math.inf)
+    for cx in range(-radius, radius + 1):
+        for cz in range(-radius, radius + 1):
+            if cx * cx + cz * cz <= radius * radius:
+                chunk = gen.request_chunk(cx, cz)
+                world_map.add_chunk(chunk)
+                mesher.on_chunk_loaded(chunk)
+    start = time.perf_counter()
+    mesher.update()
+    return gen, world_map, mesher, (time.perf_counter() - start) * 1000
+
+def bench_render(radius=8, seed=BENCH_SEED, frames=BENCH_FRAMES, screen_size=BENCH_SCREEN):
+    """載入半徑 radius 的區塊並建好網格，原地轉一圈量每幀的渲染時間 (不需要視窗)"""
+    import os
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from renderer import GameXRenderer
+    from visuals import GameXVisuals
+
+    pygame.init()
+    screen = pygame.Surface(screen_size)
+    gen, world_map, mesher, mesh_ms = _bench_scene(radius, seed)
+    renderer = GameXRenderer(GameXVisuals(*screen_size), mesher)
+    eye = (0.3, gen.get_noise_height(0, 0) + 2.6, 0.2)
+
+    times, fragments = [], 0
+    for i in range(frames):
+        start = time.perf_counter()
+        renderer.render(screen, eye, -15, i * 360 / frames, (135, 206, 235))
+        times.append(time.perf_counter() - start)
+        fragments += renderer.fragments
+    times.sort()
+    avg = sum(times) / len(times)
+    return {
+        "chunks": len(world_map.chunks),
+        "scene_quads": renderer.scene_quads,
+        "mesh_ms": mesh_ms,
+        "frame_ms_avg": avg * 1000,
+        "frame_ms_p95": times[int(len(times) * 0.95)] * 1000,
+        "fps": 1 / avg,
+        "fragments_avg": fragments / frames,
+    }
+
+# --- [功能 28, 36, 37] 圖層合成：靜止畫面 vs 每幀全部重畫 ---
+def bench_compositor(radius=4, seed=BENCH_SEED, frames=BENCH_FRAMES, screen_size=BENCH_SCREEN):
+    """夜晚、鏡頭不動時每幀合成 + 送出畫面的時間；對照組每幀都強制整個重畫"""
+    import os
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from renderer import GameXRenderer
+    from visuals import GameXVisuals
+    from interaction import GameXInteraction
+    from compositor import GameXCompositor
+
+    pygame.init()
+    screen = pygame.display.set_mode(screen_size)
+    gen, world_map, mesher, _ = _bench_scene(radius, seed)
+    interaction = GameXInteraction()
+    compositor = GameXCompositor(GameXRenderer(GameXVisuals(*screen_size), mesher), interaction)
+    env = gen.get_environment_state(52) # 晚上：天空加星星
+    eye = (0.3, gen.get_noise_height(0, 0) + 2.6, 0.2)
+
+    def run(force, hud_every=0):
+        start = time.perf_counter()
+        for i in range(frames):
+            if force:
+                compositor.invalidate()
+            if hud_every and i % hud_every == 0:
+                interaction.change_selection(i // hud_every % len(interaction.inventory))
+            compositor.present(screen, compositor.compose(screen, eye, -15, 30, env))
+        return (time.perf_counter() - start) / frames * 1000
+
+    redraw_ms = run(force=True)
+    static_ms = run(force=False)
+    hud_ms = run(force=False, hud_every=10)
+    return {"redraw_ms": redraw_ms, "static_ms": static_ms, "hud_change_ms": hud_ms,
+            "sky_renders": compositor.stats()["sky_renders"]}
+
+# --- [功能 27, 38] 實體：dict 粒子逐一更新 vs GameXEntities 批次更新 ---
+def bench_entities(counts=(1000, 5000, 20000), seed=BENCH_SEED, ticks=60):
+    """每種數量各跑 ticks 個 tick，回傳每 tick 的更新時間 (毫秒)"""
+    from entities import GameXEntities, KIND_PARTICLE
+    from physics import TICK_DT
+
+    gen = GameXWorldGen(seed=seed)
+    world_map = GameXWorldMap()
+    for cx in range(-2, 2):
+        for cz in range(-2, 2):
+            world_map.add_chunk(gen.request_chunk(cx, cz))
+
+    rng = random.Random(seed)
+    results = []
+    for n in counts:
+        # 舊做法：每個粒子一個 dict，Python 迴圈更新
+        legacy = [{"pos": [rng.uniform(-16, 16), 20.0, rng.uniform(-16, 16)],
+                   "vel": [rng.uniform(-0.1, 0.1), rng.uniform(0.1, 0.2), rng.uniform(-0.1, 0.1)],
+                   "life": 1e9} for _ in range(n)]
+        start = time.perf_counter()
+        for _ in range(ticks):
+            for p in legacy:
+                p["vel"][1] -= 0.012
+                for i in range(3):
+                    p["pos"][i] += p["vel"][i]
+                ground = world_map.get((round(p["pos"][0]), round(p["pos"][1]), round(p["pos"][2])))
+                if ground is not None:
+                    p["vel"][1] = 0
+                p["life"] -= TICK_DT
+        legacy_ms = (time.perf_counter() - start) / ticks * 1000
+
+        entities = GameXEntities(seed=seed)
+        pos = [(rng.uniform(-16, 16), 20.0, rng.uniform(-16, 16)) for _ in range(n)]
+        entities.spawn(KIND_PARTICLE, pos, (0.0, 6.0, 0.0), 1e9, (255, 255, 255))
+        start = time.perf_counter()
+        for _ in range(ticks):
+            entities.update(TICK_DT, world_map)
+        soa_ms = (time.perf_counter() - start) / ticks * 1000
+        results.append({"entities": n, "dict_ms": legacy_ms, "soa_ms": soa_ms})
+    return results
+
+# --- [功能 20] 流體模擬 ---
+def bench_fluids(radius=6, seed=BENCH_SEED, ticks=BENCH_TICKS):
+    """
+    靜止的海洋每 tick 的成本 (應該趨近於零)，以及挖開一條通往海邊的水道後，
+    水流到穩定為止的流動次數與每次流動的時間。
+    """
+    from fluids import GameXFluids, WATER, SIDES
+
+    gen, world_map = _bench_world(radius, seed)
+    fluids = GameXFluids(world_map)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        fluids.tick()
+    calm_us = (time.perf_counter() - start) / ticks * 1e6
+
+    # 找一格緊鄰海水的岸邊，往內陸挖一條 3 格深、8 格長的水道
+    shore = next((x, 0, z) for (x, y, z), name in world_map.items()
+                 if y == 0 and name != WATER and world_map.get((x, 1, z)) is None
+                 and any(world_map.get((x + dx, 0, z + dz)) == WATER for dx, dz in SIDES))
+    dx, dz = next((dx, dz) for dx, dz in SIDES if world_map.get((shore[0] - dx, 0, shore[2] - dz)) == WATER)
+    for i in range(8):
+        for y in (-2, -1, 0):
+            pos = (shore[0] + dx * i, y, shore[2] + dz * i)
+            if pos in world_map:
+                del world_map[pos]
+            fluids.block_changed(pos)
+    steps, step_ms = 0, 0.0
+    while fluids.active:
+        steps += 1
+        fluids.step()
+        step_ms += fluids.last_step_ms
+    return {
+        "calm_tick_us": calm_us,
+        "flood_steps": steps,
+        "flood_updates": fluids.updates,
+        "flood_step_ms_avg": step_ms / max(1, steps),
+    }
+
+# --- [功能 21] 光照 ---
+def bench_lighting(radius=4, seed=BENCH_SEED, edits=300):
+    """
+    生成時批次計算區塊內部光照、區塊併入時補邊界的時間，
+    以及在地表附近隨機放置/挖掘方塊 (含火把) 時每次增量更新的時間。
+    """
+    from lighting import GameXLighting, light_chunks
+
+    gen = GameXWorldGen(seed=seed)
+    chunks = gen.generate_chunks([(cx, cz) for cx in range(-radius, radius) for cz in range(-radius, radius)])
+    start = time.perf_counter()
+    for i in range(0, len(chunks), 4): # 工作行程一次生成 4 個
+        light_chunks(chunks[i:i + 4])
+    light_ms = (time.perf_counter() - start) * 1000 / len(chunks)
+
+    world_map = GameXWorldMap()
+    lighting = GameXLighting(world_map)
+    start = time.perf_counter()
+    for chunk in chunks:
+        world_map.add_chunk(chunk)
+        lighting.on_chunk_loaded(chunk)
+    stitch_ms = (time.perf_counter() - start) * 1000 / len(chunks)
+
+    rng = random.Random(seed)
+    span = radius * CHUNK_SIZE - 1
+    total = 0.0
+    for _ in range(edits):
+        x, z = rng.randrange(-span, span), rng.randrange(-span, span)
+        pos = (x, int(world_map.heights_many([x], [z])[0]) + rng.randrange(-4, 2), z)
+        if pos in world_map and rng.random() < 0.5:
+            del world_map[pos]
+        else:
+            world_map[pos] = rng.choice(("stone", "torch"))
+        start = time.perf_counter()
+        lighting.block_changed(pos)
+        total += time.perf_counter() - start
+    return {
+        "chunk_light_ms": light_ms,
+        "chunk_stitch_ms": stitch_ms,
+        "edit_ms_avg": total * 1000 / edits,
+    }
+
+# --- [功能 45] 大範圍編輯 ---
+def bench_worldedit(seed=BENCH_SEED, size=125):
+    """
+    /fill 一個 size x 64 x size (約一百萬格) 的範圍再 /undo，含光照重算；
+    另外記錄網格器收到的重建標記數 (每個區塊應該只有一次)。
+    """
+    from lighting import GameXLighting
+    from worldedit import GameXWorldEdit
+
+    half = size // 2
+    radius = half // CHUNK_SIZE + 4
+    gen, world_map = _bench_world(radius, seed)
+    lighting = GameXLighting(world_map)
+    edit = GameXWorldEdit(world_map)
+    edit.lighting = lighting
+    marks = []
+    edit.on_change.append(lambda cx, cz: marks.append((cx, cz)))
+
+    lo, hi = (-half, CHUNK_MIN_Y, -half), (size - half - 1, CHUNK_MIN_Y + CHUNK_HEIGHT - 1, size - half - 1)
+    changed = edit.fill(lo, hi, "stone")
+    result = {
+        "blocks": changed,
+        "fill_ms": edit.last_ms,
+        "remesh_marks": len(marks),
+        "remesh_chunks": len(set(marks)),
+        "journal_kb": edit.stats()["undo_bytes"] / 1024,
+    }
+    edit.undo()
+    result["undo_ms"] = edit.last_ms
+    return result
+
+# --- [功能 12-19] 地形生成吞吐量 ---
+def bench_worldgen(radius=6, seed=BENCH_SEED, batch=4):
+    """逐一生成 vs 一次生成 batch 個 (工作行程的做法)，回傳每秒區塊數"""
+    keys = [(cx, cz) for cx in range(-radius, radius) for cz in range(-radius, radius)]
+
+    def single():
+        gen = GameXWorldGen(seed=seed)
+        for key in keys:
+            gen.generate_chunk(*key)
+
+    def batched():
+        gen = GameXWorldGen(seed=seed)
+        for i in range(0, len(keys), batch):
+            gen.generate_chunks(keys[i:i + batch])
+
+    return {
+        "chunks": len(keys),
+        "chunks_per_s": _best_rate(single, len(keys)),
+        "batch_chunks_per_s": _best_rate(batched, len(keys)),
+    }
+
+# --- [功能 31, 32] 射線 ---
+def bench_raycast(radius=4, seed=BENCH_SEED, rays=BENCH_RAYS):
+    """從地表上方往隨機方向射 rays 條射線：cast_ray 逐條 vs cast_rays 批次"""
+    from interaction import GameXInteraction, REACH
+
+    gen, world_map = _bench_world(radius, seed)
+    interaction = GameXInteraction()
+    rng = np.random.default_rng(seed)
+    span = radius * CHUNK_SIZE
+    xz = rng.uniform(-span / 2, span / 2, (rays, 2))
+    ground = gen.get_height_map(np.rint(xz[:, 0]).astype(int), np.rint(xz[:, 1]).astype(int))
+    origins = np.column_stack([xz[:, 0], ground + 1.6, xz[:, 1]])
+    dirs = rng.normal(size=(rays, 3))
+    dirs /= np.linalg.norm(dirs, axis=1, keepdims=True)
+
+    hits = []
+    def single():
+        hits[:] = [interaction.cast_ray(o, d, world_map, REACH) is not None
+                   for o, d in zip(origins.tolist(), dirs.tolist())]
+
+    batch = {}
+    def batched():
+        batch.update(interaction.cast_rays(origins, dirs, world_map, REACH))
+
+    single_rate = _best_rate(single, rays)
+    batch_rate = _best_rate(batched, rays)
+    assert sum(hits) == int(batch["hit"].sum()), "cast_ray and cast_rays disagree"
+    return {"rays": rays, "hits": sum(hits), "rays_per_s": single_rate, "batch_rays_per_s": batch_rate}
+
+# --- [功能 1-10] 物理 ---
+def bench_physics(seed=BENCH_SEED, ticks=BENCH_TICKS, script=BENCH_SCRIPT):
+    """重播 script 的按鍵與滑鼠，直接跑 ticks 個固定步長的物理 tick"""
+    from physics import GameXPhysics, TICK_DT
+
+    _, world_map = _bench_world(2, seed)
+    steps = [(_ScriptedKeys(held), rel) for frames, held, rel, _ in script for _ in range(frames)]
+
+    def run():
+        physics = GameXPhysics()
+        physics.spawn(world_map, 0, 0)
+        for i in range(ticks):
+            keys, (dx, dy) = steps[i % len(steps)]
+            physics.apply_mouse_movement(dx, dy)
+            physics.update(keys, world_map, TICK_DT)
+        run.pos = [round(v, 4) for v in physics.pos]
+
+    rate = _best_rate(run, ticks)
+    return {"ticks": ticks, "ticks_per_s": rate, "final_pos": run.pos}
+
+# --- [功能 40] 存檔與讀取 ---
+def bench_save_load(radius=4, seed=BENCH_SEED):
+    """save_world 寫入 (全部區塊都是未存檔) 與 load_world 從磁碟讀回的時間"""
+    from interaction import GameXInteraction
+    from region import close_store
+
+    _, world_map = _bench_world(radius, seed)
+    interaction = GameXInteraction()
+    with tempfile.TemporaryDirectory() as world_dir:
+        for chunk in world_map.chunks.values():
+            chunk.unsaved = True
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()): # save_world 會印出存檔訊息
+            saved = interaction.save_world(world_map, world_dir)
+        close_store(world_dir)
+        save_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        loaded = interaction.load_world(world_dir)
+        load_ms = (time.perf_counter() - start) * 1000
+        close_store(world_dir)
+        size = sum(os.path.getsize(os.path.join(world_dir, name)) for name in os.listdir(world_dir))
+    assert len(loaded.chunks) == saved, "load_world lost chunks"
+    return {"chunks": saved, "save_ms": save_ms, "load_ms": load_ms, "disk_bytes": size}
+
+# --- 端到端：GameXMain 重播固定輸入 ---
+def bench_frame(seed=BENCH_SEED, script=BENCH_SCRIPT, dt=1 / 60):
+    """
+    在 dummy 視訊驅動下建立 GameXMain (不開工作行程、存檔在暫存目錄)，
+    先把視距內的區塊與網格載完，再重播 script 量每幀的時間。
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from Main import GameXMain
+
+    pygame.init()
+    with tempfile.TemporaryDirectory() as world_dir:
+        game = GameXMain(seed=seed, world_dir=world_dir, workers=False, splash=False)
+        game.governor.enabled = False # 固定預設畫質，結果才能跟基準比較
+        game.start()
+        idle = _ScriptedKeys(())
+        warmup = 0
+        while (game.streamer.pending_count or game.mesher.dirty) and warmup < 1000:
+            game.frame([], idle, (0, 0), dt, 0.0)
+            warmup += 1
+
+        times, t = [], 0.0
+        for frames, held, rel, button in script:
+            keys = _ScriptedKeys(held)
+            for i in range(frames):
+                events = []
+                if button and i == 0:
+                    events.append(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=button, pos=(0, 0)))
+                start = time.perf_counter()
+                game.frame(events, keys, rel, dt, t)
+                times.append(time.perf_counter() - start)
+                t += dt
+        pos = [round(v, 4) for v in game.physics.pos]
+        game.shutdown()
+
+    avg = sum(times) / len(times)
+    times.sort()
+    return {
+        "frames": len(times),
+        "warmup_frames": warmup,
+        "frame_ms_avg": avg * 1000,
+        "frame_ms_p95": times[int(len(times) * 0.95)] * 1000,
+        "frame_ms_max": times[-1] * 1000,
+        "fps": 1 / avg,
+        "final_pos": pos,
+    }
+
+# --- [功能 46] 啟動：time-to-first-playable-frame ---
+_STARTUP_SCRIPT = """
+import os, sys, json, tempfile, collections
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+import Main
+with tempfile.TemporaryDirectory() as world_dir:
+    game = Main.GameXMain(seed=int(sys.argv[1]), world_dir=world_dir, workers=sys.argv[2] == "1")
+    game.start()
+    game.frame([], collections.defaultdict(bool), (0, 0), 0.0, 0.0)
+    game.shutdown()
+print(json.dumps(game.startup))
+"""
+
+def bench_startup(seed=BENCH_SEED, workers=True):
+    """
+    在新的行程裡從 import 開始量到第一個可操作的畫面 (含啟動畫面的最短顯示時間)，
+    spawn_ready_ms 是出生點視距內區塊全部載入並建好網格的時間。
+    """
+    import subprocess
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT, str(seed), "1" if workers else "0"],
+                         cwd=here, capture_output=True, text=True, check=True).stdout
+    startup = json.loads(out.strip().splitlines()[-1])
+    return {key: startup[key] for key in
+            ("import_ms", "init_ms", "spawn_ready_ms", "ttfpf_ms", "preloaded_chunks")}
+
+# --- [功能 50] Mod 事件分派成本 ---
+def bench_mods(events=200000):
+    """沒有監聽者與一個空監聽者時，每次 emit 的成本 (奈秒)"""
+    from mods import GameXEventBus, PhysicsTickEvent
+
+    bus = GameXEventBus()
+    def emit_all():
+        for _ in range(events):
+            bus.emit(PhysicsTickEvent, None, None)
+
+    idle_ns = 1e9 / _best_rate(emit_all, events)
+    bus.register_mod("bench").on(PhysicsTickEvent, lambda event: None)
+    bus.mods["bench"].budget_ms = math.inf
+    listener_ns = 1e9 / _best_rate(emit_all, events)
+    return {"events": events, "emit_no_listener_ns": idle_ns, "emit_one_listener_ns": listener_ns}
+
+# --- 權威伺服器負載測試 ---
+def bench_server(clients=16, seconds=5.0, seed=BENCH_SEED):
+    """
+    同一個行程裡跑伺服器與 clients 個走來走去的模擬客戶端，
+    回傳 tick 時間、區塊送出延遲、每個客戶端的頻寬與預測校正次數。
+    """
+    from server import run_load_test
+
+    result = run_load_test(clients, seconds, seed)
+    result.update({f"{kind}_bytes": n for kind, n in result.pop("bytes_sent").items()})
+    return result
+
+# --- 共用工具 ---
+class _ScriptedKeys:
+    """代替 pygame.key.get_pressed()：只有 held 裡的鍵 (pygame 常數名稱) 是按下的"""
+    def __init__(self, held):
+        import pygame
+        self.held = {getattr(pygame, name) for name in held}
+
+    def __getitem__(self, key):
+        return key in self.held
+
+def _bench_world(radius, seed):
+    gen = GameXWorldGen(seed=seed)
+    world_map = GameXWorldMap()
+    for cx in range(-radius, radius):
+        for cz in range(-radius, radius):
+            world_map.add_chunk(gen.request_chunk(cx, cz))
+    return gen, world_map
+
+def _best_rate(fn, count, repeat=BENCH_REPEAT):
+    """fn 跑 repeat 次，用最快的一次算每秒處理量"""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+# --- 基準套件、JSON 輸出與迴歸檢查 ---
+BENCH_SUITE = {
+    "worldgen": bench_worldgen,
+    "raycast": bench_raycast,
+    "physics": bench_physics,
+    "save_load": bench_save_load,
+    "frame": bench_frame,
+    "startup": bench_startup,
+    "render": bench_render,
+    "compositor": bench_compositor,
+    "chunk_storage": bench_chunk_storage,
+    "mods": bench_mods,
+    "fluids": bench_fluids,
+    "lighting": bench_lighting,
+    "worldedit": bench_worldedit,
+    "server": bench_server,
+    "entities": lambda: {f"{key}_{res['entities']}": res[key]
+                         for res in bench_entities() for key in ("dict_ms", "soa_ms")},
+}
+
+def run_suite(names=None, log=print):
+    """跑指定的基準 (預設全部)，回傳可直接寫成 JSON 的 dict"""
+    results = {}
+    for name in names or BENCH_SUITE:
+        start = time.perf_counter()
+        results[name] = BENCH_SUITE[name]()
+        log(f"{name:14s} ({time.perf_counter() - start:5.1f} s)")
+        for key, value in results[name].items():
+            log(f"    {key:28s} {value:12.3f}" if isinstance(value, float) else f"    {key:28s} {value}")
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": BENCH_SEED,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+def compare(current, baseline, threshold=BENCH_THRESHOLD):
+    """
+    比較兩次結果中 BENCH_GATED 的指標，回傳 [(指標, 基準值, 這次, 變化比例, 是否退步)]。
+    變化比例 > 0 代表變差；兩邊都有的指標才比較。
+    """
+    rows = []
+    for metric in BENCH_GATED:
+        name, key = metric.split(".")
+        old = baseline["results"].get(name, {}).get(key)
+        new = current["results"].get(name, {}).get(key)
+        if old is None or new is None or old <= 0:
+            continue
+        higher_is_better = key.endswith("_per_s") or key == "fps"
+        change = (old - new) / old if higher_is_better else (new - old) / old
+        rows.append((metric, old, new, change, change > threshold))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Game X 無頭基準測試 (SDL dummy 視訊驅動、固定種子)")
+    parser.add_argument("--only", help="逗號分隔的項目: " + ",".join(BENCH_SUITE))
+    parser.add_argument("--out", default=BENCH_OUTPUT, help="結果 JSON 路徑")
+    parser.add_argument("--baseline", help="跟這份 JSON 比較，退步超過門檻時回傳 1")
+    parser.add_argument("--threshold", type=float, default=BENCH_THRESHOLD, help="允許的退步比例")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else None
+    unknown = [n for n in names or () if n not in BENCH_SUITE]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+    current = run_suite(names)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = 0
+    for metric, old, new, change, failed in compare(current, baseline, args.threshold):
+        regressions += failed
+        print(f"{'REGRESSION' if failed else 'ok':10s} {metric:30s} {old:12.3f} -> {new:12.3f} ({change:+.1%})")
+    if regressions:
+        print(f"{regressions} metric(s) regressed more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+from collections import OrderedDict
+from chunk_data import GameXChunk
+
+# --- 區塊快取常數 (Cache Constants) ---
+CACHE_BUDGET = 64 * 1024 * 1024   # 熱區塊的記憶體預算 (bytes)
+
+class GameXChunkCache:
+    """
+    [功能 11] 有記憶體預算的區塊快取。
+    最近用過的區塊留在熱層 (LRU)；超出預算時，被玩家改過的區塊壓縮進休眠層，
+    沒改過的直接丟掉，之後再由種子重新生成。改過的區塊永遠不會遺失。
+    """
+    def __init__(self, budget_bytes=CACHE_BUDGET):
+        self.budget_bytes = budget_bytes
+        self.hot = OrderedDict()   # (cx, cz) -> GameXChunk，越後面越新
+        self.hot_sizes = {}        # (cx, cz) -> 進入熱層時的大小
+        self.dormant = {}          # (cx, cz) -> 壓縮後的 bytes (只有改過的區塊)
+        self.pinned = set()        # 正在世界裡使用的區塊不可淘汰
+        self.spill = None          # 選用：fn(chunk) 把未存檔的改動寫到磁碟，取代休眠層
+
+        self.hot_bytes = 0
+        self.dormant_bytes = 0
+
+        # 統計數據
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compressions = 0
+        self.drops = 0
+        self.revivals = 0
+        self.spills = 0
+
+    # --- dict 相容介面 ---
+    def get(self, key, default=None):
+        chunk = self.hot.get(key)
+        if chunk is not None:
+            self.hot.move_to_end(key)
+            self.hits += 1
+            return chunk
+        data = self.dormant.pop(key, None)
+        if data is not None:
+            # 休眠層命中：解壓縮回熱層
+            self.dormant_bytes -= len(data)
+            chunk = GameXChunk.from_bytes(data)
+            self.revivals += 1
+            self.hits += 1
+            self._insert(key, chunk)
+            return chunk
+        self.misses += 1
+        return default
+
+    def __getitem__(self, key):
+        chunk = self.get(key)
+        if chunk is None:
+            raise KeyError(key)
+        return chunk
+
+    def __setitem__(self, key, chunk):
+        self.pop(key)
+        self._insert(key, chunk)
+
+    def __contains__(self, key):
+        return key in self.hot or key in self.dormant
+
+    def __len__(self):
+        return len(self.hot) + len(self.dormant)
+
+    def pop(self, key, default=None):
+        chunk = self.hot.pop(key, None)
+        if chunk is not None:
+            self.hot_bytes -= self.hot_sizes.pop(key)
+            return chunk
+        data = self.dormant.pop(key, None)
+        if data is not None:
+            self.dormant_bytes -= len(data)
+            return GameXChunk.from_bytes(data)
+        return default
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.pop(key)
+
+    def clear(self):
+        self.hot.clear()
+        self.hot_sizes.clear()
+        self.dormant.clear()
+        self.hot_bytes = self.dormant_bytes = 0
+
+    def values(self):
+        """熱層中的區塊 (不會解壓縮休眠層)"""
+        return self.hot.values()
+
+    # --- 釘選：世界中使用中的區塊 ---
+    def pin(self, key):
+        self.pinned.add(key)
+
+    def unpin(self, key):
+        self.pinned.discard(key)
+        self._evict()
+
+    # --- LRU 淘汰 ---
+    def _insert(self, key, chunk):
+        size = chunk.nbytes
+        self.hot[key] = chunk
+        self.hot_sizes[key] = size
+        self.hot_bytes += size
+        self._evict()
+
+    def _evict(self):
+        """從最久沒用的區塊開始淘汰，直到熱層回到預算內"""
+        skipped = 0
+        while self.hot_bytes > self.budget_bytes and skipped < len(self.hot):
+            key, chunk = next(iter(self.hot.items()))
+            if key in self.pinned:
+                self.hot.move_to_end(key) # 釘選中的區塊移到尾端，不擋住後面的候選
+                skipped += 1
+                continue
+            del self.hot[key]
+            self.hot_bytes -= self.hot_sizes.pop(key)
+            self.evictions += 1
+            if chunk.modified and self.spill is not None:
+                # 有存檔時：未存的改動寫到磁碟，已存的直接丟 (之後從存檔讀回)
+                if chunk.unsaved:
+                    self.spill(chunk)
+                    self.spills += 1
+                else:
+                    self.drops += 1
+            elif chunk.modified:
+                data = chunk.to_bytes()
+                self.dormant[key] = data
+                self.dormant_bytes += len(data)
+                self.compressions += 1
+            else:
+                self.drops += 1 # 可由種子重新生成
+
+    # --- 監控數據 ---
+    @property
+    def resident_bytes(self):
+        return self.hot_bytes + self.dormant_bytes
+
+    def stats(self):
+        return {
+            "hot": len(self.hot),
+            "dormant": len(self.dormant),
+            "pinned": len(self.pinned),
+            "resident_bytes": self.resident_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "compressions": self.compressions,
+            "drops": self.drops,
+            "revivals": self.revivals,
+            "spills": self.spills,
+        }
@@ -0,0 +1,335 @@
+from array import array
+import struct
+import zlib
+import numpy as np
+
+# --- 區塊儲存常數 (Chunk Storage Constants) ---
+CHUNK_SIZE = 8          # [功能 11] 區塊水平邊長
+CHUNK_HEIGHT = 64       # 區塊垂直格數
+CHUNK_MIN_Y = -32       # 區塊最低的 y 座標
+CHUNK_SHAPE = (CHUNK_SIZE, CHUNK_HEIGHT, CHUNK_SIZE)
+CHUNK_VOLUME = CHUNK_SIZE * CHUNK_HEIGHT * CHUNK_SIZE
+
+AIR = 0                 # 調色盤 0 號永遠是空氣
+
+# 序列化標頭：魔數、cx、cz、每格位元組數、是否改動過、調色盤長度
+CHUNK_MAGIC = b"GXC2"         # GXC2 起方塊陣列後面接著光照陣列
+CHUNK_MAGIC_V1 = b"GXC1"      # 舊格式 (沒有光照，讀入後重算)
+CHUNK_HEADER = struct.Struct("<4siiBBI")
+
+class GameXChunk:
+    """
+    以固定大小的 uint8/uint16 陣列儲存一個區塊，並用調色盤把 ID 對應到方塊名稱。
+    對外保留 dict 介面 (in, [], del, items())，鍵仍然是世界座標 (x, y, z)。
+    """
+    def __init__(self, cx, cz):
+        self.cx, self.cz = cx, cz
+        self.ox, self.oz = cx * CHUNK_SIZE, cz * CHUNK_SIZE
+
+        # 調色盤：ID -> 方塊名稱 (0 = 空氣)
+        self.palette = [None]
+        self.palette_ids = {}
+
+        # _raw 給單格存取 (bytearray 索引很快)，blocks 是同一塊記憶體的 numpy 視圖給批次運算
+        self._raw = bytearray(CHUNK_VOLUME)
+        self.blocks = np.frombuffer(self._raw, dtype=np.uint8).reshape(CHUNK_SHAPE)
+        self.count = 0          # 非空氣方塊數
+        self.modified = False   # 是否被玩家改動過 (生成後的編輯)
+        self.unsaved = False    # 上次存檔後是否又被改動
+        self.version = 0        # 每次方塊改動 +1，快取的衍生資料 (高度圖等) 據此失效
+        self._heights = None    # (version, 高度圖)
+
+        # [功能 21] 光照：每格一個 byte，高 nibble 天空光、低 nibble 方塊光 (0..15)
+        self._light = bytearray(CHUNK_VOLUME)
+        self.light = np.frombuffer(self._light, dtype=np.uint8).reshape(CHUNK_SHAPE)
+        self.lit = False        # 光照是否已經算過 (lighting.light_chunks)
+
+    # --- 調色盤 API ---
+    def block_id(self, name):
+        """取得方塊名稱的 ID，沒有的話加入調色盤"""
+        bid = self.palette_ids.get(name)
+        if bid is None:
+            bid = len(self.palette)
+            if bid > 0xFFFF:
+                raise ValueError("Chunk palette overflow")
+            if bid == 0x100:
+                self._promote()
+            self.palette.append(name)
+            self.palette_ids[name] = bid
+        return bid
+
+    def _promote(self):
+        """調色盤超過 256 種時，把陣列升級成 uint16"""
+        raw = array("H", bytes(2 * CHUNK_VOLUME))
+        blocks = np.frombuffer(raw, dtype=np.uint16).reshape(CHUNK_SHAPE)
+        blocks[...] = self.blocks
+        self._raw, self.blocks = raw, blocks
+
+    # --- 座標轉換 ---
+    def _index(self, key):
+        x, y, z = key
+        lx, ly, lz = x - self.ox, y - CHUNK_MIN_Y, z - self.oz
+        if 0 <= lx < CHUNK_SIZE and 0 <= ly < CHUNK_HEIGHT and 0 <= lz < CHUNK_SIZE:
+            return (lx * CHUNK_HEIGHT + ly) * CHUNK_SIZE + lz
+        return -1
+
+    def in_bounds(self, key):
+        return self._index(key) >= 0
+
+    def recount(self):
+        """批次寫入 blocks 陣列後重新計算方塊數"""
+        self.count = int(np.count_nonzero(self.blocks))
+
+    def write_region(self, region, ids):
+        """
+        [功能 45] 批次寫入：region 是三個 slice (區塊內座標)，ids 是方塊 ID (純量或同形狀陣列)。
+        整塊只更新一次方塊數、版本與存檔標記，回傳改變的格數。
+        """
+        view = self.blocks[region]
+        changed = int(np.count_nonzero(view != ids))
+        if changed:
+            view[...] = ids
+            self.recount()
+            self.modified = self.unsaved = True
+            self.version += 1
+        return changed
+
+    # --- dict 相容介面 ---
+    def __contains__(self, key):
+        i = self._index(key)
+        return i >= 0 and self._raw[i] != AIR
+
+    def __getitem__(self, key):
+        i = self._index(key)
+        if i < 0 or self._raw[i] == AIR:
+            raise KeyError(key)
+        return self.palette[self._raw[i]]
+
+    def get(self, key, default=None):
+        i = self._index(key)
+        if i < 0 or self._raw[i] == AIR:
+            return default
+        return self.palette[self._raw[i]]
+
+    def __setitem__(self, key, name):
+        i = self._index(key)
+        if i < 0:
+            raise KeyError(key)
+        if self._raw[i] == AIR:
+            self.count += 1
+        self._raw[i] = self.block_id(name)
+        self.modified = self.unsaved = True
+        self.version += 1
+
+    def __delitem__(self, key):
+        i = self._index(key)
+        if i < 0 or self._raw[i] == AIR:
+            raise KeyError(key)
+        self._raw[i] = AIR
+        self.count -= 1
+        self.modified = self.unsaved = True
+        self.version += 1
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self.keys()
+
+    def keys(self):
+        for key, _ in self.items():
+            yield key
+
+    def values(self):
+        for _, name in self.items():
+            yield name
+
+    def items(self):
+        lx, ly, lz = np.nonzero(self.blocks)
+        ids = self.blocks[lx, ly, lz].tolist()
+        palette = self.palette
+        for x, y, z, bid in zip((lx + self.ox).tolist(), (ly + CHUNK_MIN_Y).tolist(),
+                                (lz + self.oz).tolist(), ids):
+            yield (x, y, z), palette[bid]
+
+    # --- 記憶體統計 ---
+    @property
+    def nbytes(self):
+        """區塊陣列、光照與調色盤的大約記憶體用量 (bytes)"""
+        return self.blocks.nbytes + self.light.nbytes + sum(len(n) for n in self.palette[1:]) + 16 * len(self.palette)
+
+    # --- 緊湊序列化 (給工作行程、存檔與網路傳輸使用) ---
+    def to_bytes(self, level=1):
+        """把區塊打包成 bytes：標頭 + 調色盤 + zlib 壓縮的方塊陣列 (+ 光照陣列)"""
+        names = "\0".join(self.palette[1:]).encode("utf-8")
+        body = zlib.compress(self.blocks.tobytes() + (bytes(self._light) if self.lit else b""), level)
+        header = CHUNK_HEADER.pack(CHUNK_MAGIC, self.cx, self.cz, self.blocks.itemsize,
+                                   int(self.modified), len(names))
+        return header + names + body
+
+    def heightmap(self):
+        """每一柱最高的非空氣方塊 y 座標 (S, S)，空柱為 CHUNK_MIN_Y - 1；方塊沒改動就沿用快取"""
+        if self._heights is None or self._heights[0] != self.version:
+            solid = self.blocks != AIR
+            top = CHUNK_HEIGHT - 1 - np.argmax(solid[:, ::-1, :], axis=1)
+            top = np.where(solid.any(axis=1), top + CHUNK_MIN_Y, CHUNK_MIN_Y - 1)
+            self._heights = (self.version, top.astype(np.int16))
+        return self._heights[1]
+
+    @classmethod
+    def from_bytes(cls, data):
+        """to_bytes() 的反向操作"""
+        magic, cx, cz, itemsize, modified, names_len = CHUNK_HEADER.unpack_from(data)
+        if magic not in (CHUNK_MAGIC, CHUNK_MAGIC_V1):
+            raise ValueError("Not a Game X chunk buffer")
+        chunk = cls(cx, cz)
+        offset = CHUNK_HEADER.size
+        names = bytes(data[offset:offset + names_len]).decode("utf-8")
+        for name in names.split("\0") if names else []:
+            chunk.block_id(name)
+        if itemsize == 2 and chunk.blocks.dtype == np.uint8:
+            chunk._promote()
+        raw = zlib.decompress(data[offset + names_len:])
+        size = chunk.blocks.nbytes
+        chunk.blocks[...] = np.frombuffer(raw, dtype=chunk.blocks.dtype, count=CHUNK_VOLUME).reshape(CHUNK_SHAPE)
+        if len(raw) > size: # 有光照資料 (沒有的話等併入世界時重算)
+            chunk._light[:] = raw[size:]
+            chunk.lit = True
+        chunk.recount()
+        chunk.modified = bool(modified)
+        return chunk
+
+    def copy(self):
+        clone = GameXChunk(self.cx, self.cz)
+        if self.blocks.dtype != np.uint8:
+            clone._promote()
+        clone.blocks[...] = self.blocks
+        clone.palette = list(self.palette)
+        clone.palette_ids = dict(self.palette_ids)
+        clone.count = self.count
+        clone._light[:] = self._light
+        clone.lit = self.lit
+        clone.modified = self.modified
+        clone.unsaved = self.unsaved
+        return clone
+
+
+class GameXWorldMap:
+    """
+    把多個 GameXChunk 組合成一張世界地圖，仍以 (x, y, z) 為鍵存取方塊。
+    物理、射線與渲染都透過這個介面查詢，不需要知道區塊邊界。
+    """
+    def __init__(self):
+        self.chunks = {}
+
+    # --- 區塊管理 ---
+    def add_chunk(self, chunk):
+        self.chunks[(chunk.cx, chunk.cz)] = chunk
+
+    def remove_chunk(self, cx, cz):
+        return self.chunks.pop((cx, cz), None)
+
+    def get_chunk(self, cx, cz):
+        return self.chunks.get((cx, cz))
+
+    def has_chunk(self, cx, cz):
+        return (cx, cz) in self.chunks
+
+    def chunk_at(self, x, z):
+        return self.chunks.get((x // CHUNK_SIZE, z // CHUNK_SIZE))
+
+    # --- dict 相容介面 ---
+    def __contains__(self, key):
+        x, y, z = key
+        chunk = self.chunks.get((x // CHUNK_SIZE, z // CHUNK_SIZE))
+        if chunk is None:
+            return False
+        ly = y - CHUNK_MIN_Y
+        if not 0 <= ly < CHUNK_HEIGHT:
+            return False
+        return chunk._raw[((x - chunk.ox) * CHUNK_HEIGHT + ly) * CHUNK_SIZE + z - chunk.oz] != AIR
+
+    def __getitem__(self, key):
+        chunk = self.chunk_at(key[0], key[2])
+        if chunk is None:
+            raise KeyError(key)
+        return chunk[key]
+
+    def get(self, key, default=None):
+        chunk = self.chunk_at(key[0], key[2])
+        if chunk is None:
+            return default
+        return chunk.get(key, default)
+
+    def __setitem__(self, key, name):
+        chunk = self.chunk_at(key[0], key[2])
+        if chunk is None:
+            raise KeyError(key)
+        chunk[key] = name
+
+    def __delitem__(self, key):
+        chunk = self.chunk_at(key[0], key[2])
+        if chunk is None:
+            raise KeyError(key)
+        del chunk[key]
+
+    # --- 批次查詢 API ---
+    def _group_by_chunk(self, xs, zs):
+        """把座標依所在區塊分組，逐一產生 (已載入的區塊, 該組的索引)"""
+        # 把 (cx, cz) 壓成單一整數鍵後排序分組
+        packed = ((xs // CHUNK_SIZE) << 32) + (zs // CHUNK_SIZE + (1 << 31))
+        order = np.argsort(packed, kind="stable")
+        packed = packed[order]
+        starts = np.flatnonzero(np.r_[True, packed[1:] != packed[:-1]])
+        ends = np.r_[starts[1:], len(packed)]
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            key = int(packed[start])
+            chunk = self.chunks.get((key >> 32, (key & 0xFFFFFFFF) - (1 << 31)))
+            if chunk is not None:
+                yield chunk, order[start:end]
+
+    def contains_many(self, xs, ys, zs, ignore=()):
+        """
+        一次查詢多個座標是否有方塊，回傳 bool 陣列 (依區塊分組做陣列索引)。
+        ignore 裡的方塊名稱當成空的 (例如射線穿過的水)。
+        """
+        xs, ys, zs = (np.asarray(a, dtype=np.int64) for a in (xs, ys, zs))
+        out = np.zeros(xs.shape, dtype=bool)
+        ly = ys - CHUNK_MIN_Y
+        valid = (ly >= 0) & (ly < CHUNK_HEIGHT)
+        idx = np.flatnonzero(valid)
+        if idx.size == 0:
+            return out
+        xs, zs, ly = xs.ravel()[idx], zs.ravel()[idx], ly.ravel()[idx]
+        flat = out.ravel()
+        for chunk, sel in self._group_by_chunk(xs, zs):
+            ids = chunk.blocks[xs[sel] - chunk.ox, ly[sel], zs[sel] - chunk.oz]
+            skip = [bid for bid, name in enumerate(chunk.palette) if name in ignore]
+            flat[idx[sel]] = (ids != AIR) & ~np.isin(ids, skip) if skip else ids != AIR
+        return out
+
+    def heights_many(self, xs, zs):
+        """一次查詢多個 (x, z) 柱子最高方塊的 y，未載入的區塊回傳 -inf"""
+        xs, zs = (np.asarray(a, dtype=np.int64).ravel() for a in (xs, zs))
+        out = np.full(xs.shape, -np.inf)
+        for chunk, sel in self._group_by_chunk(xs, zs):
+            out[sel] = chunk.heightmap()[xs[sel] - chunk.ox, zs[sel] - chunk.oz]
+        return out
+
+    def __len__(self):
+        return sum(c.count for c in self.chunks.values())
+
+    def __iter__(self):
+        return self.keys()
+
+    def keys(self):
+        for chunk in list(self.chunks.values()):
+            yield from chunk.keys()
+
+    def values(self):
+        for chunk in list(self.chunks.values()):
+            yield from chunk.values()
+
+    def items(self):
+        for chunk in list(self.chunks.values()):
+            yield from chunk.items()
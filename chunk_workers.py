@@ -0,0 +1,165 @@
+import os
+import time
+import heapq
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from chunk_data import GameXChunk
+
+# --- 工作行程常數 (Worker Constants) ---
+JOB_BATCH = 4           # 每個工作最多一次生成幾個區塊 (共用一次陣列運算)
+JOBS_PER_WORKER = 2     # 每個行程最多同時排幾個工作，其餘留在優先佇列
+LATENCY_WINDOW = 256    # 延遲統計保留的樣本數
+
+# 工作行程內的生成器 (每個行程一份，由 initializer 建立)
+_worker_gen = None
+
+def _init_worker(seed):
+    global _worker_gen
+    from world_gen import GameXWorldGen
+    _worker_gen = GameXWorldGen(seed=seed)
+
+def _generate_job(keys):
+    """在工作行程內生成一批區塊，回傳壓縮後的緊湊緩衝區而非 pickle 的 dict"""
+    start = time.perf_counter_ns()
+    chunks = _worker_gen.generate_chunks(keys)
+    _worker_gen.chunks.clear() # 工作行程不保留快取
+    payloads = [chunk.to_bytes() for chunk in chunks]
+    return payloads, start, time.perf_counter_ns(), os.getpid()
+
+
+class GameXChunkWorkers:
+    """
+    [功能 44] 以行程池生成區塊，繞過 GIL 吃滿所有核心。
+    請求依離玩家的距離排優先，重複的請求會合併，超出範圍的請求會被取消。
+    """
+    def __init__(self, seed, workers=None):
+        self.seed = seed
+        self.workers = workers or os.cpu_count() or 1
+        # spawn 模式：子行程不繼承主行程的 SDL/pygame 狀態
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker, initargs=(seed,))
+
+        self.center = (0, 0)
+        self.max_distance = None
+        self.pending = {}         # (cx, cz) -> 請求時間，尚未送進行程池
+        self.in_flight = {}       # future -> keys
+        self.in_flight_keys = set()
+        self.dropped_keys = set() # 已送出但被取消的區塊，結果回來時丟棄
+        self.requested_at = {}    # (cx, cz) -> 請求時間 (算延遲用)
+
+        # 統計數據
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.generated = 0
+        self.cancelled = 0
+        self.job_spans = deque(maxlen=LATENCY_WINDOW) # (start_ns, end_ns, pid, 區塊數)
+        self.profiler = None      # 選用的 GameXProfiler：工作行程的生成時間也寫進 trace
+
+    # --- 請求與取消 ---
+    def request(self, cx, cz):
+        """排入一個區塊；已在佇列或生成中的區塊不會重複排入"""
+        key = (cx, cz)
+        self.dropped_keys.discard(key)
+        if key in self.pending or key in self.in_flight_keys:
+            return False
+        if not self._in_range(key):
+            return False
+        now = time.perf_counter()
+        self.pending[key] = now
+        self.requested_at[key] = now
+        return True
+
+    def cancel(self, cx, cz):
+        key = (cx, cz)
+        if self.pending.pop(key, None) is not None:
+            self.requested_at.pop(key, None)
+            self.cancelled += 1
+        elif key in self.in_flight_keys and key not in self.dropped_keys:
+            self.dropped_keys.add(key)
+            self.cancelled += 1
+
+    def is_pending(self, cx, cz):
+        key = (cx, cz)
+        return (key in self.pending or key in self.in_flight_keys) and key not in self.dropped_keys
+
+    def set_center(self, cx, cz, max_distance=None):
+        """更新玩家所在區塊；超出 max_distance 的請求直接取消"""
+        self.center = (cx, cz)
+        self.max_distance = max_distance
+        if max_distance is None:
+            return
+        for key in [k for k in self.pending if not self._in_range(k)]:
+            self.cancel(*key)
+        for key in [k for k in self.in_flight_keys if not self._in_range(k)]:
+            self.cancel(*key)
+
+    def _distance2(self, key):
+        dx, dz = key[0] - self.center[0], key[1] - self.center[1]
+        return dx * dx + dz * dz
+
+    def _in_range(self, key):
+        return self.max_distance is None or self._distance2(key) <= self.max_distance ** 2
+
+    # --- 排程 ---
+    def pump(self):
+        """把最靠近玩家的請求送進空出來的行程槽位"""
+        free = self.workers * JOBS_PER_WORKER - len(self.in_flight)
+        if free <= 0 or not self.pending:
+            return
+        nearest = heapq.nsmallest(free * JOB_BATCH, self.pending, key=self._distance2)
+        for i in range(0, len(nearest), JOB_BATCH):
+            keys = nearest[i:i + JOB_BATCH]
+            for key in keys:
+                del self.pending[key]
+                self.in_flight_keys.add(key)
+            self.in_flight[self.pool.submit(_generate_job, keys)] = keys
+
+    def poll(self):
+        """收回已完成的區塊 (GameXChunk 列表)，並補滿空出的槽位"""
+        finished = []
+        for future in [f for f in self.in_flight if f.done()]:
+            keys = self.in_flight.pop(future)
+            self.in_flight_keys.difference_update(keys)
+            try:
+                payloads, start, end, pid = future.result()
+            except Exception:
+                # 生成失敗：放回佇列重試
+                for key in keys:
+                    if key not in self.dropped_keys:
+                        self.pending[key] = self.requested_at.get(key, time.perf_counter())
+                    self.dropped_keys.discard(key)
+                continue
+            self.job_spans.append((start, end, pid, len(keys)))
+            if self.profiler is not None: # perf_counter_ns 在同一台機器的行程間可以直接比較
+                self.profiler.record("generate", start, end, pid=pid, tid=0)
+            now = time.perf_counter()
+            for payload in payloads:
+                chunk = GameXChunk.from_bytes(payload)
+                key = (chunk.cx, chunk.cz)
+                if key in self.dropped_keys:
+                    self.dropped_keys.discard(key)
+                    self.requested_at.pop(key, None)
+                    continue
+                self.latencies.append(now - self.requested_at.pop(key, now))
+                self.generated += 1
+                finished.append(chunk)
+        self.pump()
+        return finished
+
+    # --- 監控數據 ---
+    def stats(self):
+        lat = sorted(self.latencies)
+        return {
+            "workers": self.workers,
+            "queue_depth": len(self.pending),
+            "in_flight": len(self.in_flight_keys) - len(self.dropped_keys & self.in_flight_keys),
+            "generated": self.generated,
+            "cancelled": self.cancelled,
+            "latency_ms_avg": 1000 * sum(lat) / len(lat) if lat else 0.0,
+            "latency_ms_p95": 1000 * lat[int(len(lat) * 0.95)] if lat else 0.0,
+        }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
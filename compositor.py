@@ -0,0 +1,85 @@
+import pygame
+from profiler import GameXProfiler
+
+class GameXCompositor:
+    """
+    [功能 28, 36, 37] 圖層合成：天空/星空 → 世界 → 介面 (準星、血條、快捷列)。
+    每一層都有快取，只重畫內容改變的層：
+    世界有變動就整個畫面送出；只有介面改變時還原介面底下的世界再局部更新 (髒矩形)；
+    什麼都沒變就完全不送出畫面。
+    """
+    def __init__(self, renderer, interaction, profiler=None):
+        self.renderer = renderer
+        self.interaction = interaction
+        self.profiler = profiler or GameXProfiler()
+        self.overlays = []       # 額外的圖層來源，layer(size) 回傳 (surface, rect) 或 None
+        self.hud_layers = None   # 目前畫在 screen 上的介面圖層
+
+        # 統計數據
+        self.full_frames = 0
+        self.partial_frames = 0
+        self.skipped_frames = 0
+        self.dirty_pixels = 0
+
+    def invalidate(self):
+        """視窗縮放或重新露出時呼叫：下一幀全部重畫"""
+        self.renderer.invalidate()
+        self.hud_layers = None
+
+    def compose(self, screen, pos, look_x, look_y, env, entities=None):
+        """合成這一幀，回傳需要送出的螢幕矩形 (整個畫面更新時只有一個)"""
+        with self.profiler.span("render"):
+            drawn = self.renderer.render(screen, pos, look_x, look_y, env["sky_color"],
+                                         entities, env.get("sun_y"))
+        with self.profiler.span("hud"):
+            return self._compose_hud(screen, drawn)
+
+    def _compose_hud(self, screen, drawn):
+        size = screen.get_size()
+        layers = list(self.interaction.hud_layers(size))
+        for overlay in self.overlays:
+            layer = overlay.layer(size)
+            if layer is not None:
+                layers.append(layer)
+        if drawn:
+            rects = [screen.get_rect()]
+        elif not self._same_layers(layers):
+            # 只有介面改變：舊的與新的圖層範圍先還原成世界畫面，再貼上新介面
+            old = [rect for _, rect in self.hud_layers or ()]
+            rects = self.renderer.restore(screen, old + [rect for _, rect in layers])
+        else:
+            return []
+        for surf, rect in layers:
+            screen.blit(surf, rect)
+        self.hud_layers = layers
+        return rects
+
+    def _same_layers(self, layers):
+        """圖層都是同一個快取物件就代表介面沒變"""
+        old = self.hud_layers
+        return old is not None and len(old) == len(layers) and all(a is b for a, b in zip(old, layers))
+
+    def present(self, screen, rects):
+        """送出畫面：整個畫面用 flip，局部變動只更新髒矩形"""
+        self.dirty_pixels = sum(r.width * r.height for r in rects)
+        if not rects:
+            self.skipped_frames += 1
+            return
+        with self.profiler.span("present"):
+            if rects[0] == screen.get_rect():
+                pygame.display.flip()
+                self.full_frames += 1
+            else:
+                pygame.display.update(rects)
+                self.partial_frames += 1
+
+    # --- 監控數據 ---
+    def stats(self):
+        return {
+            "full_frames": self.full_frames,
+            "partial_frames": self.partial_frames,
+            "skipped_frames": self.skipped_frames,
+            "dirty_pixels": self.dirty_pixels,
+            "sky_renders": self.renderer.visuals.sky_renders,
+            "hud_renders": self.interaction.hud_renders,
+        }
@@ -0,0 +1,180 @@
+import numpy as np
+from chunk_data import CHUNK_MIN_Y
+from visuals import BLOCK_COLORS, DEFAULT_BLOCK_COLOR
+
+# --- 實體常數 (Entity Constants)，單位為 格 / 秒 ---
+ENTITY_CAPACITY = 4096      # 預先配置的槽位數 (用完自動加倍)
+ENTITY_GRAVITY = -25.0      # [功能 27, 38] 實體受到的重力
+GROUND_FRICTION = 6.0       # 貼地時水平速度的衰減率 (每秒)
+KILL_Y = CHUNK_MIN_Y - 16   # 掉出世界底部就回收
+PARTICLE_LIFE = (0.6, 1.2)  # 碎片壽命範圍 (秒)
+PARTICLE_COUNT = 8          # 每次挖掘產生的碎片數
+MAX_PARTICLES = 1024        # 同時存在的碎片上限 (超過就少噴一點)
+ITEM_LIFE = 300.0           # 掉落物存在時間 (秒)
+PICKUP_RADIUS = 1.5         # [功能 38] 拾取距離
+
+# 實體種類與各種類的物理參數 (以種類當索引一次套用)
+KIND_NONE, KIND_PARTICLE, KIND_ITEM, KIND_MOB = 0, 1, 2, 3
+KIND_DRAG = np.array([0.0, 1.5, 0.5, 0.0], dtype=np.float32)     # 空氣阻力 (每秒)
+KIND_BOUNCE = np.array([0.0, 0.3, 0.1, 0.0], dtype=np.float32)   # 落地反彈係數
+KIND_SIZE = {KIND_PARTICLE: 0.12, KIND_ITEM: 0.3, KIND_MOB: 0.9}
+
+class GameXEntities:
+    """
+    [功能 27, 38] 以結構陣列 (SoA) 儲存的實體：碎片粒子、掉落物與生物。
+    位置、速度、壽命、種類、顏色都放在預先配置的 NumPy 陣列裡，釋放的槽位透過
+    free list 重複使用；重力、阻力、地面碰撞與過期每個 tick 一次批次處理。
+    """
+    def __init__(self, capacity=ENTITY_CAPACITY, seed=None):
+        self.capacity = 0
+        self.pos = np.zeros((0, 3), dtype=np.float32)
+        self.vel = np.zeros((0, 3), dtype=np.float32)
+        self.life = np.zeros(0, dtype=np.float32)
+        self.kind = np.zeros(0, dtype=np.uint8)
+        self.color = np.zeros((0, 3), dtype=np.uint8)
+        self.size = np.zeros(0, dtype=np.float32)
+        self.item = np.zeros(0, dtype=np.int16)   # 掉落物的方塊名稱索引 (item_names)
+        self.item_names = []
+        self.item_ids = {}
+
+        self.free = []      # 空槽位堆疊，尾端是最小的索引 (讓使用中的槽位集中在前面)
+        self.high = 0       # 使用中的最大槽位 + 1，批次更新只看 [:high]
+        self.count = 0
+        self.version = 0    # 有實體生成、移動或消失就加一 (渲染器用來判斷畫面是否改變)
+        self.rng = np.random.default_rng(seed)
+        self.particle_count = PARTICLE_COUNT
+        self.max_particles = MAX_PARTICLES
+        self._grow(capacity)
+
+        # 統計數據
+        self.spawned = 0
+        self.expired = 0
+
+    def _grow(self, capacity):
+        """把所有陣列擴充到 capacity，新的槽位加進 free list"""
+        old = self.capacity
+        for name in ("pos", "vel", "life", "kind", "color", "size", "item"):
+            arr = getattr(self, name)
+            grown = np.zeros((capacity,) + arr.shape[1:], dtype=arr.dtype)
+            grown[:old] = arr
+            setattr(self, name, grown)
+        self.free = list(range(capacity - 1, old - 1, -1)) + self.free
+        self.capacity = capacity
+
+    # --- 生成 ---
+    def spawn(self, kind, pos, vel, life, color, size=None, item=-1):
+        """批次生成 n 個實體 (pos / vel 為 (n, 3))，回傳使用的槽位"""
+        pos = np.atleast_2d(np.asarray(pos, dtype=np.float32))
+        n = len(pos)
+        if n > len(self.free):
+            self._grow(max(self.capacity * 2, self.capacity + n))
+        slots = np.array(self.free[:-n - 1:-1], dtype=np.intp)
+        del self.free[-n:]
+        self.pos[slots] = pos
+        self.vel[slots] = vel
+        self.life[slots] = life
+        self.kind[slots] = kind
+        self.color[slots] = color
+        self.size[slots] = KIND_SIZE[kind] if size is None else size
+        self.item[slots] = item
+        self.high = max(self.high, int(slots.max()) + 1)
+        self.count += n
+        self.version += 1
+        self.spawned += n
+        return slots
+
+    def spawn_block_particles(self, pos, color, count=None):
+        """[功能 27] 方塊破碎時在方塊內噴出小碎片 (數量預設 particle_count，總數不超過 max_particles)"""
+        live = int(np.count_nonzero(self.kind[:self.high] == KIND_PARTICLE))
+        count = min(self.particle_count if count is None else count, self.max_particles - live)
+        if count <= 0:
+            return np.zeros(0, dtype=np.intp)
+        center = np.asarray(pos, dtype=np.float32)
+        offset = self.rng.uniform(-0.4, 0.4, (count, 3))
+        vel = self.rng.uniform((-2.0, 2.0, -2.0), (2.0, 5.0, 2.0), (count, 3))
+        life = self.rng.uniform(*PARTICLE_LIFE, count)
+        shade = self.rng.uniform(0.75, 1.0, (count, 1))
+        return self.spawn(KIND_PARTICLE, center + offset, vel, life, np.asarray(color) * shade)
+
+    def spawn_item(self, pos, name):
+        """[功能 38] 挖掘後在方塊位置掉出一個可拾取的方塊"""
+        item = self.item_ids.get(name)
+        if item is None:
+            item = self.item_ids[name] = len(self.item_names)
+            self.item_names.append(name)
+        vel = (self.rng.uniform(-1, 1), 3.0, self.rng.uniform(-1, 1))
+        color = BLOCK_COLORS.get(name, DEFAULT_BLOCK_COLOR)
+        return self.spawn(KIND_ITEM, [pos], [vel], ITEM_LIFE, color, item=item)
+
+    def _release(self, slots):
+        self.kind[slots] = KIND_NONE
+        self.free.extend(slots.tolist())
+        self.free.sort(reverse=True)
+        self.count -= len(slots)
+        self.version += 1
+        if self.count == 0:
+            self.high = 0
+        else:
+            self.high = int(np.flatnonzero(self.kind[:self.high]).max()) + 1
+
+    # --- 每 tick 批次更新 ---
+    def update(self, dt, world_map):
+        """重力、阻力、與高度圖的地面碰撞與過期回收，全部實體一次處理"""
+        if not self.count:
+            return
+        idx = np.flatnonzero(self.kind[:self.high])
+        kind = self.kind[idx]
+        pos, vel = self.pos[idx], self.vel[idx]
+
+        vel[:, 1] += ENTITY_GRAVITY * dt
+        vel *= np.exp(-KIND_DRAG[kind] * dt)[:, None]
+        pos += vel * dt
+
+        # 地面碰撞：每一柱最高方塊的頂面 (未載入的區塊沒有地面)
+        ground = world_map.heights_many(np.floor(pos[:, 0] + 0.5), np.floor(pos[:, 2] + 0.5))
+        floor = ground + 0.5 + self.size[idx] / 2
+        hit = pos[:, 1] < floor
+        if hit.any():
+            pos[hit, 1] = floor[hit]
+            vel[hit, 1] *= -KIND_BOUNCE[kind[hit]]
+            vel[hit, 0] *= np.exp(-GROUND_FRICTION * dt)
+            vel[hit, 2] *= np.exp(-GROUND_FRICTION * dt)
+
+        life = self.life[idx] - dt
+        if not np.array_equal(pos, self.pos[idx]): # 停在地上的掉落物不算移動
+            self.version += 1
+        self.pos[idx], self.vel[idx], self.life[idx] = pos, vel, life
+
+        dead = idx[(life <= 0) | (pos[:, 1] < KILL_Y)]
+        if len(dead):
+            self.expired += len(dead)
+            self._release(dead)
+
+    def pickup(self, player_pos, radius=PICKUP_RADIUS):
+        """[功能 38] 撿起玩家附近的掉落物，回傳方塊名稱列表"""
+        if not self.count:
+            return []
+        idx = np.flatnonzero(self.kind[:self.high] == KIND_ITEM)
+        near = np.sum((self.pos[idx] - np.asarray(player_pos, dtype=np.float32)) ** 2, axis=1) <= radius * radius
+        taken = idx[near]
+        if not len(taken):
+            return []
+        names = [self.item_names[i] for i in self.item[taken].tolist()]
+        self._release(taken)
+        return names
+
+    # --- 渲染資料 ---
+    def visible(self):
+        """所有存活實體的 (位置, 顏色, 大小)，交給渲染器一次畫完"""
+        idx = np.flatnonzero(self.kind[:self.high])
+        return self.pos[idx], self.color[idx], self.size[idx]
+
+    # --- 監控數據 ---
+    def stats(self):
+        return {
+            "live": self.count,
+            "capacity": self.capacity,
+            "high": self.high,
+            "spawned": self.spawned,
+            "expired": self.expired,
+        }
@@ -0,0 +1,126 @@
+import time
+from itertools import islice
+from chunk_data import CHUNK_MIN_Y, CHUNK_HEIGHT
+
+# --- 流體常數 (Fluid Constants) ---
+FLUID_TICK_INTERVAL = 5   # 每幾個物理 tick 流動一次 (60 / 5 = 每秒 12 次)
+FLUID_MAX_UPDATES = 256   # 每次流動最多處理的活躍格數，剩下的留到下一次
+
+# [功能 20] 水：水源 "water" 加上 7 階流動的水，流動的水直接以不同方塊名稱存在區塊調色盤裡
+WATER = "water"
+SOURCE_LEVEL = 8          # 水源的水位 (流動的水 1..7，每往旁邊流一格減一)
+WATER_FLOWS = tuple(f"water_{level}" for level in range(1, SOURCE_LEVEL))
+WATER_LEVEL = {WATER: SOURCE_LEVEL, **{name: i + 1 for i, name in enumerate(WATER_FLOWS)}}
+FLUIDS = frozenset(WATER_LEVEL)
+
+SIDES = ((1, 0), (-1, 0), (0, 1), (0, -1))
+AROUND = ((0, 0, 0), (1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1))
+
+def water_name(level):
+    """水位轉成方塊名稱 (0 = 沒有水)"""
+    if level >= SOURCE_LEVEL:
+        return WATER
+    return WATER_FLOWS[level - 1] if level > 0 else None
+
+class GameXFluids:
+    """
+    [功能 20] 活躍格 (active cell) 流體模擬。
+    只有被排程的格子會重新計算水位：方塊被挖掘/放置或水位改變時，把該格與六個鄰居排進佇列，
+    每次流動最多處理 FLUID_MAX_UPDATES 格。沒有變動的海洋完全不佔模擬時間。
+    """
+    def __init__(self, world_map, interval=FLUID_TICK_INTERVAL, max_updates=FLUID_MAX_UPDATES):
+        self.world_map = world_map
+        self.interval = interval
+        self.max_updates = max_updates
+        self.active = {}          # 排程中的格子 (dict 當有序集合用，先排先算)
+        self.on_change = []       # 水位改變時呼叫 fn(pos)，例如標記網格重建
+        self.ticks = 0
+
+        # 統計數據
+        self.updates = 0
+        self.last_step_ms = 0.0
+
+    # --- 排程 ---
+    def block_changed(self, pos):
+        """方塊被挖掘、放置或替換：該格與六個鄰居都可能要流動"""
+        x, y, z = pos
+        for dx, dy, dz in AROUND:
+            self.active[(x + dx, y + dy, z + dz)] = None
+
+    # --- 每 tick 更新 ---
+    def tick(self):
+        """跟著物理 tick 呼叫，每 interval 個 tick 流動一次；回傳這次改變的格數"""
+        self.ticks += 1
+        if not self.active or self.ticks % self.interval:
+            return 0
+        return self.step()
+
+    def step(self):
+        """
+        處理目前佇列前面的最多 max_updates 格：先用目前的狀態算出每格的新水位，再一起寫入，
+        所以水每次流動只前進一格 (與處理順序無關)；這次新排進來的格子要等下一次。
+        """
+        start = time.perf_counter()
+        batch = list(islice(self.active, self.max_updates))
+        for pos in batch:
+            del self.active[pos]
+        changes = [change for change in map(self._next_level, batch) if change is not None]
+        for chunk, pos, level in changes:
+            if level:
+                chunk[pos] = water_name(level)
+            else:
+                del chunk[pos]
+            for fn in self.on_change:
+                fn(pos)
+            self.block_changed(pos)
+        self.updates += len(changes)
+        self.last_step_ms = (time.perf_counter() - start) * 1000
+        return len(changes)
+
+    def _next_level(self, pos):
+        """水位需要改變時回傳 (區塊, 座標, 新水位)，否則 None"""
+        x, y, z = pos
+        chunk = self.world_map.chunk_at(x, z)
+        if chunk is None or not CHUNK_MIN_Y <= y < CHUNK_MIN_Y + CHUNK_HEIGHT: # 未載入或超出高度
+            return None
+        block = chunk.get(pos)
+        if block == WATER or (block is not None and block not in FLUIDS): # 水源不會乾掉、實心方塊不動
+            return None
+        level = self._inflow(x, y, z)
+        if level == WATER_LEVEL.get(block, 0):
+            return None
+        return chunk, pos, level
+
+    def _inflow(self, x, y, z):
+        """
+        這一格應有的水位：
+        上方有水就是往下流的水 (最強的流動水)；旁邊的水只有在它底下被擋住時才會往旁邊擴散，每格減一；
+        兩側有兩個以上的水源且底下被擋住時，自己也變成水源 (挖開海邊的方塊會被填滿)。
+        """
+        get = self.world_map.get
+        level = SOURCE_LEVEL - 1 if get((x, y + 1, z)) in FLUIDS else 0
+        sources = 0
+        for dx, dz in SIDES:
+            side = WATER_LEVEL.get(get((x + dx, y, z + dz)), 0)
+            if not side:
+                continue
+            if side == SOURCE_LEVEL:
+                sources += 1
+            if self._supported(get((x + dx, y - 1, z + dz))):
+                level = max(level, side - 1)
+        if sources >= 2 and self._supported(get((x, y - 1, z))):
+            return SOURCE_LEVEL
+        return level
+
+    @staticmethod
+    def _supported(below):
+        """底下是實心方塊或水源：水不會往下流，只能往旁邊擴散"""
+        return below is not None and (below == WATER or below not in FLUIDS)
+
+    # --- 監控數據 ---
+    def stats(self):
+        return {
+            "active": len(self.active),
+            "updates": self.updates,
+            "step_ms": self.last_step_ms,
+        }
@@ -0,0 +1,142 @@
+import time
+from collections import deque
+import numpy as np
+from streaming import VIEW_DISTANCE, INTEGRATE_BUDGET_MS
+from mesher import REMESH_BUDGET_MS
+from visuals import FOG_MAX_DIST
+from entities import PARTICLE_COUNT, MAX_PARTICLES
+
+# --- 畫質調整常數 (Quality Governor Constants) ---
+GOVERNOR_WINDOW = 90        # 用最近幾幀的工作時間判斷 (60 FPS 約 1.5 秒)
+GOVERNOR_PERCENTILE = 90    # 看這個百分位 (偶爾一幀的尖峰不會觸發降級)
+DOWNGRADE_RATIO = 1.0       # 百分位超過預算就降一級
+UPGRADE_RATIO = 0.6         # 低於預算的六成才考慮升級 (兩個門檻之間是滯後區間，不動)
+UPGRADE_HOLD = 3.0          # 餘裕要持續這麼久才升一級 (秒)
+UPGRADE_BACKOFF = 2.0       # 升級後撐不到 UPGRADE_HOLD 就降回來：下次升級的等待時間乘上這個倍數
+MAX_UPGRADE_HOLD = 60.0
+
+# 畫質等級由低到高：視距 (區塊)、霧距 (格)、每次挖掘的碎片數、碎片上限、每幀區塊併入與網格重建預算 (毫秒)
+QUALITY_LEVELS = (
+    {"view_radius": 2, "fog_dist": 9, "particles": 2, "particle_cap": 64, "integrate_ms": 0.5, "remesh_ms": 1.0},
+    {"view_radius": 3, "fog_dist": 14, "particles": 4, "particle_cap": 256, "integrate_ms": 1.0, "remesh_ms": 2.0},
+    {"view_radius": VIEW_DISTANCE, "fog_dist": FOG_MAX_DIST, "particles": PARTICLE_COUNT,
+     "particle_cap": MAX_PARTICLES, "integrate_ms": INTEGRATE_BUDGET_MS, "remesh_ms": REMESH_BUDGET_MS},
+    {"view_radius": 5, "fog_dist": 23, "particles": 8, "particle_cap": 2048, "integrate_ms": 3.0, "remesh_ms": 6.0},
+    {"view_radius": 6, "fog_dist": 28, "particles": 12, "particle_cap": 4096, "integrate_ms": 4.0, "remesh_ms": 8.0},
+)
+DEFAULT_QUALITY = 2         # 與各模組原本的常數相同
+
+class GameXQualityGovernor:
+    """
+    [功能 48] 依每幀的工作時間自動調整畫質。
+    最近 GOVERNOR_WINDOW 幀的第 90 百分位超過預算就降一級；低於預算六成並持續 UPGRADE_HOLD 秒才升一級。
+    每次調整後重新量一整個視窗，剛升級就撐不住的話加長下次升級的等待，不會在兩級之間來回跳。
+    """
+    def __init__(self, streamer=None, mesher=None, visuals=None, entities=None,
+                 budget_ms=1000 / 60, level=DEFAULT_QUALITY):
+        self.streamer = streamer
+        self.mesher = mesher
+        self.visuals = visuals
+        self.entities = entities
+        self.budget_ms = budget_ms
+        self.enabled = True        # False 時固定在目前的等級 (例如 /quality 3)
+        self.level = level
+        self.samples = deque(maxlen=GOVERNOR_WINDOW)
+        self.headroom_since = None # 開始有餘裕的時間
+        self.upgrade_hold = UPGRADE_HOLD
+        self.last_upgrade = None   # 上次升級的時間 (還在觀察期內)
+        self.on_change = []        # 等級改變時呼叫 fn(level, settings)
+        self.log = None            # 選用的 fn(message)，例如 GameXSystem.log_error
+
+        # 統計數據
+        self.frame_ms = 0.0        # 最近一次判斷時的百分位
+        self.changes = 0
+        self.last_reason = "default"
+        self.apply()
+
+    @property
+    def settings(self):
+        return QUALITY_LEVELS[self.level]
+
+    def apply(self):
+        """把目前等級的設定套用到各模組"""
+        s = self.settings
+        if self.streamer is not None:
+            self.streamer.set_radius(s["view_radius"])
+            self.streamer.budget_ms = s["integrate_ms"]
+        if self.mesher is not None:
+            self.mesher.budget_ms = s["remesh_ms"]
+        if self.visuals is not None:
+            self.visuals.fog_dist = s["fog_dist"]
+        if self.entities is not None:
+            self.entities.particle_count = s["particles"]
+            self.entities.max_particles = s["particle_cap"]
+        for fn in self.on_change:
+            fn(self.level, s)
+
+    def set_level(self, level, reason="manual"):
+        level = max(0, min(len(QUALITY_LEVELS) - 1, level))
+        old = self.level
+        self.level = level
+        self.samples.clear()
+        self.headroom_since = None
+        self.last_reason = reason
+        if level == old:
+            return
+        self.changes += 1
+        self.apply()
+        if self.log is not None:
+            self.log(f"Quality {old} -> {level} ({reason}): {self.describe()}")
+
+    # --- 每幀更新 ---
+    def update(self, frame_ms, now=None):
+        """記錄一幀的工作時間 (不含 FPS 鎖定的等待)，需要時調整等級"""
+        now = time.perf_counter() if now is None else now
+        self.samples.append(frame_ms)
+        if not self.enabled or len(self.samples) < GOVERNOR_WINDOW:
+            return
+        p = float(np.percentile(self.samples, GOVERNOR_PERCENTILE))
+        self.frame_ms = p
+        if self.last_upgrade is not None and now - self.last_upgrade >= self.upgrade_hold:
+            self.last_upgrade = None # 升級撐過觀察期
+            self.upgrade_hold = UPGRADE_HOLD
+
+        if p > self.budget_ms * DOWNGRADE_RATIO:
+            if self.level == 0:
+                return
+            if self.last_upgrade is not None: # 剛升上來就超出預算
+                self.upgrade_hold = min(MAX_UPGRADE_HOLD, self.upgrade_hold * UPGRADE_BACKOFF)
+                self.last_upgrade = None
+            self.set_level(self.level - 1, f"p{GOVERNOR_PERCENTILE} {p:.1f} ms > budget {self.budget_ms:.1f} ms")
+        elif p < self.budget_ms * UPGRADE_RATIO and self.level < len(QUALITY_LEVELS) - 1:
+            if self.headroom_since is None:
+                self.headroom_since = now
+            elif now - self.headroom_since >= self.upgrade_hold:
+                self.last_upgrade = now
+                self.set_level(self.level + 1, f"p{GOVERNOR_PERCENTILE} {p:.1f} ms < "
+                                               f"{self.budget_ms * UPGRADE_RATIO:.1f} ms for {self.upgrade_hold:.0f} s")
+        else:
+            self.headroom_since = None
+
+    # --- 監控數據 ---
+    def describe(self):
+        s = self.settings
+        return (f"view {s['view_radius']}, fog {s['fog_dist']}, particles {s['particles']}/{s['particle_cap']}, "
+                f"integrate {s['integrate_ms']} ms, remesh {s['remesh_ms']} ms")
+
+    def status(self):
+        """給效能分析覆蓋層的一行摘要"""
+        mode = "auto" if self.enabled else "fixed"
+        return (f"quality {self.level}/{len(QUALITY_LEVELS) - 1} ({mode})  "
+                f"p{GOVERNOR_PERCENTILE} {self.frame_ms:.1f}/{self.budget_ms:.1f} ms  {self.describe()}")
+
+    def stats(self):
+        return {
+            "level": self.level,
+            "enabled": self.enabled,
+            "frame_ms": self.frame_ms,
+            "budget_ms": self.budget_ms,
+            "changes": self.changes,
+            "upgrade_hold": self.upgrade_hold,
+            "reason": self.last_reason,
+        }
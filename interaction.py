@@ -1,58 +1,190 @@
 import pygame
 import math
-import json
+import os
+import numpy as np
+from chunk_data import GameXWorldMap
+from region import open_store, chunks_from_blocks, convert_world_json
+from visuals import BLOCK_COLORS, DEFAULT_BLOCK_COLOR
+from mods import BlockBreakEvent, BlockPlaceEvent
+from fluids import FLUIDS
+
+# --- 互動常數 ---
+REACH = 5.0   # [功能 31] 挖掘/放置的最遠距離 (格)
+HUD_SLOT = 40 # [功能 35] 快捷列每格的大小 (像素)
+
+def look_direction(look_x, look_y):
+    """視角 (抬頭角度, 轉身角度) 轉成單位方向向量"""
+    ry, rx = math.radians(look_y), math.radians(look_x)
+    return (math.sin(ry) * math.cos(rx), math.sin(rx), math.cos(ry) * math.cos(rx))
 
 class GameXInteraction:
     def __init__(self):
         # [功能 33] 物品欄系統：存儲方塊 ID
-        self.inventory = ["grass", "dirt", "stone", "wood", "leaves"]
+        self.inventory = ["grass", "dirt", "stone", "wood", "leaves", "torch"]
         self.selected_index = 0  # [功能 35] 快捷列選中索引
         
         # [功能 37] HUD 狀態
         self.hp = 20
         self.max_hp = 20
 
+        # [功能 36, 37] 預先畫好的介面圖層，狀態改變才重畫
+        self.hud_key = None
+        self.hud_cache = []   # [(surface, rect)]：準星、血條、快捷列
+        self.hud_renders = 0
+        self.events = None    # [功能 50] 選用的 GameXEventBus
+
     # --- [功能 31 & 32] 挖掘與放置核心 API (Raycasting) ---
-    def raycast(self, pos, look_x, look_y, world_map, button):
-        """從玩家視角發射射線，偵測前方 5 格內的方塊"""
-        ry, rx = math.radians(look_y), math.radians(look_x)
-        dx = math.sin(ry) * math.cos(rx)
-        dy = math.sin(rx)
-        dz = math.cos(ry) * math.cos(rx)
-
-        # 以 0.1 格為步長進行掃描
-        for i in range(1, 50):
-            d = i * 0.1
-            tx, ty, tz = pos[0] + dx * d, pos[1] + dy * d, pos[2] + dz * d
-            bx, by, bz = round(tx), round(ty), round(tz)
-
-            if (bx, by, bz) in world_map:
-                if button == 1: # 左鍵：[功能 31] 挖掘
-                    target_block = world_map[(bx, by, bz)]
-                    del world_map[(bx, by, bz)]
-                    return {"action": "break", "pos": (bx, by, bz), "type": target_block}
-                
-                if button == 3: # 右鍵：[功能 32] 放置
-                    # 往回推一格，找到放置的位置
-                    px, py, pz = round(tx - dx*0.1), round(ty - dy*0.1), round(tz - dz*0.1)
-                    block_type = self.inventory[self.selected_index]
-                    world_map[(px, py, pz)] = block_type
-                    return {"action": "place", "pos": (px, py, pz), "type": block_type}
-                break
+    def raycast(self, pos, look_x, look_y, world_map, button, reach=REACH):
+        """從玩家視角發射射線，挖掘或放置前方 reach 格內第一個方塊"""
+        hit = self.cast_ray(pos, look_direction(look_x, look_y), world_map, reach)
+        if hit is None:
+            return None
+        bx, by, bz = hit["pos"]
+
+        if button == 1: # 左鍵：[功能 31] 挖掘
+            del world_map[(bx, by, bz)]
+            if self.events is not None:
+                self.events.emit(BlockBreakEvent, (bx, by, bz), hit["type"])
+            return {"action": "break", "pos": (bx, by, bz), "type": hit["type"]}
+
+        if button == 3: # 右鍵：[功能 32] 放置在被擊中的那一面外側
+            nx, ny, nz = hit["normal"]
+            if (nx, ny, nz) == (0, 0, 0): # 視點就在方塊內部，沒有可放置的面
+                return None
+            px, py, pz = bx + nx, by + ny, bz + nz
+            block_type = self.inventory[self.selected_index]
+            try:
+                world_map[(px, py, pz)] = block_type
+            except KeyError: # 目標格不在已載入的區塊內
+                return None
+            if self.events is not None:
+                self.events.emit(BlockPlaceEvent, (px, py, pz), block_type)
+            return {"action": "place", "pos": (px, py, pz), "type": block_type}
         return None
 
+    def cast_ray(self, origin, direction, world_map, reach=REACH):
+        """
+        Amanatides-Woo 網格走訪：每個體素只拜訪一次，不會從方塊角落穿過去。
+        回傳 {"pos", "normal", "type", "distance"}，沒打到回傳 None。
+        方塊 (bx, by, bz) 佔據 [b - 0.5, b + 0.5)，所以先把座標平移半格。
+        [功能 20] 水不擋射線：可以挖到水底的方塊，放置時直接取代水。
+        """
+        gx, gy, gz = origin[0] + 0.5, origin[1] + 0.5, origin[2] + 0.5
+        x, y, z = math.floor(gx), math.floor(gy), math.floor(gz)
+        steps, t_max, t_delta = [], [], []
+        for g, cell, d in ((gx, x, direction[0]), (gy, y, direction[1]), (gz, z, direction[2])):
+            if d > 0:
+                steps.append(1); t_delta.append(1 / d); t_max.append((cell + 1 - g) / d)
+            elif d < 0:
+                steps.append(-1); t_delta.append(-1 / d); t_max.append((g - cell) / -d)
+            else:
+                steps.append(0); t_delta.append(math.inf); t_max.append(math.inf)
+
+        normal, t = (0, 0, 0), 0.0
+        while t <= reach:
+            block = world_map.get((x, y, z))
+            if block is not None and block not in FLUIDS:
+                return {"pos": (x, y, z), "normal": normal, "type": block, "distance": t}
+            if t_max[0] <= t_max[1] and t_max[0] <= t_max[2]:
+                x += steps[0]; t = t_max[0]; t_max[0] += t_delta[0]; normal = (-steps[0], 0, 0)
+            elif t_max[1] <= t_max[2]:
+                y += steps[1]; t = t_max[1]; t_max[1] += t_delta[1]; normal = (0, -steps[1], 0)
+            else:
+                z += steps[2]; t = t_max[2]; t_max[2] += t_delta[2]; normal = (0, 0, -steps[2])
+        return None
+
+    def cast_rays(self, origins, directions, world_map, reach=REACH):
+        """
+        批次射線：所有射線同步走訪，每一步用一次陣列查詢 (選取框、AI 視線、基準測試)。
+        回傳 dict：hit (N,) bool、pos (N, 3)、normal (N, 3)、distance (N,)；pos 等欄位只在 hit 的列有意義。
+        """
+        g = np.asarray(origins, dtype=np.float64).reshape(-1, 3) + 0.5
+        d = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        n = len(g)
+        cell = np.floor(g).astype(np.int64)
+        step = np.sign(d).astype(np.int64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_delta = np.where(step != 0, np.abs(1 / d), np.inf)
+            t_max = np.where(step > 0, (cell + 1 - g) * t_delta,
+                             np.where(step < 0, (g - cell) * t_delta, np.inf))
+
+        hit = np.zeros(n, dtype=bool)
+        normal = np.zeros((n, 3), dtype=np.int64)
+        dist = np.zeros(n)
+        t = np.zeros(n)
+        active = np.arange(n)
+        while active.size:
+            c = cell[active]
+            if hasattr(world_map, "contains_many"): # [功能 20] 水不擋射線，與 cast_ray 一致
+                solid = world_map.contains_many(c[:, 0], c[:, 1], c[:, 2], ignore=FLUIDS)
+            else: # 一般 dict 地圖
+                empty = FLUIDS | {None}
+                solid = np.array([world_map.get(tuple(p)) not in empty for p in c.tolist()], dtype=bool)
+            hit[active[solid]] = True
+            dist[active[solid]] = t[active[solid]]
+            active = active[~solid]
+
+            # 往 t_max 最小的軸前進一格
+            axis = np.argmin(t_max[active], axis=1)
+            t_next = t_max[active, axis]
+            keep = t_next <= reach
+            active, axis, t_next = active[keep], axis[keep], t_next[keep]
+            cell[active, axis] += step[active, axis]
+            t_max[active, axis] += t_delta[active, axis]
+            t[active] = t_next
+            normal[active] = 0
+            normal[active, axis] = -step[active, axis]
+        return {"hit": hit, "pos": cell, "normal": normal, "distance": dist}
+
+    # --- [功能 36, 37] 介面圖層快取 ---
+    def hud_layers(self, size):
+        """
+        回傳 [(surface, rect)]；只有視窗尺寸、血量、選取格或物品欄改變時才重畫，
+        沒變時回傳同一個 list (合成器用 is 判斷介面是否需要更新)。
+        """
+        key = (tuple(size), self.hp, self.max_hp, self.selected_index, tuple(self.inventory))
+        if key != self.hud_key:
+            self.hud_key = key
+            self.hud_cache = [self._render_crosshair(size), self._render_health(), self._render_hotbar(size)]
+            self.hud_renders += 1
+        return self.hud_cache
+
+    def _render_crosshair(self, size):
+        w, h = size
+        surf = pygame.Surface((22, 22), pygame.SRCALPHA)
+        color = (255, 255, 255)
+        pygame.draw.line(surf, color, (0, 10), (20, 10), 2)
+        pygame.draw.line(surf, color, (10, 0), (10, 20), 2)
+        return surf, surf.get_rect(topleft=(w // 2 - 10, h // 2 - 10))
+
+    def _render_health(self):
+        surf = pygame.Surface((200, 20))
+        surf.fill((50, 0, 0)) # 背景
+        pygame.draw.rect(surf, (255, 0, 0), (0, 0, self.hp * 200 // self.max_hp, 20)) # 血量
+        return surf, surf.get_rect(topleft=(20, 20))
+
+    def _render_hotbar(self, size):
+        w, h = size
+        n = max(1, len(self.inventory))
+        surf = pygame.Surface((n * HUD_SLOT, HUD_SLOT), pygame.SRCALPHA)
+        for i, name in enumerate(self.inventory):
+            slot = pygame.Rect(i * HUD_SLOT, 0, HUD_SLOT, HUD_SLOT)
+            surf.fill((0, 0, 0, 120), slot)
+            surf.fill(BLOCK_COLORS.get(name, DEFAULT_BLOCK_COLOR), slot.inflate(-12, -12))
+            if i == self.selected_index:
+                pygame.draw.rect(surf, (255, 255, 255), slot, 3)
+        return surf, surf.get_rect(midbottom=(w // 2, h - 10))
+
     # --- [功能 36] 十字準星渲染 API ---
     def draw_crosshair(self, screen):
-        w, h = screen.get_size()
-        color = (255, 255, 255)
-        pygame.draw.line(screen, color, (w//2 - 10, h//2), (w//2 + 10, h//2), 2)
-        pygame.draw.line(screen, color, (w//2, h//2 - 10), (w//2, h//2 + 10), 2)
+        surf, rect = self.hud_layers(screen.get_size())[0]
+        screen.blit(surf, rect)
 
     # --- [功能 37] HUD 狀態列渲染 ---
     def draw_hud(self, screen):
-        # 繪製血條
-        pygame.draw.rect(screen, (50, 0, 0), (20, 20, 200, 20)) # 背景
-        pygame.draw.rect(screen, (255, 0, 0), (20, 20, self.hp * 10, 20)) # 血量
+        # 血條與快捷列
+        for surf, rect in self.hud_layers(screen.get_size())[1:]:
+            screen.blit(surf, rect)
 
     # --- [功能 35] 快捷列 API ---
     def change_selection(self, slot_index):
@@ -60,22 +192,29 @@ class GameXInteraction:
             self.selected_index = slot_index
 
     # --- [功能 40] 存檔與讀取系統 API (Save/Load) ---
-    def save_world(self, world_map, filename="world.json"):
-        # 將元組鍵轉換為字串以符合 JSON 格式
-        data = {f"{k[0]},{k[1]},{k[2]}": v for k, v in world_map.items()}
-        with open(filename, "w") as f:
-            json.dump(data, f)
-        print("World Saved!")
-
-    def load_world(self, filename="world.json"):
-        try:
-            with open(filename, "r") as f:
-                data = json.load(f)
-            # 還原為元組鍵
-            new_map = {}
-            for k, v in data.items():
-                coords = tuple(map(int, k.split(',')))
-                new_map[coords] = v
-            return new_map
-        except FileNotFoundError:
-            return {}
\ No newline at end of file
+    def save_world(self, world_map, path="world", background=False):
+        """增量存檔到 region 檔：只寫入上次存檔後改動過的區塊"""
+        if hasattr(world_map, "chunks"):
+            chunks = list(world_map.chunks.values())
+        else: # 舊的 dict-of-tuples 地圖
+            chunks = list(chunks_from_blocks(world_map.items())[0].values())
+        saved = open_store(path).save_dirty(chunks, background)
+        print(f"World Saved! ({saved} chunks)")
+        return saved
+
+    def load_world(self, path="world"):
+        """讀取 region 存檔；給舊的 .json 路徑時會先一次性轉換"""
+        if path.endswith(".json"):
+            if not os.path.exists(path):
+                return GameXWorldMap()
+            world_dir = path[:-len(".json")]
+            if not os.path.isdir(world_dir):
+                convert_world_json(path, world_dir)
+            path = world_dir
+        if not os.path.isdir(path):
+            return GameXWorldMap()
+        store = open_store(path)
+        new_map = GameXWorldMap()
+        for cx, cz in store.chunk_keys():
+            new_map.add_chunk(store.load_chunk(cx, cz))
+        return new_map
\ No newline at end of file
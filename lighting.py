@@ -0,0 +1,292 @@
+import time
+from collections import deque
+import numpy as np
+from chunk_data import CHUNK_SIZE, CHUNK_HEIGHT, CHUNK_MIN_Y
+from fluids import FLUIDS
+
+# --- 光照常數 (Lighting Constants) ---
+MAX_LIGHT = 15            # 光照等級 0..15，剛好一個 nibble
+OPAQUE = MAX_LIGHT        # 不透光方塊的濾光量
+SKY, BLOCK = 4, 0         # 兩個通道在 chunk.light 裡的位移：高 nibble 天空光、低 nibble 方塊光
+
+# 透光方塊額外吸收的光 (空氣是 0，沒列出的方塊完全不透光)
+LIGHT_FILTER = {"leaves": 1, "torch": 0, **{name: 1 for name in FLUIDS}}
+# 發光方塊的亮度
+LIGHT_EMISSION = {"torch": 14}
+
+DIRECTIONS = ((1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1))
+TOP_Y = CHUNK_MIN_Y + CHUNK_HEIGHT - 1
+
+def block_filter(name):
+    """方塊的濾光量 (None = 空氣)"""
+    return 0 if name is None else LIGHT_FILTER.get(name, OPAQUE)
+
+def _palette_table(chunk, table, default):
+    """調色盤 ID -> 數值的查表陣列 (0 號空氣是 0)"""
+    return np.array([0] + [table.get(name, default) for name in chunk.palette[1:]], dtype=np.int8)
+
+def _flood(level, filt, seed):
+    """
+    一層一層的 BFS：每一輪每格取六個鄰居的 (亮度 - 1 - 自己的濾光)，直到沒有格子變亮。
+    level / filt / seed 形狀都是 (N, S, H, S)，只在同一個區塊內擴散。
+    """
+    passable = filt < OPAQUE
+    # 只有還沒亮到 15 的可通過格子需要擴散：只算包含它們的高度帶 (再往上一層當光源)
+    rows = np.flatnonzero((passable & (level < MAX_LIGHT)).any(axis=(0, 1, 3)))
+    if not len(rows):
+        return level
+    band = slice(max(0, rows[0] - 1), rows[-1] + 2)
+    level = level.copy()
+    level[:, :, band] = _flood_band(level[:, :, band], filt[:, :, band], seed[:, :, band], passable[:, :, band])
+    return level
+
+def _flood_band(level, filt, seed, passable):
+    """_flood 的主迴圈 (只在高度帶內)"""
+    for _ in range(MAX_LIGHT):
+        spread = np.zeros_like(level)
+        for axis in (1, 2, 3):
+            lo = [slice(None)] * 4
+            hi = [slice(None)] * 4
+            lo[axis], hi[axis] = slice(None, -1), slice(1, None)
+            lo, hi = tuple(lo), tuple(hi)
+            np.maximum(spread[lo], level[hi], out=spread[lo])
+            np.maximum(spread[hi], level[lo], out=spread[hi])
+        grown = np.maximum(seed, np.where(passable, np.maximum(level, spread - 1 - filt), 0))
+        if np.array_equal(grown, level):
+            break
+        level = grown
+    return level
+
+def light_chunks(chunks):
+    """
+    [功能 21] 生成 (或讀入沒有光照資料的舊存檔) 時計算區塊內部的光照，所有區塊一次批次運算。
+    天空光先從區塊頂端直直往下穿過空氣 (不衰減)，再往旁邊、水裡與洞穴裡擴散；方塊光從發光方塊擴散。
+    跨區塊邊界的光由 GameXLighting 在區塊併入世界時補上。
+    """
+    if not chunks:
+        return
+    filt = np.stack([_palette_table(c, LIGHT_FILTER, OPAQUE)[c.blocks] for c in chunks])
+    emit = np.stack([_palette_table(c, LIGHT_EMISSION, 0)[c.blocks] for c in chunks])
+    # 天空光：從頂端往下直到第一個會擋光的方塊都是 15，其餘靠擴散
+    column = np.cumsum(filt[:, :, ::-1, :], axis=2)[:, :, ::-1, :]
+    sky = np.where(column == 0, MAX_LIGHT, 0).astype(np.int8)
+    sky = _flood(sky, filt, sky)
+    block = _flood(emit, filt, emit) if emit.any() else emit
+    light = (sky.astype(np.uint8) << SKY) | block.astype(np.uint8)
+    for chunk, values in zip(chunks, light):
+        chunk.light[...] = values
+        chunk.lit = True
+
+
+class GameXLighting:
+    """
+    [功能 21] 天空光與方塊光的增量更新。
+    方塊改變時每個通道各跑一次「移除佇列 + 加入佇列」的 BFS：先把依賴舊光源的格子歸零，
+    遇到更亮的獨立光源就排進加入佇列，再從那裡重新擴散；跨區塊邊界照樣走。
+    只有光照真的改變的區塊 (在邊界時連鄰居) 會通知 on_change，不會整個世界重算。
+    """
+    def __init__(self, world_map):
+        self.world_map = world_map
+        self.on_change = []       # 光照改變的區塊 fn(cx, cz)，例如標記網格重建
+        self.touched = set()
+
+        # 統計數據
+        self.updates = 0
+        self.relit = 0
+        self.last_update_ms = 0.0
+
+    # --- 單格存取 ---
+    def _locate(self, x, y, z):
+        """(區塊, 區塊內索引)；未載入或超出高度回傳 (None, -1)"""
+        chunk = self.world_map.chunks.get((x // CHUNK_SIZE, z // CHUNK_SIZE))
+        ly = y - CHUNK_MIN_Y
+        if chunk is None or not 0 <= ly < CHUNK_HEIGHT:
+            return None, -1
+        return chunk, ((x - chunk.ox) * CHUNK_HEIGHT + ly) * CHUNK_SIZE + z - chunk.oz
+
+    def get_light(self, pos):
+        """(天空光, 方塊光)，未載入的地方回傳 (15, 0)"""
+        chunk, i = self._locate(*pos)
+        if chunk is None:
+            return MAX_LIGHT, 0
+        value = chunk._light[i]
+        return value >> SKY, value & 0xF
+
+    def _touch(self, chunk, x, z):
+        """記下光照改變的區塊；格子在區塊邊界時鄰居的網格也會用到它"""
+        lx, lz = x - chunk.ox, z - chunk.oz
+        dxs = [0] + [-1] * (lx == 0) + [1] * (lx == CHUNK_SIZE - 1)
+        dzs = [0] + [-1] * (lz == 0) + [1] * (lz == CHUNK_SIZE - 1)
+        for dx in dxs:
+            for dz in dzs:
+                self.touched.add((chunk.cx + dx, chunk.cz + dz))
+
+    # --- 增量更新 ---
+    def block_changed(self, pos):
+        """方塊被挖掘、放置 (或水流動) 之後呼叫，只重算受影響的範圍"""
+        start = time.perf_counter()
+        x, y, z = pos
+        chunk, i = self._locate(x, y, z)
+        if chunk is None:
+            return
+        name = chunk.get(pos)
+        filt = block_filter(name)
+        emission = LIGHT_EMISSION.get(name, 0)
+        for shift in (SKY, BLOCK):
+            removal, add = deque(), deque()
+            old = (chunk._light[i] >> shift) & 0xF
+            self._set(chunk, i, x, z, shift, 0)
+            if old:
+                removal.append((x, y, z, old))
+            if shift == BLOCK and emission:
+                self._set(chunk, i, x, z, shift, emission)
+                add.append((x, y, z))
+            if filt < OPAQUE:
+                if shift == SKY and y == TOP_Y and not filt: # 世界頂端直接照到天空
+                    self._set(chunk, i, x, z, shift, MAX_LIGHT)
+                    add.append((x, y, z))
+                for dx, dy, dz in DIRECTIONS: # 周圍的光流回這一格
+                    add.append((x + dx, y + dy, z + dz))
+            self._propagate(shift, removal, add)
+        self.updates += 1
+        self._notify(start)
+
+    def on_chunk_loaded(self, chunk):
+        """區塊併入世界：沒有光照資料就先算內部，再把光從邊界兩側互相補過去"""
+        start = time.perf_counter()
+        if not chunk.lit:
+            light_chunks([chunk])
+        self._stitch(chunk)
+        self.relit += 1
+        self._notify(start)
+
+    def relight_area(self, keys):
+        """
+        [功能 45] 大範圍編輯之後重算光照：keys 內的區塊整塊重算再與鄰居補邊界。
+        光最多傳 14 格，keys 只要包含編輯範圍外兩圈區塊，結果就與逐格增量更新相同；
+        只通知光照真的改變的區塊。
+        """
+        start = time.perf_counter()
+        chunks = [c for c in map(self.world_map.chunks.get, keys) if c is not None]
+        before = [c.light.copy() for c in chunks]
+        light_chunks(chunks)
+        for chunk in chunks:
+            self._stitch(chunk)
+        self.touched = set()
+        for chunk, old in zip(chunks, before):
+            diff = chunk.light != old
+            if not diff.any():
+                continue
+            if chunk.modified:
+                chunk.unsaved = True
+            for dx, xs in ((-1, 0), (0, slice(None)), (1, -1)):
+                for dz, zs in ((-1, 0), (0, slice(None)), (1, -1)):
+                    if diff[xs, :, zs].any():
+                        self.touched.add((chunk.cx + dx, chunk.cz + dz))
+        self.relit += len(chunks)
+        self._notify(start)
+
+    def _stitch(self, chunk):
+        """把光從 chunk 與四個鄰居共用的面兩側互相補過去"""
+        chunks = self.world_map.chunks
+        add = {SKY: deque(), BLOCK: deque()}
+        for (dx, dz), (mine, theirs) in BORDERS.items():
+            other = chunks.get((chunk.cx + dx, chunk.cz + dz))
+            if other is None or not other.lit:
+                continue
+            for src, dst, src_face, dst_face in ((chunk, other, mine, theirs), (other, chunk, theirs, mine)):
+                a, b = src.light[src_face], dst.light[dst_face]
+                for shift in (SKY, BLOCK):
+                    brighter = ((a >> shift) & 0xF) > ((b >> shift) & 0xF) + 1
+                    for i, j in zip(*np.nonzero(brighter)):
+                        add[shift].append(_face_pos(src, src_face, int(i), int(j)))
+        for shift in (SKY, BLOCK):
+            if add[shift]:
+                self._propagate(shift, deque(), add[shift])
+
+    def _set(self, chunk, i, x, z, shift, level):
+        value = chunk._light[i]
+        new = (value & ~(0xF << shift) & 0xFF) | (level << shift)
+        if new != value:
+            chunk._light[i] = new
+            self._touch(chunk, x, z)
+            if chunk.modified:
+                # 從存檔讀回的區塊信任存下的光照，變暗也要存；沒改過的區塊由種子重新生成再補邊界
+                chunk.unsaved = True
+
+    def _propagate(self, shift, removal, add):
+        """移除佇列先清掉依賴舊光源的格子，再從加入佇列把光擴散出去"""
+        locate = self._locate
+        while removal:
+            x, y, z, level = removal.popleft()
+            for dx, dy, dz in DIRECTIONS:
+                nx, ny, nz = x + dx, y + dy, z + dz
+                chunk, i = locate(nx, ny, nz)
+                if chunk is None:
+                    continue
+                n = (chunk._light[i] >> shift) & 0xF
+                if not n:
+                    continue
+                if n < level or (shift == SKY and dy < 0 and level == MAX_LIGHT):
+                    self._set(chunk, i, nx, nz, shift, 0)
+                    removal.append((nx, ny, nz, n))
+                    if shift == BLOCK: # 被清掉的是發光方塊：自己的光留著
+                        emission = LIGHT_EMISSION.get(chunk.get((nx, ny, nz)), 0)
+                        if emission:
+                            self._set(chunk, i, nx, nz, shift, emission)
+                            add.append((nx, ny, nz))
+                else:
+                    add.append((nx, ny, nz)) # 更亮的獨立光源，之後從它重新擴散
+        while add:
+            x, y, z = add.popleft()
+            chunk, i = locate(x, y, z)
+            if chunk is None:
+                continue
+            level = (chunk._light[i] >> shift) & 0xF
+            if level <= 1:
+                continue
+            for dx, dy, dz in DIRECTIONS:
+                nx, ny, nz = x + dx, y + dy, z + dz
+                other, j = locate(nx, ny, nz)
+                if other is None:
+                    continue
+                filt = block_filter(other.get((nx, ny, nz)))
+                if filt >= OPAQUE:
+                    continue
+                new = level - 1 - filt
+                if shift == SKY and dy < 0 and level == MAX_LIGHT and not filt: # 天空光直直穿過空氣往下不衰減
+                    new = MAX_LIGHT
+                if new > (other._light[j] >> shift) & 0xF:
+                    self._set(other, j, nx, nz, shift, new)
+                    add.append((nx, ny, nz))
+
+    def _notify(self, start):
+        touched, self.touched = self.touched, set()
+        for key in touched:
+            for fn in self.on_change:
+                fn(*key)
+        self.last_update_ms = (time.perf_counter() - start) * 1000
+
+    # --- 監控數據 ---
+    def stats(self):
+        return {
+            "updates": self.updates,
+            "relit_chunks": self.relit,
+            "update_ms": self.last_update_ms,
+        }
+
+
+# 區塊間共用的面：(dx, dz) -> (自己這一側的切片, 鄰居那一側的切片)，切片後形狀為 (H, S) 或 (S, H)
+_LAST = CHUNK_SIZE - 1
+BORDERS = {
+    (1, 0): ((_LAST, slice(None), slice(None)), (0, slice(None), slice(None))),
+    (-1, 0): ((0, slice(None), slice(None)), (_LAST, slice(None), slice(None))),
+    (0, 1): ((slice(None), slice(None), _LAST), (slice(None), slice(None), 0)),
+    (0, -1): ((slice(None), slice(None), 0), (slice(None), slice(None), _LAST)),
+}
+
+def _face_pos(chunk, face, a, b):
+    """面切片上的索引 (a, b) 對應的世界座標：x 固定的面是 (ly, lz)，z 固定的面是 (lx, ly)"""
+    if isinstance(face[0], int):
+        return chunk.ox + face[0], a + CHUNK_MIN_Y, chunk.oz + b
+    return chunk.ox + a, b + CHUNK_MIN_Y, chunk.oz + face[2]
@@ -0,0 +1,266 @@
+import time
+import numpy as np
+from chunk_data import CHUNK_SIZE, CHUNK_HEIGHT, CHUNK_MIN_Y, AIR
+from visuals import BLOCK_COLORS, DEFAULT_BLOCK_COLOR, AO_LEVELS, face_shades, light_levels
+
+# --- 網格常數 (Mesh Constants) ---
+REMESH_BUDGET_MS = 4.0   # [功能 41] 每幀重建網格的時間上限
+
+# 六個面：(軸, 方向)。面的 (u, v) 軸依循環順序 x->(y, z)、y->(z, x)、z->(x, y)，
+# 讓 e_u x e_v 指向 +軸，四個角落自然是從外側看的逆時針順序。
+FACES = [(0, 1), (0, -1), (1, 1), (1, -1), (2, 1), (2, -1)]
+FACE_NORMALS = np.array([[1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1]],
+                        dtype=np.float32)
+UV_AXES = {0: (1, 2), 1: (2, 0), 2: (0, 1)}
+# 四個角落 c0..c3 在 (u, v) 上的方向，用來找 AO 的側邊與對角鄰居
+CORNER_DIRS = ((-1, -1), (1, -1), (1, 1), (-1, 1))
+NEIGHBOURS = [(dx, dz) for dx in (-1, 0, 1) for dz in (-1, 0, 1) if dx or dz]
+
+EMPTY_MESH = {
+    "corners": np.zeros((0, 4, 3), dtype=np.float32),
+    "normals": np.zeros(0, dtype=np.int8),
+    "colors": np.zeros((0, 4, 3), dtype=np.uint8),
+}
+
+def _greedy(mask):
+    """
+    [功能 41] 在 2D 面遮罩上做貪婪合併：合併鍵相同的相鄰面合併成最大的長方形。
+    mask 為合併鍵 (0 = 沒有面)，回傳 (u0, v0, u1, v1) 列表。
+    """
+    used = np.zeros(mask.shape, dtype=bool)
+    U, V = mask.shape
+    rects = []
+    for u0, v0 in zip(*np.nonzero(mask)):
+        if used[u0, v0]:
+            continue
+        key = mask[u0, v0]
+        row = mask[u0]
+        v1 = v0 + 1
+        while v1 < V and row[v1] == key and not used[u0, v1]:
+            v1 += 1
+        u1 = u0 + 1
+        while u1 < U and (mask[u1, v0:v1] == key).all() and not used[u1, v0:v1].any():
+            u1 += 1
+        used[u0:u1, v0:v1] = True
+        rects.append((int(u0), int(v0), int(u1), int(v1)))
+    return rects
+
+
+class GameXMesher:
+    """
+    [功能 41, 42, 43] 把區塊轉成快取的可見四邊形列表。
+    被實心鄰居擋住的面 (包含跨區塊邊界) 不產生；同平面同材質的面貪婪合併。
+    只有被標記為髒的區塊會重建，每幀的工作量取決於變動的區塊數而不是世界大小。
+    """
+    def __init__(self, world_map, budget_ms=REMESH_BUDGET_MS):
+        self.world_map = world_map
+        self.budget_ms = budget_ms
+        self.meshes = {}        # (cx, cz) -> mesh dict
+        self.dirty = set()
+        self.version = 0        # 任何網格變動就 +1，渲染器據此更新場景
+        self.changed = set()    # 上次 take_changed() 之後網格重建或移除的區塊
+        self.shades = face_shades()
+        self.ao_levels = np.array(AO_LEVELS, dtype=np.float32)
+        self.light_levels = light_levels()
+
+        # 統計數據
+        self.rebuilt = 0
+        self.last_update_ms = 0.0
+
+    # --- 髒標記 ---
+    def mark_dirty(self, cx, cz):
+        if (cx, cz) in self.world_map.chunks:
+            self.dirty.add((cx, cz))
+
+    def mark_block_dirty(self, pos):
+        """方塊被挖掘/放置：重建所在區塊，位於邊界時連鄰居 (含斜角，AO 會用到) 一起"""
+        x, _, z = pos
+        cx, cz = x // CHUNK_SIZE, z // CHUNK_SIZE
+        lx, lz = x - cx * CHUNK_SIZE, z - cz * CHUNK_SIZE
+        dxs = [0] + [-1] * (lx == 0) + [1] * (lx == CHUNK_SIZE - 1)
+        dzs = [0] + [-1] * (lz == 0) + [1] * (lz == CHUNK_SIZE - 1)
+        for dx in dxs:
+            for dz in dzs:
+                self.mark_dirty(cx + dx, cz + dz)
+
+    def on_chunk_loaded(self, chunk):
+        """新區塊併入：自己要建網格，周圍八個鄰居的邊界面與 AO 也可能改變"""
+        cx, cz = chunk.cx, chunk.cz
+        self.mark_dirty(cx, cz)
+        for dx, dz in NEIGHBOURS:
+            self.mark_dirty(cx + dx, cz + dz)
+
+    def on_chunk_unloaded(self, chunk):
+        cx, cz = chunk.cx, chunk.cz
+        self.dirty.discard((cx, cz))
+        if self.meshes.pop((cx, cz), None) is not None:
+            self.changed.add((cx, cz))
+            self.version += 1
+        for dx, dz in NEIGHBOURS:
+            self.mark_dirty(cx + dx, cz + dz)
+
+    # --- 每幀更新 ---
+    def update(self, center=None):
+        """在時間預算內重建髒區塊 (靠近 center 的優先)，回傳重建數量"""
+        if not self.dirty:
+            return 0
+        start = time.perf_counter()
+        deadline = start + self.budget_ms / 1000
+        keys = self.dirty
+        if center is not None:
+            keys = sorted(keys, key=lambda k: (k[0] - center[0]) ** 2 + (k[1] - center[1]) ** 2)
+        built = 0
+        for key in list(keys):
+            self.dirty.discard(key)
+            chunk = self.world_map.chunks.get(key)
+            if chunk is not None:
+                self.meshes[key] = self.build(chunk)
+                self.changed.add(key)
+                built += 1
+            if time.perf_counter() >= deadline:
+                break
+        self.rebuilt += built
+        if built:
+            self.version += 1
+        self.last_update_ms = (time.perf_counter() - start) * 1000
+        return built
+
+    def take_changed(self):
+        """取出並清空變動過的區塊 (渲染器只更新這些區塊在合併緩衝區裡的範圍)"""
+        changed, self.changed = self.changed, set()
+        return changed
+
+    # --- 網格建構 ---
+    def _neighbourhood(self, chunk, field, fill):
+        """
+        區塊本身加上一圈鄰居邊界 (含斜角的柱子) 的 field(區塊) 值 (S+2, H+2, S+2)，
+        未載入的鄰居與上下兩端填 fill。
+        """
+        S = CHUNK_SIZE
+        out = np.full((S + 2, CHUNK_HEIGHT + 2, S + 2), fill, dtype=np.asarray(fill).dtype)
+        out[1:-1, 1:-1, 1:-1] = field(chunk)
+        chunks = self.world_map.chunks
+        n = chunks.get((chunk.cx - 1, chunk.cz))
+        if n is not None: out[0, 1:-1, 1:-1] = field(n)[S - 1]
+        n = chunks.get((chunk.cx + 1, chunk.cz))
+        if n is not None: out[S + 1, 1:-1, 1:-1] = field(n)[0]
+        n = chunks.get((chunk.cx, chunk.cz - 1))
+        if n is not None: out[1:-1, 1:-1, 0] = field(n)[:, :, S - 1]
+        n = chunks.get((chunk.cx, chunk.cz + 1))
+        if n is not None: out[1:-1, 1:-1, S + 1] = field(n)[:, :, 0]
+        for dx, dz in ((-1, -1), (-1, 1), (1, -1), (1, 1)):
+            n = chunks.get((chunk.cx + dx, chunk.cz + dz))
+            if n is not None:
+                x, z = (0, S - 1)[dx < 0], (0, S - 1)[dz < 0]
+                out[(0, S + 1)[dx > 0], 1:-1, (0, S + 1)[dz > 0]] = field(n)[x, :, z]
+        return out
+
+    def _occupancy(self, chunk):
+        """佔用遮罩 (S+2, H+2, S+2)，未載入的鄰居視為空氣"""
+        return self._neighbourhood(chunk, lambda c: c.blocks != AIR, False)
+
+    def _light(self, chunk):
+        """[功能 21] 每格的亮度等級 max(天空光, 方塊光) (S+2, H+2, S+2)，未載入的鄰居與頂端以上視為全亮"""
+        light = self._neighbourhood(chunk, lambda c: c.light, np.uint8(0xF0))
+        return np.maximum(light >> 4, light & 0xF)
+
+    @staticmethod
+    def _shifted(occ, offsets):
+        """取內部 (S, H, S) 範圍依 offsets (每軸 -1/0/+1) 平移後的佔用"""
+        return occ[tuple(slice(1 + o, n - 1 + o) for o, n in zip(offsets, occ.shape))]
+
+    def _face_ao(self, occ, axis, sign, u_axis, v_axis):
+        """
+        [功能 24] 每個面四個角落的 AO 等級 (4, S, H, S)，0 = 最暗、3 = 沒有遮蔽。
+        看面外側那一層：角落兩側與對角的方塊，兩側都擋住時視為全暗。
+        """
+        levels = []
+        for du, dv in CORNER_DIRS:
+            side1, side2, corner = [0, 0, 0], [0, 0, 0], [0, 0, 0]
+            for off in (side1, side2, corner):
+                off[axis] = sign
+            side1[u_axis] = corner[u_axis] = du
+            side2[v_axis] = corner[v_axis] = dv
+            s1, s2, c = (self._shifted(occ, o) for o in (side1, side2, corner))
+            level = 3 - (s1.astype(np.uint8) + s2 + c)
+            levels.append(np.where(s1 & s2, 0, level).astype(np.uint8))
+        return np.stack(levels)
+
+    def build(self, chunk):
+        """
+        產生區塊的可見四邊形：corners (N, 4, 3)、normals (N,)，
+        以及烘焙好方向光與 AO 的頂點顏色 colors (N, 4, 3)。
+        """
+        if chunk.count == 0:
+            return EMPTY_MESH
+        occ = self._occupancy(chunk)
+        light = self._light(chunk)
+        blocks = chunk.blocks
+        inner = occ[1:-1, 1:-1, 1:-1]
+        origin = np.array([chunk.ox, CHUNK_MIN_Y, chunk.oz], dtype=np.float32)
+        palette_colors = np.array([DEFAULT_BLOCK_COLOR] + [BLOCK_COLORS.get(n, DEFAULT_BLOCK_COLOR)
+                                  for n in chunk.palette[1:]], dtype=np.float32)
+        unique = -1 - np.arange(inner.size, dtype=np.int64).reshape(inner.shape)
+
+        corners, normals, ids, aos, levels = [], [], [], [], []
+        for face, (axis, sign) in enumerate(FACES):
+            # 面剔除 [功能 42, 43]：鄰格 (含鄰近區塊) 是實心就不產生這個面
+            offsets = [0, 0, 0]
+            offsets[axis] = sign
+            visible = inner & ~self._shifted(occ, offsets)
+            if not visible.any():
+                continue
+            u_axis, v_axis = UV_AXES[axis]
+            ao = self._face_ao(occ, axis, sign, u_axis, v_axis)
+            code = ao[0] | (ao[1] << 2) | (ao[2] << 4) | (ao[3] << 6)
+            # [功能 21] 面的亮度取面外側那一格的光照等級
+            lit = self._shifted(light, offsets)
+            # 合併鍵：同方塊、同光照且四角 AO 一致的面才能合併 (內部頂點亮度不變，內插結果完全一樣)；
+            # AO 不一致的面用獨一無二的負數鍵，保持單獨一格
+            uniform = (ao[0] == ao[1]) & (ao[0] == ao[2]) & (ao[0] == ao[3])
+            keys = np.where(uniform, (blocks.astype(np.int64) * 16 + lit) * 256 + code, unique)
+            keys = np.where(visible, keys, 0)
+            for layer in np.nonzero(visible.any(axis=tuple(a for a in range(3) if a != axis)))[0]:
+                index = [slice(None)] * 3
+                index[axis] = layer
+                index = tuple(index)
+                mask, layer_ids, layer_ao = keys[index], blocks[index], ao[(slice(None),) + index]
+                layer_lit = lit[index]
+                if u_axis > v_axis: # 切片後的維度順序是 (小軸, 大軸)
+                    mask, layer_ids, layer_ao = mask.T, layer_ids.T, layer_ao.transpose(0, 2, 1)
+                    layer_lit = layer_lit.T
+                for u0, v0, u1, v1 in _greedy(mask):
+                    quad = np.zeros((4, 3), dtype=np.float32)
+                    quad[:, axis] = layer + 0.5 * sign
+                    quad[:, u_axis] = (u0 - 0.5, u1 - 0.5, u1 - 0.5, u0 - 0.5)
+                    quad[:, v_axis] = (v0 - 0.5, v0 - 0.5, v1 - 0.5, v1 - 0.5)
+                    corner_ao = layer_ao[:, u0, v0]
+                    if sign < 0:
+                        quad, corner_ao = quad[::-1], corner_ao[::-1]
+                    corners.append(quad)
+                    normals.append(face)
+                    ids.append(layer_ids[u0, v0])
+                    aos.append(corner_ao)
+                    levels.append(layer_lit[u0, v0])
+
+        if not corners:
+            return EMPTY_MESH
+        normals = np.array(normals, dtype=np.int8)
+        # [功能 21, 24] 方向光 x AO x 光照等級只在建網格時算一次
+        light = (self.shades[normals] * self.light_levels[np.array(levels)])[:, None] * self.ao_levels[np.array(aos)]
+        colors = palette_colors[np.array(ids)][:, None, :] * light[..., None]
+        return {
+            "corners": np.stack(corners) + origin,
+            "normals": normals,
+            "colors": np.rint(colors).astype(np.uint8),
+        }
+
+    # --- 監控數據 ---
+    def stats(self):
+        return {
+            "meshes": len(self.meshes),
+            "dirty": len(self.dirty),
+            "quads": sum(len(m["normals"]) for m in self.meshes.values()),
+            "rebuilt": self.rebuilt,
+            "update_ms": self.last_update_ms,
+        }
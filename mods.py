@@ -0,0 +1,183 @@
+import time
+
+# --- Mod 常數 (Mod Constants) ---
+MOD_BUDGET_MS = 1.0     # 每個 mod 每幀可以用的時間 (毫秒)，超過就延後或略過
+MOD_MAX_ERRORS = 20     # 丟出這麼多次例外的 mod 會被停用
+
+# mod 這一幀超出預算後，各種事件的處理方式 (監聽函式一律在主執行緒執行)
+OVERRUN_RUN = "run"     # 照樣執行：呼叫端馬上要結果，或略過會讓世界隨幀時間而不同
+OVERRUN_DEFER = "defer" # 排到下一幀開頭執行，不會遺失
+OVERRUN_SKIP = "skip"   # 略過：每 tick 都會發生、少一次無妨的事件
+
+
+# --- [功能 50] 事件型別 ---
+class GameXEvent:
+    """
+    所有事件的基底。overrun 決定 mod 超出這一幀的預算時怎麼處理 (OVERRUN_*)，
+    預設延到下一幀；監聽函式永遠在主執行緒執行，不會跟光照、網格與區塊併入搶同一份資料。
+    """
+    __slots__ = ()
+    overrun = OVERRUN_DEFER
+
+class BlockBreakEvent(GameXEvent):
+    """[功能 31] 玩家挖掉一個方塊之後"""
+    __slots__ = ("pos", "block")
+    def __init__(self, pos, block):
+        self.pos, self.block = pos, block
+
+class BlockPlaceEvent(GameXEvent):
+    """[功能 32] 玩家放置一個方塊之後"""
+    __slots__ = ("pos", "block")
+    def __init__(self, pos, block):
+        self.pos, self.block = pos, block
+
+class ChunkGeneratedEvent(GameXEvent):
+    """[功能 11] 新區塊生成完成 (主執行緒，併入世界之前)"""
+    __slots__ = ("chunk",)
+    overrun = OVERRUN_RUN   # 區塊只生成一次，略過或延後都會讓同一個種子的世界不一樣
+    def __init__(self, chunk):
+        self.chunk = chunk
+
+class PhysicsTickEvent(GameXEvent):
+    """[功能 1-10] 每個固定步長的物理 tick 之後"""
+    __slots__ = ("physics", "world_map")
+    overrun = OVERRUN_SKIP
+    def __init__(self, physics, world_map):
+        self.physics, self.world_map = physics, world_map
+
+class CommandEvent(GameXEvent):
+    """[功能 45] 內建指令以外的指令；處理了就把 handled 設成 True"""
+    __slots__ = ("command", "args", "handled")
+    overrun = OVERRUN_RUN   # 呼叫端在 emit 之後馬上讀 handled
+    def __init__(self, command, args):
+        self.command, self.args, self.handled = command, args, False
+
+
+class GameXMod:
+    """一個 mod：它訂閱的監聽函式、每幀預算與累計的成本統計"""
+    def __init__(self, bus, name, budget_ms=MOD_BUDGET_MS):
+        self.bus = bus
+        self.name = name
+        self.budget_ms = budget_ms
+        self.enabled = True
+
+        # 統計數據
+        self.frame_ms = 0.0     # 這一幀已經用掉的時間
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.calls = 0
+        self.skipped = 0
+        self.deferred = 0
+        self.errors = 0
+        self.last_error = None
+
+    def on(self, event_type, fn=None):
+        """訂閱事件：mod.on(BlockBreakEvent, fn)，或當裝飾器 @mod.on(BlockBreakEvent)"""
+        if fn is None:
+            return lambda f: self.on(event_type, f)
+        self.bus.subscribe(event_type, fn, self)
+        return fn
+
+    def _failed(self, error):
+        self.errors += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        if self.errors >= MOD_MAX_ERRORS:
+            self.enabled = False
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "budget_ms": self.budget_ms,
+            "calls": self.calls,
+            "total_ms": self.total_ms,
+            "frame_ms": self.frame_ms,
+            "max_ms": self.max_ms,
+            "skipped": self.skipped,
+            "deferred": self.deferred,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+class GameXEventBus:
+    """
+    [功能 50] Mod 事件匯流排。
+    每種事件的監聽列表是預先組好的 tuple，沒有人監聽時 emit 只做一次 dict 查詢，連事件物件都不建立。
+    每次呼叫都計時並記在所屬 mod 上；mod 這一幀超出預算後，依事件的 overrun 照樣執行、
+    延到下一幀開頭或略過，慢的 mod 不會拖垮幀率。
+    """
+    def __init__(self):
+        self.mods = {}
+        self.listeners = {}     # 事件型別 -> ((mod, fn), ...)
+        self.deferred = []      # 延到下一幀的 (mod, fn, event)
+
+    # --- 註冊 ---
+    def register_mod(self, name, budget_ms=MOD_BUDGET_MS):
+        mod = self.mods.get(name)
+        if mod is None:
+            mod = self.mods[name] = GameXMod(self, name, budget_ms)
+        return mod
+
+    def subscribe(self, event_type, fn, mod):
+        self.listeners[event_type] = self.listeners.get(event_type, ()) + ((mod, fn),)
+
+    def unsubscribe(self, event_type, fn):
+        self.listeners[event_type] = tuple(l for l in self.listeners.get(event_type, ()) if l[1] is not fn)
+
+    def remove_mod(self, name):
+        mod = self.mods.pop(name, None)
+        for event_type, listeners in self.listeners.items():
+            self.listeners[event_type] = tuple(l for l in listeners if l[0] is not mod)
+
+    def has_listeners(self, event_type):
+        return bool(self.listeners.get(event_type))
+
+    # --- 分派 ---
+    def begin_frame(self):
+        """每幀開始時呼叫：重置各 mod 這一幀的預算，再執行上一幀延後的事件 (算進這一幀的預算)"""
+        for mod in self.mods.values():
+            mod.frame_ms = 0.0
+        self.flush()
+
+    def emit(self, event_type, *args):
+        """發出事件；沒有監聽者時回傳 None，否則回傳事件物件 (例如讀 CommandEvent.handled)"""
+        listeners = self.listeners.get(event_type)
+        if not listeners:
+            return None
+        event = event_type(*args)
+        for mod, fn in listeners:
+            if not mod.enabled:
+                continue
+            if mod.frame_ms >= mod.budget_ms and event.overrun != OVERRUN_RUN:
+                if event.overrun == OVERRUN_DEFER:
+                    mod.deferred += 1
+                    self.deferred.append((mod, fn, event))
+                else:
+                    mod.skipped += 1
+                continue
+            self._call(mod, fn, event)
+        return event
+
+    def _call(self, mod, fn, event):
+        start = time.perf_counter()
+        try:
+            fn(event)
+        except Exception as e:
+            mod._failed(e)
+        ms = (time.perf_counter() - start) * 1000
+        mod.frame_ms += ms
+        mod.total_ms += ms
+        mod.max_ms = max(mod.max_ms, ms)
+        mod.calls += 1
+
+    def flush(self):
+        """馬上執行所有延後的事件 (每幀開始與關閉遊戲、存檔之前)"""
+        deferred, self.deferred = self.deferred, []
+        for mod, fn, event in deferred:
+            if mod.enabled:
+                self._call(mod, fn, event)
+
+    # --- 監控數據 ---
+    def stats(self):
+        """各 mod 的成本統計 {名稱: {...}}"""
+        return {name: mod.stats() for name, mod in self.mods.items()}
@@ -0,0 +1,108 @@
+import numpy as np
+
+# --- 雜訊常數 (Noise Constants) ---
+PERM_SIZE = 256
+
+# 2D 梯度：8 個方向
+GRAD2 = np.array([[1, 1], [-1, 1], [1, -1], [-1, -1],
+                  [1, 0], [-1, 0], [0, 1], [0, -1]], dtype=np.float64)
+# 3D 梯度：立方體 12 條邊 (補到 16 個方便用位元遮罩)
+GRAD3 = np.array([[1, 1, 0], [-1, 1, 0], [1, -1, 0], [-1, -1, 0],
+                  [1, 0, 1], [-1, 0, 1], [1, 0, -1], [-1, 0, -1],
+                  [0, 1, 1], [0, -1, 1], [0, 1, -1], [0, -1, -1],
+                  [1, 1, 0], [0, -1, 1], [-1, 1, 0], [0, -1, -1]], dtype=np.float64)
+# 拆成分量表，查表時不必配置 (N, 3) 的暫存陣列
+GRAD2_X, GRAD2_Z = GRAD2[:, 0].copy(), GRAD2[:, 1].copy()
+GRAD3_X, GRAD3_Y, GRAD3_Z = GRAD3[:, 0].copy(), GRAD3[:, 1].copy(), GRAD3[:, 2].copy()
+
+def chunk_seed(seed, cx, cz, salt=0):
+    """[功能 14] 由 (seed, cx, cz) 推導出區塊專屬的亂數種子，與生成順序無關"""
+    return np.random.SeedSequence([seed & 0xFFFFFFFF, cx & 0xFFFFFFFF, cz & 0xFFFFFFFF, salt])
+
+def _fade(t):
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+class GameXNoise:
+    """
+    [功能 12, 16] 以 NumPy 批次計算的梯度雜訊 (Perlin)。
+    同一個 seed 與 salt 永遠得到同一張雜訊場，輸入可以是任意形狀的座標陣列。
+    """
+    def __init__(self, seed, salt=0):
+        rng = np.random.default_rng([seed & 0xFFFFFFFF, salt])
+        perm = rng.permutation(PERM_SIZE)
+        self.perm = np.concatenate([perm, perm]).astype(np.int64)
+
+    # --- 單層 2D 雜訊 ---
+    def noise2(self, x, z):
+        x, z = np.asarray(x, dtype=np.float64), np.asarray(z, dtype=np.float64)
+        x0, z0 = np.floor(x), np.floor(z)
+        fx, fz = x - x0, z - z0
+        xi = x0.astype(np.int64) & (PERM_SIZE - 1)
+        zi = z0.astype(np.int64) & (PERM_SIZE - 1)
+        p = self.perm
+
+        def grad(hx, hz, dx, dz):
+            h = p[p[hx] + hz] & 7
+            return GRAD2_X[h] * dx + GRAD2_Z[h] * dz
+
+        n00 = grad(xi, zi, fx, fz)
+        n10 = grad(xi + 1, zi, fx - 1, fz)
+        n01 = grad(xi, zi + 1, fx, fz - 1)
+        n11 = grad(xi + 1, zi + 1, fx - 1, fz - 1)
+        u, v = _fade(fx), _fade(fz)
+        nx0 = n00 + u * (n10 - n00)
+        nx1 = n01 + u * (n11 - n01)
+        return nx0 + v * (nx1 - nx0)
+
+    # --- 單層 3D 雜訊 ---
+    def noise3(self, x, y, z):
+        x, y, z = (np.asarray(a, dtype=np.float64) for a in (x, y, z))
+        x0, y0, z0 = np.floor(x), np.floor(y), np.floor(z)
+        fx, fy, fz = x - x0, y - y0, z - z0
+        xi = x0.astype(np.int64) & (PERM_SIZE - 1)
+        yi = y0.astype(np.int64) & (PERM_SIZE - 1)
+        zi = z0.astype(np.int64) & (PERM_SIZE - 1)
+        p = self.perm
+
+        def grad(hx, hy, hz, dx, dy, dz):
+            h = p[p[p[hx] + hy] + hz] & 15
+            return GRAD3_X[h] * dx + GRAD3_Y[h] * dy + GRAD3_Z[h] * dz
+
+        u, v, w = _fade(fx), _fade(fy), _fade(fz)
+        n000 = grad(xi, yi, zi, fx, fy, fz)
+        n100 = grad(xi + 1, yi, zi, fx - 1, fy, fz)
+        n010 = grad(xi, yi + 1, zi, fx, fy - 1, fz)
+        n110 = grad(xi + 1, yi + 1, zi, fx - 1, fy - 1, fz)
+        n001 = grad(xi, yi, zi + 1, fx, fy, fz - 1)
+        n101 = grad(xi + 1, yi, zi + 1, fx - 1, fy, fz - 1)
+        n011 = grad(xi, yi + 1, zi + 1, fx, fy - 1, fz - 1)
+        n111 = grad(xi + 1, yi + 1, zi + 1, fx - 1, fy - 1, fz - 1)
+        nx00 = n000 + u * (n100 - n000)
+        nx10 = n010 + u * (n110 - n010)
+        nx01 = n001 + u * (n101 - n001)
+        nx11 = n011 + u * (n111 - n011)
+        nxy0 = nx00 + v * (nx10 - nx00)
+        nxy1 = nx01 + v * (nx11 - nx01)
+        return nxy0 + w * (nxy1 - nxy0)
+
+    # --- [功能 12] 多層次疊加 (Fractal Brownian Motion) ---
+    def fbm2(self, x, z, octaves=4, persistence=0.5, lacunarity=2.0):
+        """多層 2D 雜訊疊加，輸出大約落在 [-1, 1]"""
+        total, amp, freq, norm = 0.0, 1.0, 1.0, 0.0
+        for _ in range(octaves):
+            total = total + self.noise2(np.multiply(x, freq), np.multiply(z, freq)) * amp
+            norm += amp
+            amp *= persistence
+            freq *= lacunarity
+        return total / norm
+
+    def fbm3(self, x, y, z, octaves=2, persistence=0.5, lacunarity=2.0):
+        """多層 3D 雜訊疊加，輸出大約落在 [-1, 1]"""
+        total, amp, freq, norm = 0.0, 1.0, 1.0, 0.0
+        for _ in range(octaves):
+            total = total + self.noise3(np.multiply(x, freq), np.multiply(y, freq),
+                                        np.multiply(z, freq)) * amp
+            norm += amp
+            amp *= persistence
+            freq *= lacunarity
+        return total / norm
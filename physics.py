@@ -1,7 +1,10 @@
 import pygame
 import math
+from chunk_data import CHUNK_SIZE, CHUNK_HEIGHT, CHUNK_MIN_Y
+from mods import PhysicsTickEvent
+from fluids import FLUIDS, WATER_LEVEL, SOURCE_LEVEL
 
-# 物理常數設定 (Physics Constants)
+# 物理常數設定 (Physics Constants)，速度單位為「格 / tick」
 GRAVITY = -0.012          # [功能 2] 重力
 TERMINAL_VELOCITY = -0.5  # 終端速度
 WALK_SPEED = 0.15         # 步行速度
@@ -9,10 +12,31 @@ SPRINT_SPEED = 0.25       # [功能 10] 衝刺/慣性基準
 JUMP_FORCE = 0.22         # [功能 3] 跳躍力
 WATER_DRAG = 0.4          # [功能 8] 水中阻力係數
 
+# 固定時間步長 (Fixed Timestep)
+TICK_RATE = 60            # 每秒模擬次數，與畫面 FPS 無關
+TICK_DT = 1 / TICK_RATE
+MAX_TICKS_PER_FRAME = 5   # 卡頓時最多補算幾步，避免越補越慢
+
+# [功能 4] 玩家碰撞箱 (pos 是眼睛的位置；方塊 b 佔據 [b - 0.5, b + 0.5))
+PLAYER_HALF_WIDTH = 0.3
+PLAYER_HEIGHT = 1.8
+EYE_HEIGHT = 1.62
+SKIN = 1e-3               # 停在方塊表面外的一點距離，避免浮點誤差卡進方塊
+NON_SOLID = FLUIDS        # 可以穿過的方塊
+
+# [功能 6] 摔落傷害
+FALL_DAMAGE_SPEED = 0.4   # 落地速度超過這個值才受傷
+FALL_DAMAGE_SCALE = 40    # 每超過 1 格/tick 扣的血量
+
+def _cells(lo, hi):
+    """與開區間 (lo, hi) 重疊的方塊座標範圍"""
+    return range(math.floor(lo + 0.5), math.ceil(hi + 0.5))
+
 class GameXPhysics:
     def __init__(self):
         # 玩家狀態 [功能 1]
         self.pos = [0, 10, 0]    # 座標 (x, y, z)
+        self.prev_pos = list(self.pos) # 上一個 tick 的位置 (畫面內插用)
         self.vel = [0, 0, 0]     # 速度向量 (vx, vy, vz)
         self.look_x = 0          # 抬頭角度
         self.look_y = 0          # 轉身角度
@@ -20,27 +44,119 @@ class GameXPhysics:
         self.is_grounded = False # 是否在地面 [功能 4]
         self.is_flying = False   # [功能 7] 飛行模式
         self.in_water = False    # [功能 8] 是否在水中
+        self.pending_damage = 0  # [功能 6] 尚未套用到 HUD 的摔落傷害
         
         # 慣性緩衝 [功能 10]
         self.friction = 0.85
 
+        # 固定時間步長累加器
+        self.accumulator = 0.0
+        self.ticks = 0
+        self.events = None       # [功能 50] 選用的 GameXEventBus
+
     # --- [功能 1] 第一人稱視角控制 API ---
     def apply_mouse_movement(self, dx, dy, sensitivity=0.2):
         self.look_y += dx * sensitivity
         self.look_x = max(-89, min(89, self.look_x + dy * sensitivity))
 
+    @property
+    def render_pos(self):
+        """畫面用的位置：在上一個與目前 tick 之間依累加器內插，畫面更新率再高都平滑"""
+        alpha = self.accumulator / TICK_DT
+        return [p + (c - p) * alpha for p, c in zip(self.prev_pos, self.pos)]
+
+    @property
+    def center(self):
+        """碰撞箱中心 (pos 是眼睛的位置)，例如撿東西的距離從這裡算"""
+        x, y, z = self.pos
+        return [x, y - EYE_HEIGHT + PLAYER_HEIGHT / 2, z]
+
+    def spawn(self, world_map, x=0, z=0):
+        """把玩家放到 (x, z) 這一柱最高的實心方塊上"""
+        bx, bz = round(x), round(z)
+        top = None
+        for y in range(CHUNK_MIN_Y + CHUNK_HEIGHT - 1, CHUNK_MIN_Y - 1, -1):
+            block = world_map.get((bx, y, bz))
+            if block is not None and block not in NON_SOLID:
+                top = y
+                break
+        feet = (top + 0.5 + SKIN) if top is not None else self.pos[1] - EYE_HEIGHT
+        self.pos = [float(x), feet + EYE_HEIGHT, float(z)]
+        self.prev_pos = list(self.pos)
+        self.vel = [0, 0, 0]
+
     # --- [功能 4] AABB 碰撞偵測核心 ---
+    def _box(self, pos=None):
+        """玩家碰撞箱 (最小角, 最大角)"""
+        x, y, z = pos or self.pos
+        feet = y - EYE_HEIGHT
+        return ((x - PLAYER_HALF_WIDTH, feet, z - PLAYER_HALF_WIDTH),
+                (x + PLAYER_HALF_WIDTH, feet + PLAYER_HEIGHT, z + PLAYER_HALF_WIDTH))
+
+    def _solid(self, world_map, x, y, z):
+        block = world_map.get((x, y, z))
+        if block is None:
+            # 還沒載入的區塊當成牆，避免在串流完成前掉出世界
+            return hasattr(world_map, "has_chunk") and not world_map.has_chunk(x // CHUNK_SIZE, z // CHUNK_SIZE)
+        return block not in NON_SOLID
+
     def check_collision(self, next_pos, world_map):
-        """簡單的點對方塊碰撞偵測"""
-        # 檢查腳下、頭頂與身體四周是否有固體方塊
-        bx, by, bz = round(next_pos[0]), round(next_pos[1]), round(next_pos[2])
-        # 這裡假設 world_map 儲存了固體方塊的座標
-        if (bx, by, bz) in world_map:
-            return True
-        return False
+        """玩家碰撞箱放在 next_pos 時是否與任何實心方塊重疊"""
+        lo, hi = self._box(next_pos)
+        return any(self._solid(world_map, x, y, z)
+                   for x in _cells(lo[0], hi[0]) for y in _cells(lo[1], hi[1]) for z in _cells(lo[2], hi[2]))
+
+    def _sweep(self, world_map, axis, delta):
+        """
+        沿單一軸掃掠碰撞箱：依序檢查前緣在這一步會經過的每一層方塊，
+        只看碰撞箱在另外兩軸覆蓋的幾格。碰到實心方塊就停在它的表面，回傳實際位移。
+        """
+        if delta == 0:
+            return 0.0
+        lo, hi = self._box()
+        a, b = [i for i in range(3) if i != axis]
+        span_a, span_b = _cells(lo[a], hi[a]), _cells(lo[b], hi[b])
+        cell = [0, 0, 0]
+        if delta > 0:
+            layers = range(math.ceil(hi[axis] + 0.5 - 1e-7), math.ceil(hi[axis] + delta + 0.5))
+        else:
+            layers = range(math.floor(lo[axis] - 0.5 + 1e-7), math.floor(lo[axis] + delta - 0.5), -1)
+        for layer in layers:
+            cell[axis] = layer
+            for i in span_a:
+                cell[a] = i
+                for j in span_b:
+                    cell[b] = j
+                    if self._solid(world_map, *cell):
+                        if delta > 0:
+                            return max(0.0, layer - 0.5 - SKIN - hi[axis])
+                        return min(0.0, layer + 0.5 + SKIN - lo[axis])
+        return delta
 
     # --- [功能 2, 3, 7, 8, 9, 10] 綜合運動更新 ---
-    def update(self, keys, world_map):
+    def update(self, keys, world_map, dt=None):
+        """
+        固定時間步長：累積這一幀經過的秒數 dt，每滿 TICK_DT 就模擬一步。
+        沒給 dt 時直接模擬一步 (舊的每幀一步行為)。
+        """
+        if dt is None:
+            self.accumulator = 0.0
+            self.step(keys, world_map)
+            return 1
+        self.accumulator += dt
+        steps = 0
+        while self.accumulator >= TICK_DT and steps < MAX_TICKS_PER_FRAME:
+            self.accumulator -= TICK_DT
+            self.step(keys, world_map)
+            steps += 1
+        if steps == MAX_TICKS_PER_FRAME:
+            self.accumulator = min(self.accumulator, TICK_DT) # 卡太久的時間直接丟掉
+        return steps
+
+    def step(self, keys, world_map):
+        """模擬一個 tick"""
+        self.prev_pos = list(self.pos)
+        self.ticks += 1
         dt_speed = SPRINT_SPEED if keys[pygame.K_LSHIFT] else WALK_SPEED
         
         # 1. 處理水中阻力 [功能 8]
@@ -76,20 +192,34 @@ class GameXPhysics:
             elif keys[pygame.K_LCTRL]: self.vel[1] = -0.2
             else: self.vel[1] *= 0.5
 
-        # 4. 最終位置計算與碰撞偵測 [功能 4]
-        next_x = self.pos[0] + self.vel[0]
-        next_y = self.pos[1] + self.vel[1]
-        next_z = self.pos[2] + self.vel[2]
+        # 4. 逐軸掃掠碰撞 [功能 4]：先 Y 再 X、Z，撞到的軸速度歸零
+        was_grounded = self.is_grounded
+        self.is_grounded = False
+        for axis in (1, 0, 2):
+            moved = self._sweep(world_map, axis, self.vel[axis])
+            self.pos[axis] += moved
+            if moved != self.vel[axis]:
+                if axis == 1 and self.vel[1] < 0:
+                    self.is_grounded = True
+                    # [功能 6] 依落地速度計算摔落傷害
+                    impact = -self.vel[1]
+                    if not was_grounded and impact > FALL_DAMAGE_SPEED and not self.in_water:
+                        self.pending_damage += math.ceil((impact - FALL_DAMAGE_SPEED) * FALL_DAMAGE_SCALE)
+                self.vel[axis] = 0
+
+        # 5. 水中判定 [功能 8]：碰撞箱覆蓋的格子裡有水，且水面 (流動的水依水位較低) 高過腳底
+        lo, hi = self._box()
+        self.in_water = any(y - 0.5 + WATER_LEVEL.get(world_map.get((x, y, z)), 0) / SOURCE_LEVEL > lo[1]
+                            for x in _cells(lo[0], hi[0]) for y in _cells(lo[1], hi[1])
+                            for z in _cells(lo[2], hi[2]))
 
-        # 簡單的 Y 軸地板檢查 (防止掉出世界)
-        if next_y < 1: # 假設 1 是地平線
-            next_y = 1
-            self.vel[1] = 0
-            self.is_grounded = True
-            # [功能 6] 這裡可以計算跌落傷害，如果速度過快
-            if self.vel[1] < -0.4: print("Ouch! Fall Damage!") 
+        if self.events is not None:
+            self.events.emit(PhysicsTickEvent, self, world_map)
 
-        self.pos = [next_x, next_y, next_z]
+    def take_damage(self):
+        """取出累積的摔落傷害 (由 HUD 扣血)"""
+        damage, self.pending_damage = self.pending_damage, 0
+        return damage
 
     # --- [功能 5] 腳步聲觸發 API ---
     def get_step_trigger(self):
@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+import pygame
+
+# --- 效能分析常數 (Profiler Constants) ---
+PROFILE_CAPACITY = 1 << 14   # 環狀緩衝區可以保留的區段數 (滿了覆蓋最舊的)
+STATS_WINDOW = 240           # 每個階段用最近幾筆算 p50 / p99
+OVERLAY_REFRESH = 0.5        # 覆蓋層每隔幾秒重畫一次 (秒)
+OVERLAY_FONT_SIZE = 14
+
+class _NullSpan:
+    """停用時共用的空區段，進出都不做事"""
+    __slots__ = ()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("profiler", "name", "start")
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class GameXProfiler:
+    """
+    [功能 48, 49] 每幀各階段的計時。
+    區段 (名稱、開始、長度、行程、執行緒) 寫進固定大小的 NumPy 環狀緩衝區；
+    停用時 span() 回傳共用的空區段，幾乎沒有成本。
+    可以算出各階段的 p50 / p99、畫成遊戲內覆蓋層，或匯出成 Chrome / Perfetto trace。
+    """
+    def __init__(self, capacity=PROFILE_CAPACITY, enabled=False):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.names = []          # 區段名稱 (索引存在緩衝區)
+        self.name_ids = {}
+        self.name_idx = np.zeros(capacity, dtype=np.int32)
+        self.start_ns = np.zeros(capacity, dtype=np.int64)
+        self.dur_ns = np.zeros(capacity, dtype=np.int64)
+        self.pid = np.zeros(capacity, dtype=np.int32)
+        self.tid = np.zeros(capacity, dtype=np.int64)
+        self.head = 0            # 總共寫入過幾筆 (head % capacity 是下一個位置)
+        self.main_pid = os.getpid()
+
+        # 覆蓋層
+        self.overlay_visible = False
+        self.overlay_layer = None
+        self.overlay_time = 0.0
+        self.font = None
+        self.status = []         # 覆蓋層表格下方的額外文字，fn() 回傳一行字串 (例如畫質等級)
+
+    # --- 記錄 ---
+    def span(self, name):
+        """with profiler.span("physics"): ... 量一段程式的時間"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, start_ns, end_ns, pid=None, tid=None):
+        """直接寫入一筆區段 (例如工作行程回報的生成時間)"""
+        if not self.enabled:
+            return
+        idx = self.name_ids.get(name)
+        if idx is None:
+            idx = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        i = self.head % self.capacity
+        self.name_idx[i] = idx
+        self.start_ns[i] = start_ns
+        self.dur_ns[i] = end_ns - start_ns
+        self.pid[i] = self.main_pid if pid is None else pid
+        self.tid[i] = threading.get_ident() if tid is None else tid
+        self.head += 1
+
+    def clear(self):
+        self.head = 0
+
+    def _valid(self):
+        """緩衝區裡有效的索引，由舊到新"""
+        n = min(self.head, self.capacity)
+        return (np.arange(self.head - n, self.head) % self.capacity)
+
+    # --- 統計 ---
+    def stage_stats(self, window=STATS_WINDOW):
+        """{名稱: {"p50_ms", "p99_ms", "count"}}，每個名稱取最近 window 筆"""
+        order = self._valid()
+        names = self.name_idx[order]
+        stats = {}
+        for idx, name in enumerate(self.names):
+            dur = self.dur_ns[order[names == idx]][-window:]
+            if len(dur):
+                p50, p99 = np.percentile(dur, (50, 99)) / 1e6
+                stats[name] = {"p50_ms": float(p50), "p99_ms": float(p99), "count": len(dur)}
+        return stats
+
+    # --- 覆蓋層 ---
+    def toggle_overlay(self):
+        """開關覆蓋層；開啟時同時開始記錄"""
+        self.overlay_visible = not self.overlay_visible
+        if self.overlay_visible:
+            self.enabled = True
+        self.overlay_layer = None
+
+    def layer(self, size):
+        """給 GameXCompositor 的圖層 (surface, rect)；每 OVERLAY_REFRESH 秒才重畫一次"""
+        if not self.overlay_visible:
+            return None
+        now = time.perf_counter()
+        if self.overlay_layer is None or now - self.overlay_time >= OVERLAY_REFRESH:
+            self.overlay_layer = self._render_overlay(size)
+            self.overlay_time = now
+        return self.overlay_layer
+
+    def _render_overlay(self, size):
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.SysFont("monospace", OVERLAY_FONT_SIZE)
+        rows = [("stage", "p50 ms", "p99 ms")]
+        rows += [(name, f"{s['p50_ms']:.2f}", f"{s['p99_ms']:.2f}") for name, s in self.stage_stats().items()]
+        cells = [[self.font.render(text, True, (255, 255, 255)) for text in row] for row in rows]
+        lines = [self.font.render(fn(), True, (255, 220, 120)) for fn in self.status]
+        # 每欄各自對齊 (系統沒有等寬字型時也排得整齊)
+        widths = [max(row[c].get_width() for row in cells) + 12 for c in range(3)]
+        line_h = self.font.get_linesize()
+        width = max([sum(widths)] + [line.get_width() + 12 for line in lines])
+        surf = pygame.Surface((width + 6, line_h * (len(rows) + len(lines)) + 8), pygame.SRCALPHA)
+        surf.fill((0, 0, 0, 160))
+        for i, row in enumerate(cells):
+            x = 6
+            for c, text in enumerate(row):
+                dx = 0 if c == 0 else widths[c] - 12 - text.get_width() # 數字靠右
+                surf.blit(text, (x + dx, 4 + i * line_h))
+                x += widths[c]
+        for i, line in enumerate(lines, len(rows)):
+            surf.blit(line, (6, 4 + i * line_h))
+        return surf, surf.get_rect(topright=(size[0] - 10, 10))
+
+    # --- 匯出 ---
+    def chrome_trace(self):
+        """緩衝區轉成 Chrome / Perfetto 的 trace 格式 (complete events，微秒)"""
+        order = self._valid()
+        events = []
+        for pid in sorted(set(self.pid[order].tolist())):
+            label = "GameXMain" if pid == self.main_pid else f"chunk worker {pid}"
+            events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": label}})
+        for i in order.tolist():
+            events.append({
+                "name": self.names[self.name_idx[i]],
+                "ph": "X",
+                "ts": int(self.start_ns[i]) / 1000,
+                "dur": int(self.dur_ns[i]) / 1000,
+                "pid": int(self.pid[i]),
+                "tid": int(self.tid[i]),
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path=None):
+        """寫出 trace JSON (可用 chrome://tracing 或 ui.perfetto.dev 開啟)，回傳檔名"""
+        if path is None:
+            path = f"perf_{time.strftime('%Y%m%d-%H%M%S')}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "spans": min(self.head, self.capacity),
+            "dropped": max(0, self.head - self.capacity),
+        }
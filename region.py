@@ -0,0 +1,289 @@
+import os
+import json
+import mmap
+import queue
+import struct
+import threading
+import time
+from chunk_data import GameXChunk, CHUNK_SIZE, CHUNK_MIN_Y, CHUNK_HEIGHT
+
+# --- Region 檔案格式常數 (Region File Format) ---
+REGION_SIZE = 32                      # 每個 region 檔包含 32x32 個區塊
+REGION_MAGIC = b"GXR1"
+REGION_HEADER = struct.Struct("<4sI") # 魔數、區塊邊長
+REGION_ENTRY = struct.Struct("<III")  # 偏移、資料長度、槽位容量
+TABLE_OFFSET = REGION_HEADER.size
+DATA_OFFSET = TABLE_OFFSET + REGION_ENTRY.size * REGION_SIZE * REGION_SIZE
+SLOT_ALIGN = 512                      # 槽位容量對齊，重寫時多半能原地覆蓋
+SAVE_COMPRESSION = 6                  # 存檔用的 zlib 壓縮等級
+
+class GameXRegionFile:
+    """
+    [功能 40] 一個 region 檔：標頭 + 偏移表 + 各區塊壓縮資料。
+    單一區塊可以直接由記憶體映射 (mmap) 讀出，重寫時盡量原地覆蓋原本的槽位。
+    """
+    def __init__(self, path):
+        self.path = path
+        exists = os.path.exists(path)
+        self.file = open(path, "r+b" if exists else "w+b")
+        if exists:
+            magic, size = REGION_HEADER.unpack(self.file.read(REGION_HEADER.size))
+            if magic != REGION_MAGIC or size != REGION_SIZE:
+                raise ValueError(f"Bad region file: {path}")
+            raw = self.file.read(DATA_OFFSET - TABLE_OFFSET)
+            self.table = [list(e) for e in REGION_ENTRY.iter_unpack(raw)]
+        else:
+            self.table = [[0, 0, 0] for _ in range(REGION_SIZE * REGION_SIZE)]
+            self.file.write(REGION_HEADER.pack(REGION_MAGIC, REGION_SIZE))
+            self.file.write(bytes(DATA_OFFSET - TABLE_OFFSET))
+            self.file.flush()
+        self._mmap = None
+
+    @staticmethod
+    def _slot(cx, cz):
+        return (cx % REGION_SIZE) * REGION_SIZE + (cz % REGION_SIZE)
+
+    def has(self, cx, cz):
+        return self.table[self._slot(cx, cz)][1] > 0
+
+    def keys(self, rx, rz):
+        """回傳這個 region 內有存檔的區塊座標"""
+        for slot, (_, length, _) in enumerate(self.table):
+            if length:
+                yield rx * REGION_SIZE + slot // REGION_SIZE, rz * REGION_SIZE + slot % REGION_SIZE
+
+    # --- 讀取 (mmap) ---
+    def read(self, cx, cz):
+        offset, length, _ = self.table[self._slot(cx, cz)]
+        if not length:
+            return None
+        if self._mmap is None:
+            self._mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap[offset:offset + length]
+
+    # --- 寫入 (只動到一個槽位與一筆偏移表) ---
+    def write(self, cx, cz, payload):
+        slot = self._slot(cx, cz)
+        offset, _, capacity = self.table[slot]
+        if len(payload) > capacity:
+            # 放不下：附加到檔尾並配置新槽位 (檔案變大，mmap 需要重建)
+            self.file.seek(0, os.SEEK_END)
+            offset = self.file.tell()
+            capacity = -(-len(payload) // SLOT_ALIGN) * SLOT_ALIGN
+            self._close_mmap()
+        self.file.seek(offset)
+        self.file.write(payload)
+        if len(payload) < capacity:
+            self.file.write(bytes(capacity - len(payload)))
+        self.table[slot] = [offset, len(payload), capacity]
+        self.file.seek(TABLE_OFFSET + slot * REGION_ENTRY.size)
+        self.file.write(REGION_ENTRY.pack(offset, len(payload), capacity))
+        self.file.flush()
+
+    def _close_mmap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def close(self):
+        self._close_mmap()
+        self.file.close()
+
+
+class GameXRegionStore:
+    """
+    [功能 40] 以 region 檔組成的世界存檔。
+    只寫入上次存檔後被動過的區塊 (chunk.unsaved)，壓縮與寫檔可交給背景執行緒。
+    """
+    def __init__(self, world_dir="world"):
+        self.world_dir = world_dir
+        os.makedirs(world_dir, exist_ok=True)
+        self.regions = {}
+        self.lock = threading.Lock()
+        self.jobs = queue.Queue()
+        self.writer = None
+        self.pending = {}    # 已排入背景但還沒寫完的快照，讀取時優先使用
+        self.failed = []     # 寫入失敗的快照 (仍留在 pending)，下次存檔或 flush 時重試
+        self.log = None      # 選用的 fn(message)，例如 GameXSystem.log_error
+
+        # 統計數據
+        self.saved_chunks = 0
+        self.write_errors = 0
+        self.last_error = None
+        self.last_save_ms = 0.0
+
+    def _region(self, cx, cz, create=False):
+        key = (cx // REGION_SIZE, cz // REGION_SIZE)
+        region = self.regions.get(key)
+        if region is None:
+            path = os.path.join(self.world_dir, f"r.{key[0]}.{key[1]}.gxr")
+            if not create and not os.path.exists(path):
+                return None
+            region = self.regions[key] = GameXRegionFile(path)
+        return region
+
+    # --- 讀取 API ---
+    def has_chunk(self, cx, cz):
+        with self.lock:
+            if (cx, cz) in self.pending:
+                return True
+            region = self._region(cx, cz)
+            return region is not None and region.has(cx, cz)
+
+    def load_chunk(self, cx, cz):
+        """讀出單一區塊 (只映射它所在的 region 檔)；沒有存檔回傳 None"""
+        with self.lock:
+            snap = self.pending.get((cx, cz))
+            if snap is not None:
+                return snap.copy()
+            region = self._region(cx, cz)
+            data = region.read(cx, cz) if region is not None else None
+        return GameXChunk.from_bytes(data) if data is not None else None
+
+    def chunk_keys(self):
+        """列出存檔內所有區塊座標"""
+        keys = []
+        with self.lock:
+            for name in os.listdir(self.world_dir):
+                parts = name.split(".")
+                if len(parts) == 4 and parts[0] == "r" and parts[3] == "gxr":
+                    rx, rz = int(parts[1]), int(parts[2])
+                    region = self._region(rx * REGION_SIZE, rz * REGION_SIZE)
+                    keys.extend(region.keys(rx, rz))
+        return keys
+
+    # --- 寫入 API ---
+    def save_chunk(self, chunk):
+        """同步寫入單一區塊"""
+        payload = chunk.to_bytes(SAVE_COMPRESSION)
+        with self.lock:
+            self._region(chunk.cx, chunk.cz, create=True).write(chunk.cx, chunk.cz, payload)
+            if self.pending.get((chunk.cx, chunk.cz)) is chunk:
+                del self.pending[(chunk.cx, chunk.cz)]
+        chunk.unsaved = False
+        self.saved_chunks += 1
+
+    def save_dirty(self, chunks, background=True):
+        """
+        增量存檔：只處理 unsaved 的區塊。
+        主執行緒只複製一份快照 (數 KB)，壓縮與寫檔在背景執行緒完成。
+        """
+        snapshots = []
+        for chunk in chunks:
+            if chunk.unsaved:
+                snapshots.append(chunk.copy())
+                chunk.unsaved = False
+        snapshots += self._take_failed()
+        if not snapshots:
+            return 0
+        # 同步寫入也先登記在 pending，寫入失敗時才能在下次存檔重試
+        with self.lock:
+            for snap in snapshots:
+                self.pending[(snap.cx, snap.cz)] = snap
+        if background:
+            self._start_writer()
+            self.jobs.put(snapshots)
+        else:
+            self._write(snapshots)
+        return len(snapshots)
+
+    def _write(self, snapshots):
+        """
+        寫入快照；某個區塊寫入失敗 (磁碟滿、權限) 時記錄下來繼續寫其他的，
+        失敗的快照留在 pending (讀取仍然拿得到最新內容)，下次存檔或 flush 時重試。
+        """
+        start = time.perf_counter()
+        for snap in snapshots:
+            try:
+                self.save_chunk(snap)
+            except Exception as e:
+                self.write_errors += 1
+                self.last_error = f"Failed to save chunk ({snap.cx}, {snap.cz}): {type(e).__name__}: {e}"
+                with self.lock:
+                    self.failed.append(snap)
+                if self.log is not None:
+                    self.log(self.last_error)
+        self.last_save_ms = (time.perf_counter() - start) * 1000
+
+    def _take_failed(self):
+        """取出還要重試的快照 (已經有更新的快照排入的就不用再寫舊的)"""
+        with self.lock:
+            failed, self.failed = self.failed, []
+            return [snap for snap in failed if self.pending.get((snap.cx, snap.cz)) is snap]
+
+    def _start_writer(self):
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._writer_loop, daemon=True)
+            self.writer.start()
+
+    def _writer_loop(self):
+        while True:
+            snapshots = self.jobs.get()
+            try:
+                if snapshots is None:
+                    return
+                self._write(snapshots)
+            finally:
+                self.jobs.task_done()
+
+    def flush(self):
+        """等待背景存檔完成；之前寫入失敗的快照在這裡重試一次"""
+        retry = self._take_failed()
+        if retry:
+            self._start_writer()
+            self.jobs.put(retry)
+        if self.writer is not None:
+            self.jobs.join()
+
+    def close(self):
+        if self.writer is not None:
+            self.jobs.put(None)
+            self.writer.join()
+            self.writer = None
+        with self.lock:
+            for region in self.regions.values():
+                region.close()
+            self.regions.clear()
+
+
+_open_stores = {}
+
+def open_store(world_dir="world"):
+    """同一個存檔目錄共用一個 GameXRegionStore (避免兩份偏移表互相覆蓋)"""
+    key = os.path.abspath(world_dir)
+    store = _open_stores.get(key)
+    if store is None:
+        store = _open_stores[key] = GameXRegionStore(world_dir)
+    return store
+
+def close_store(world_dir="world"):
+    store = _open_stores.pop(os.path.abspath(world_dir), None)
+    if store is not None:
+        store.close()
+
+
+# --- 舊格式轉換 ---
+def chunks_from_blocks(items):
+    """把 (x, y, z) -> 方塊名稱 的項目分組成 GameXChunk；超出垂直範圍的方塊回傳在 skipped"""
+    chunks, skipped = {}, 0
+    for (x, y, z), name in items:
+        if not CHUNK_MIN_Y <= y < CHUNK_MIN_Y + CHUNK_HEIGHT:
+            skipped += 1
+            continue
+        key = (x // CHUNK_SIZE, z // CHUNK_SIZE)
+        chunk = chunks.get(key)
+        if chunk is None:
+            chunk = chunks[key] = GameXChunk(*key)
+        chunk[(x, y, z)] = name
+    for chunk in chunks.values():
+        chunk.unsaved = True
+    return chunks, skipped
+
+def convert_world_json(json_path="world.json", world_dir="world"):
+    """[功能 40] 一次性轉換：把舊的 world.json 轉成 region 檔，回傳 (區塊數, 略過的方塊數)"""
+    with open(json_path, "r") as f:
+        data = json.load(f)
+    items = ((tuple(map(int, k.split(','))), v) for k, v in data.items())
+    chunks, skipped = chunks_from_blocks(items)
+    open_store(world_dir).save_dirty(chunks.values(), background=False)
+    return len(chunks), skipped
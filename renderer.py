@@ -0,0 +1,429 @@
+import math
+import numpy as np
+import pygame
+from mesher import FACE_NORMALS
+
+# --- 渲染常數 (Render Constants) ---
+RENDER_SCALE = 4            # 內部解析度 = 螢幕解析度 / RENDER_SCALE，最後放大到螢幕
+NEAR_PLANE = 0.05           # 近裁切面 (格)
+RASTER_BATCH = 1 << 20      # 每批最多展開的候選像素，限制暫存記憶體
+EDGE_EPS = -1e-4            # 邊緣容差，避免相鄰三角形之間出現裂縫
+MAX_POINT_SIZE = 16         # 實體在內部解析度下的最大邊長 (像素)
+SCENE_SLACK = 1.25          # 每個區塊在合併緩衝區裡多留的空間 (比例)，網格稍微變大也能原地覆寫
+SCENE_MIN_SLACK = 32        # 至少多留幾個四邊形
+SCENE_COMPACT_MIN = 1 << 16 # 廢棄的空間超過緩衝區一半且超過這麼多個四邊形才整個重組
+
+# 四邊形拆成兩個三角形 (角落索引)
+QUAD_TRIS = np.array([[0, 1, 2], [0, 2, 3]])
+
+def camera_basis(look_x, look_y):
+    """視角 (抬頭角度, 轉身角度) 轉成 right / up / forward 三個基底向量 (3, 3)"""
+    ry, rx = math.radians(look_y), math.radians(look_x)
+    forward = np.array([math.sin(ry) * math.cos(rx), math.sin(rx), math.cos(ry) * math.cos(rx)])
+    right = np.array([math.cos(ry), 0.0, -math.sin(ry)])
+    up = np.cross(forward, right)
+    return np.stack([right, up, forward])
+
+def _clip_near(cam):
+    """
+    Sutherland-Hodgman (批次版)：把跨過近裁切面的四邊形 (M, 4, D) 裁到 z >= NEAR_PLANE，
+    回傳最多 5 個頂點的凸多邊形 (M, 5, D) 與頂點數 (M,)。
+    前三個分量是相機空間座標，其餘分量 (例如頂點顏色) 跟著線性內插。
+    """
+    a, b = cam, np.roll(cam, -1, axis=1)
+    a_in, b_in = a[..., 2] >= NEAR_PLANE, b[..., 2] >= NEAR_PLANE
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (NEAR_PLANE - a[..., 2]) / (b[..., 2] - a[..., 2])
+        cut = a + (b - a) * t[..., None]
+    slots = np.stack([a, cut], axis=2).reshape(len(cam), 8, cam.shape[-1])
+    valid = np.stack([a_in, a_in != b_in], axis=2).reshape(len(cam), 8)
+    order = np.argsort(~valid, axis=1, kind="stable")   # 保留的頂點依原順序排到前面
+    poly = np.take_along_axis(slots, order[..., None], axis=1)[:, :5]
+    return poly, valid.sum(axis=1)
+
+
+class GameXRenderer:
+    """
+    [功能 21, 22, 42, 43] 不需要 GPU 的軟體光柵化器。
+    把 GameXMesher 快取的四邊形一次用 NumPy 投影、背面/視錐/霧距剔除，
+    在低解析度的 z-buffer 上光柵化，再經 pygame.surfarray 寫到螢幕。
+    成本與可見的面數成正比，與世界大小無關。
+    """
+    def __init__(self, visuals, mesher, scale=RENDER_SCALE):
+        self.visuals = visuals
+        self.mesher = mesher
+        self.scale = scale
+        self.surface = None
+        self.size = (0, 0)
+        self.frame_key = None   # 上一幀的相機/場景狀態，沒變就不重畫
+
+        # 合併後的場景：每個區塊佔一段固定範圍 (slot)，網格變動時只覆寫那一段
+        self.scene_version = -1
+        self._reset_scene(0)
+
+        # 統計數據
+        self.chunks_drawn = 0
+        self.quads_drawn = 0
+        self.triangles = 0
+        self.fragments = 0
+        self.skipped = 0
+
+    def resize(self, screen_w, screen_h):
+        w, h = max(1, screen_w // self.scale), max(1, screen_h // self.scale)
+        if (w, h) != self.size:
+            self.size = (w, h)
+            self.surface = pygame.Surface((w, h))
+
+    # --- 場景組裝 ---
+    def _reset_scene(self, capacity):
+        """清空合併緩衝區，預留 capacity 個四邊形"""
+        self.corners = np.zeros((capacity, 4, 3), dtype=np.float32)
+        self.normals = np.zeros(capacity, dtype=np.int8)
+        self.colors = np.zeros((capacity, 4, 3), dtype=np.uint8)
+        self.buffer_end = 0         # 已分配出去的範圍結尾
+        self.slot_of = {}           # 區塊座標 -> slot
+        self.free_slots = []
+        self.slot_count = 0
+        self.slot_start = np.zeros(0, dtype=np.int64)
+        self.slot_cap = np.zeros(0, dtype=np.int64)
+        self.slot_size = np.zeros(0, dtype=np.int64)   # 0 = 空的 slot，剔除時直接略過
+        self.slot_box = np.zeros((0, 2, 3), dtype=np.float32)
+        self.scene_quads = 0
+        self.live_cap = 0           # 使用中 slot 的容量總和，buffer_end - live_cap 就是廢棄的空間
+
+    def _sync_scene(self):
+        """只更新網格有變動的區塊在合併緩衝區裡的範圍，成本與變動的區塊數成正比"""
+        if self.scene_version == self.mesher.version:
+            return
+        changed = self.mesher.take_changed()
+        if self.scene_version < 0:
+            self._rebuild_scene()
+        else:
+            for key in changed:
+                self._update_slot(key, self.mesher.meshes.get(key))
+            garbage = self.buffer_end - self.live_cap
+            if garbage > max(SCENE_COMPACT_MIN, self.buffer_end // 2):
+                self._rebuild_scene()
+        self.scene_version = self.mesher.version
+
+    def _rebuild_scene(self):
+        """把所有區塊重新緊密排列 (第一次同步，或廢棄的空間太多時)"""
+        meshes = [(key, m) for key, m in self.mesher.meshes.items() if len(m["normals"])]
+        self._reset_scene(sum(self._slot_capacity(len(m["normals"])) for _, m in meshes))
+        for key, mesh in meshes:
+            self._update_slot(key, mesh)
+
+    @staticmethod
+    def _slot_capacity(n):
+        return max(int(n * SCENE_SLACK), n + SCENE_MIN_SLACK)
+
+    def _update_slot(self, key, mesh):
+        """把一個區塊的網格寫進它的範圍；放不下就在結尾另配一段，網格空了就釋放 slot"""
+        n = 0 if mesh is None else len(mesh["normals"])
+        slot = self.slot_of.get(key)
+        if slot is not None:
+            self.scene_quads -= int(self.slot_size[slot])
+        if not n:
+            if slot is not None:
+                del self.slot_of[key]
+                self.live_cap -= int(self.slot_cap[slot])
+                self.slot_size[slot] = self.slot_cap[slot] = 0
+                self.free_slots.append(slot)
+            return
+        if slot is None:
+            slot = self._new_slot()
+            self.slot_of[key] = slot
+        if n > self.slot_cap[slot]:
+            self._alloc(slot, self._slot_capacity(n))
+
+        start = int(self.slot_start[slot])
+        self.corners[start:start + n] = mesh["corners"]
+        self.normals[start:start + n] = mesh["normals"]
+        self.colors[start:start + n] = mesh["colors"]
+        self.slot_size[slot] = n
+        self.slot_box[slot] = mesh["corners"].min(axis=(0, 1)), mesh["corners"].max(axis=(0, 1))
+        self.scene_quads += n
+
+    def _new_slot(self):
+        if self.free_slots:
+            return self.free_slots.pop()
+        slot = self.slot_count
+        if slot == len(self.slot_size):
+            grow = max(16, slot)
+            self.slot_start = np.concatenate([self.slot_start, np.zeros(grow, dtype=np.int64)])
+            self.slot_cap = np.concatenate([self.slot_cap, np.zeros(grow, dtype=np.int64)])
+            self.slot_size = np.concatenate([self.slot_size, np.zeros(grow, dtype=np.int64)])
+            self.slot_box = np.concatenate([self.slot_box, np.zeros((grow, 2, 3), dtype=np.float32)])
+        self.slot_count += 1
+        return slot
+
+    def _alloc(self, slot, cap):
+        """在緩衝區結尾配一段 cap 個四邊形給 slot (舊的範圍變成廢棄空間)，不夠就加倍擴充"""
+        end = self.buffer_end + cap
+        if end > len(self.normals):
+            size = max(end, 2 * len(self.normals))
+            for name in ("corners", "normals", "colors"):
+                old = getattr(self, name)
+                new = np.zeros((size,) + old.shape[1:], dtype=old.dtype)
+                new[:self.buffer_end] = old[:self.buffer_end]
+                setattr(self, name, new)
+        self.live_cap += cap - int(self.slot_cap[slot])
+        self.slot_start[slot] = self.buffer_end
+        self.slot_cap[slot] = cap
+        self.buffer_end = end
+
+    def _visible_quads(self, eye, basis):
+        """
+        區塊層級的剔除：外接框整個在霧距外、在視點背後或在視錐側面外的區塊跳過，
+        回傳剩下區塊的四邊形索引 (每幀的成本跟看得到的區塊數成正比)
+        """
+        live = np.flatnonzero(self.slot_size[:self.slot_count])
+        lo, hi = self.slot_box[live, 0], self.slot_box[live, 1]
+        nearest = np.maximum(0, np.maximum(lo - eye, eye - hi))
+        near = np.linalg.norm(nearest, axis=1) < self.visuals.fog_dist
+
+        w, h = self.size
+        f = self.visuals.fov / self.scale
+        box = np.stack([np.where(np.array([(i >> a) & 1 for a in range(3)], dtype=bool), hi, lo)
+                        for i in range(8)], axis=1)   # (C, 8, 3) 八個角落
+        cam = (box - eye) @ basis.T
+        x, y, z = cam[..., 0] * f, cam[..., 1] * f, cam[..., 2]
+        hw, hh = z * (w / 2), z * (h / 2)
+        outside = ((z < NEAR_PLANE).all(axis=1) | (x > hw).all(axis=1) | (x < -hw).all(axis=1) |
+                   (y > hh).all(axis=1) | (y < -hh).all(axis=1))
+        chunks = live[near & ~outside]
+        self.chunks_drawn = len(chunks)
+
+        sizes = self.slot_size[chunks]
+        starts = self.slot_start[chunks]
+        return np.repeat(starts - (np.cumsum(sizes) - sizes), sizes) + np.arange(int(sizes.sum()))
+
+    # --- 主渲染 ---
+    def render(self, screen, pos, look_x, look_y, sky_color, entities=None, sun_y=None):
+        """
+        把目前載入的區塊 (與選用的 GameXEntities) 畫到 screen (整個畫面，包含天空背景)。
+        相機、網格、天空圖層與實體都沒變時不重畫，回傳 False (screen 上仍是上一幀)。
+        """
+        self.resize(*screen.get_size())
+        self._sync_scene()
+        w, h = self.size
+        background = self.visuals.get_sky_layer(self.size, sky_color, 1.0 if sun_y is None else sun_y)
+        key = (screen.get_size(), tuple(map(float, pos)), look_x, look_y, self.scene_version,
+               self.visuals.sky_layers[self.size][0], self.visuals.fog_dist,
+               None if entities is None else entities.version)
+        if key == self.frame_key:
+            self.skipped += 1
+            return False
+        self.frame_key = key
+
+        frame = background.reshape(w * h, 3).copy()
+        zbuf = np.zeros(w * h, dtype=np.float64)
+
+        eye = np.asarray(pos, dtype=np.float32)
+        tris = self._project(eye, look_x, look_y, sky_color)
+        if tris is not None:
+            self._rasterize(frame, zbuf, *tris)
+        if entities is not None and entities.count:
+            self._draw_points(frame, zbuf, eye, look_x, look_y, sky_color, *entities.visible())
+
+        pygame.surfarray.blit_array(self.surface, frame.reshape(w, h, 3))
+        pygame.transform.scale(self.surface, screen.get_size(), screen)
+        return True
+
+    def invalidate(self):
+        """下一次 render 一定重畫 (例如視窗被遮住後重新露出)"""
+        self.frame_key = None
+
+    def restore(self, screen, rects):
+        """
+        從內部解析度的畫面重新放大 rects 範圍 (對齊到 scale 的格線)，蓋掉上面的介面。
+        回傳實際還原的螢幕矩形；螢幕尺寸不是 scale 的整數倍時整個畫面重新放大。
+        """
+        s = self.scale
+        w, h = self.size
+        if screen.get_size() != (w * s, h * s):
+            pygame.transform.scale(self.surface, screen.get_size(), screen)
+            return [screen.get_rect()]
+        restored = []
+        for rect in rects:
+            x0, y0 = max(0, rect.left // s), max(0, rect.top // s)
+            x1, y1 = min(w, -(-rect.right // s)), min(h, -(-rect.bottom // s))
+            if x1 <= x0 or y1 <= y0:
+                continue
+            dst = pygame.Rect(x0 * s, y0 * s, (x1 - x0) * s, (y1 - y0) * s)
+            src = self.surface.subsurface((x0, y0, x1 - x0, y1 - y0))
+            pygame.transform.scale(src, dst.size, screen.subsurface(dst))
+            restored.append(dst)
+        return restored
+
+    def _project(self, eye, look_x, look_y, sky_color):
+        """剔除並投影四邊形，回傳三角形 (xy (T, 3, 2), 1/z (T, 3), 頂點顏色 (T, 3, 3))"""
+        if not self.scene_quads:
+            return None
+        basis = camera_basis(look_x, look_y).astype(np.float32)
+        idx = self._visible_quads(eye, basis)
+
+        # 1. 背面剔除：視點在面的背側就看不到
+        normals = FACE_NORMALS[self.normals[idx]]
+        idx = idx[np.einsum("ij,ij->i", normals, eye - self.corners[idx, 0]) > 0]
+
+        # 2. 轉到相機空間
+        cam = (self.corners[idx] - eye) @ basis.T   # (N, 4, 3)
+        z = cam[..., 2]
+
+        # 3. 近裁切面 / 霧距剔除 (深度 >= 霧距的面完全被霧蓋住，跟天空同色)
+        keep = (z.max(axis=1) >= NEAR_PLANE) & (z.min(axis=1) < self.visuals.fog_dist)
+        idx, cam, z = idx[keep], cam[keep], z[keep]
+
+        # 4. 頂點顏色：方向光與 AO 已在建網格時烘焙，這裡只用查表加上距離霧 [功能 22]
+        dist = np.linalg.norm(cam, axis=-1)
+        rgb = self.visuals.fog_colors(self.colors[idx], dist, sky_color).astype(np.float32)
+
+        # 5. 視錐剔除：四個角落都在同一個側面外的面
+        w, h = self.size
+        f = self.visuals.fov / self.scale
+        x, y = cam[..., 0] * f, cam[..., 1] * f
+        hw, hh = z * (w / 2), z * (h / 2)
+        outside = ((x > hw).all(axis=1) | (x < -hw).all(axis=1) |
+                   (y > hh).all(axis=1) | (y < -hh).all(axis=1))
+        cam, z, rgb = cam[~outside], z[~outside], rgb[~outside]
+        self.quads_drawn = len(cam)
+
+        # 6. 完全在近裁切面前的四邊形直接拆成兩個三角形；
+        #    跨過近裁切面的先裁切成最多五邊形，再扇形三角化 (0, k, k+1)
+        crossing = z.min(axis=1) < NEAR_PLANE
+        verts = [cam[~crossing][:, QUAD_TRIS].reshape(-1, 3, 3)]
+        colors = [rgb[~crossing][:, QUAD_TRIS].reshape(-1, 3, 3)]
+        if crossing.any():
+            poly, count = _clip_near(np.concatenate([cam[crossing], rgb[crossing]], axis=-1))
+            for k in range(1, 4):
+                tri = poly[count > k + 1][:, [0, k, k + 1]]
+                verts.append(tri[..., :3])
+                colors.append(tri[..., 3:])
+        verts = np.concatenate(verts)
+        tri_xy = np.stack([w / 2 + verts[..., 0] / verts[..., 2] * f,
+                           h / 2 - verts[..., 1] / verts[..., 2] * f], axis=-1)
+        tri_iz = 1.0 / verts[..., 2]
+        tri_rgb = np.concatenate(colors)
+        return tri_xy, tri_iz, tri_rgb
+
+    def _rasterize(self, frame, zbuf, tri_xy, tri_iz, tri_rgb):
+        """
+        向量化掃描線光柵化：每個三角形拆成外接框內的橫列，
+        由三條邊函數直接解出每列的 [左, 右] 像素區間，只展開真正在內部的像素；
+        z-buffer (1/z 越大越近) 決定可見的像素，頂點顏色在三角形內線性內插 (Gouraud)。
+        """
+        w, h = self.size
+        y0 = np.maximum(0, np.ceil(tri_xy[..., 1].min(axis=1) - 0.5)).astype(np.int64)
+        y1 = np.minimum(h - 1, np.floor(tri_xy[..., 1].max(axis=1) - 0.5)).astype(np.int64)
+
+        # 每個三角形的平面係數：重心座標 b_i、1/z 與 RGB 都寫成 A*x + B*y + C
+        ax, ay = tri_xy[:, 0, 0], tri_xy[:, 0, 1]
+        bx, by = tri_xy[:, 1, 0], tri_xy[:, 1, 1]
+        cx, cy = tri_xy[:, 2, 0], tri_xy[:, 2, 1]
+        area = (bx - ax) * (cy - ay) - (cx - ax) * (by - ay)
+        keep = np.nonzero((y1 >= y0) & (np.abs(area) > 1e-9))[0]
+        self.triangles = len(keep)
+        self.fragments = 0
+        if not len(keep):
+            return
+        coef = np.empty((len(area), 7, 3))
+        coef[:, 0] = np.stack([by - cy, cx - bx, bx * cy - cx * by], axis=-1)
+        coef[:, 1] = np.stack([cy - ay, ax - cx, cx * ay - ax * cy], axis=-1)
+        coef[:, 2] = np.stack([ay - by, bx - ax, ax * by - bx * ay], axis=-1)
+        coef = coef[keep]
+        coef[:, :3] /= area[keep, None, None]
+        coef[:, 3] = np.einsum("ti,tij->tj", tri_iz[keep], coef[:, :3])
+        coef[:, 4:] = np.einsum("tic,tij->tcj", tri_rgb[keep], coef[:, :3])
+        y0 = y0[keep]
+
+        # 1. 展開成橫列，解出每列的像素區間
+        heights = y1[keep] - y0 + 1
+        row_tri = np.repeat(np.arange(len(keep)), heights)
+        ry = y0[row_tri] + np.arange(len(row_tri)) - np.repeat(np.cumsum(heights) - heights, heights)
+        fy = ry + 0.5
+        c = coef[row_tri, :3]                               # (R, 3, 3) 只取邊函數
+        A = c[..., 0]
+        r = c[..., 1] * fy[:, None] + c[..., 2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bound = (EDGE_EPS - r) / A                      # b_i >= EDGE_EPS 的 x 界線
+        lo = np.where(A > 0, bound, -np.inf).max(axis=1)
+        hi = np.where(A < 0, bound, np.inf).min(axis=1)
+        blocked = ((A == 0) & (r < EDGE_EPS)).any(axis=1)   # 水平邊外側的整列
+        xs = np.maximum(0, np.ceil(np.maximum(lo, -1.0) - 0.5)).astype(np.int64)
+        xe = np.minimum(w - 1, np.floor(np.minimum(hi, w + 1.0) - 0.5)).astype(np.int64)
+        counts = np.where(blocked, 0, np.maximum(0, xe - xs + 1))
+        rows = np.nonzero(counts)[0]
+        if not len(rows):
+            return
+        counts, xs, ry, fy = counts[rows], xs[rows], ry[rows], fy[rows]
+        # 每列起點的深度/顏色與往右一格的增量 (只算有像素的列)
+        c = coef[row_tri[rows], 3:]                         # (R, 4, 3)
+        step = c[..., 0]
+        first = c[..., 1] * fy[:, None] + c[..., 2] + step * (xs + 0.5)[:, None]
+        dz, d0 = step[:, 0], first[:, 0]
+        rgb_step = step[:, 1:].astype(np.float32)
+        rgb_first = first[:, 1:].astype(np.float32)
+        self.fragments = int(counts.sum())
+
+        # 2. 分批展開像素，讓暫存陣列不超過 RASTER_BATCH 個
+        ends = np.cumsum(counts)
+        start = 0
+        while start < len(rows):
+            base = ends[start - 1] if start else 0
+            stop = max(start + 1, int(np.searchsorted(ends, base + RASTER_BATCH, side="right")))
+            sl = slice(start, stop)
+            n = counts[sl]
+            k = np.arange(int(n.sum())) - np.repeat(np.cumsum(n) - n, n)
+            pix = np.repeat(xs[sl] * h + ry[sl], n) + k * h
+            depth = np.repeat(d0[sl], n) + np.repeat(dz[sl], n) * k
+
+            # z-buffer：先取每個像素最近的 1/z，再只寫入深度等於最近值的片段
+            np.maximum.at(zbuf, pix, depth)
+            win = depth >= zbuf[pix]
+            row = np.repeat(np.arange(start, stop), n)[win]
+            rgb = rgb_step.take(row, axis=0)
+            rgb *= k[win, None]
+            rgb += rgb_first.take(row, axis=0)
+            frame[pix[win]] = np.clip(rgb, 0, 255, out=rgb)
+            start = stop
+
+    def _draw_points(self, frame, zbuf, eye, look_x, look_y, sky_color, pos, color, size):
+        """
+        [功能 27, 38] 實體一次畫完：每個實體是面向鏡頭、依距離縮放的方塊，
+        和地形共用 z-buffer，被方塊擋住的部分不會畫出來。
+        """
+        w, h = self.size
+        f = self.visuals.fov / self.scale
+        cam = (pos - eye) @ camera_basis(look_x, look_y).astype(np.float32).T
+        z = cam[:, 2]
+        keep = (z > NEAR_PLANE) & (z < self.visuals.fog_dist)
+        cam, z, color, size = cam[keep], z[keep], color[keep], size[keep]
+        if not len(z):
+            return
+        side = np.clip(np.rint(size * f / z), 1, MAX_POINT_SIZE).astype(np.int64)
+        x0 = np.rint(w / 2 + cam[:, 0] / z * f - side / 2).astype(np.int64)
+        y0 = np.rint(h / 2 - cam[:, 1] / z * f - side / 2).astype(np.int64)
+        rgb = self.visuals.fog_colors(color, np.linalg.norm(cam, axis=1), sky_color)
+
+        counts = side * side
+        point = np.repeat(np.arange(len(z)), counts)
+        k = np.arange(len(point)) - np.repeat(np.cumsum(counts) - counts, counts)
+        px = x0[point] + k % side[point]
+        py = y0[point] + k // side[point]
+        inside = (px >= 0) & (px < w) & (py >= 0) & (py < h)
+        point, pix = point[inside], (px * h + py)[inside]
+        front = 1.0 / z[point] >= zbuf[pix]
+        frame[pix[front]] = rgb[point[front]]
+
+    # --- 監控數據 ---
+    def stats(self):
+        return {
+            "scene_quads": self.scene_quads,
+            "chunks_drawn": self.chunks_drawn,
+            "quads_drawn": self.quads_drawn,
+            "triangles": self.triangles,
+            "fragments": self.fragments,
+            "skipped": self.skipped,
+            "internal_size": self.size,
+        }
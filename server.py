@@ -0,0 +1,757 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import struct
+import asyncio
+import argparse
+from collections import deque
+import numpy as np
+import pygame
+from chunk_data import GameXChunk, GameXWorldMap, CHUNK_SIZE, CHUNK_MIN_Y, CHUNK_HEIGHT
+from world_gen import GameXWorldGen
+from region import open_store, close_store
+from physics import GameXPhysics, TICK_RATE, TICK_DT
+from interaction import REACH
+from fluids import GameXFluids
+from lighting import GameXLighting
+from visuals import BLOCK_COLORS
+
+# --- 伺服器常數 (Server Constants) ---
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 25565
+SERVER_VIEW_RADIUS = 4            # 每個玩家周圍同步的區塊半徑
+SERVER_UNLOAD_MARGIN = 1          # 超出半徑這麼多才通知客戶端卸載
+CHUNK_SEND_BUDGET = 48 * 1024     # 每個連線每 tick 最多送出的區塊資料 (bytes，約 2.8 MB/s)
+WRITE_BUFFER_LIMIT = 256 * 1024   # 連線的送出緩衝超過這個量就暫停送區塊 (慢的客戶端不會無限堆積)
+GEN_BUDGET_MS = 4.0               # 沒有工作行程時，每 tick 同步生成區塊的時間上限
+GEN_BATCH = 4                     # 同步生成時每批的區塊數
+MAX_INPUTS_PER_TICK = 3           # 每個玩家每 tick 最多處理的輸入 (網路抖動後追上)
+MAX_LAG_TICKS = 10                # tick 迴圈落後超過這麼多就不再補算
+STATS_WINDOW = 1200               # tick 時間與區塊延遲保留最近幾筆算 p50 / p99
+RECONCILE_EPSILON = 1e-4          # 客戶端預測與伺服器位置差超過這個值才校正
+
+# --- 網路協定：每則訊息 = 長度 (含型別) + 型別 + 內容，全部小端序 ---
+HEADER = struct.Struct("<IB")
+(MSG_HELLO, MSG_WELCOME, MSG_CHUNK, MSG_UNLOAD, MSG_INPUT,
+ MSG_STATE, MSG_BLOCKS, MSG_EDIT) = range(1, 9)
+MSG_NAMES = {MSG_HELLO: "hello", MSG_WELCOME: "welcome", MSG_CHUNK: "chunk", MSG_UNLOAD: "unload",
+             MSG_INPUT: "input", MSG_STATE: "state", MSG_BLOCKS: "blocks", MSG_EDIT: "edit"}
+
+WELCOME = struct.Struct("<HIBfff")     # 玩家 ID、種子、同步半徑、出生位置
+CHUNK_KEY = struct.Struct("<ii")       # 卸載的區塊座標
+INPUT = struct.Struct("<IBff")         # 輸入序號、按鍵位元、抬頭角度、轉身角度
+STATE = struct.Struct("<IIffffffBH")   # tick、已處理的輸入序號、自己的位置與速度、狀態旗標、其他玩家數
+PLAYER = struct.Struct("<Hffff")       # 其他玩家：ID、位置、轉身角度
+COUNT = struct.Struct("<H")
+BLOCK = struct.Struct("<iiiB")         # 方塊座標 + 名稱長度 (後面接 UTF-8 名稱，長度 0 = 空氣)
+
+# 輸入的按鍵位元，與 GameXPhysics.step 讀的按鍵一致
+INPUT_KEYS = (pygame.K_w, pygame.K_s, pygame.K_a, pygame.K_d, pygame.K_SPACE, pygame.K_LSHIFT, pygame.K_LCTRL)
+KEY_BITS = {key: 1 << i for i, key in enumerate(INPUT_KEYS)}
+FLAG_GROUNDED, FLAG_WATER, FLAG_FLYING = 1, 2, 4
+
+def pack(msg_type, payload=b""):
+    return HEADER.pack(len(payload) + 1, msg_type) + payload
+
+async def read_message(reader):
+    """讀一則完整訊息，回傳 (型別, 內容)"""
+    length, msg_type = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return msg_type, await reader.readexactly(length - 1)
+
+def input_mask(keys):
+    """按鍵狀態 (例如 pygame.key.get_pressed()) 轉成輸入位元"""
+    mask = 0
+    for key, bit in KEY_BITS.items():
+        if keys[key]:
+            mask |= bit
+    return mask
+
+class InputKeys:
+    """把輸入位元還原成 GameXPhysics.step 可以用 keys[pygame.K_w] 讀的物件"""
+    __slots__ = ("mask",)
+    def __init__(self, mask):
+        self.mask = mask
+    def __getitem__(self, key):
+        return bool(self.mask & KEY_BITS.get(key, 0))
+
+def encode_blocks(changes):
+    """[(座標, 方塊名稱或 None)] 編碼成 MSG_BLOCKS 的內容"""
+    parts = [COUNT.pack(len(changes))]
+    for (x, y, z), name in changes:
+        raw = name.encode("utf-8") if name else b""
+        parts.append(BLOCK.pack(x, y, z, len(raw)) + raw)
+    return b"".join(parts)
+
+def decode_blocks(payload):
+    """encode_blocks 的反向操作"""
+    (count,), offset = COUNT.unpack_from(payload), COUNT.size
+    changes = []
+    for _ in range(count):
+        x, y, z, n = BLOCK.unpack_from(payload, offset)
+        offset += BLOCK.size
+        name = bytes(payload[offset:offset + n]).decode("utf-8") if n else None
+        offset += n
+        changes.append(((x, y, z), name))
+    return changes
+
+def _percentiles(values):
+    if not values:
+        return 0.0, 0.0
+    p50, p99 = np.percentile(np.fromiter(values, dtype=np.float64), (50, 99))
+    return float(p50), float(p99)
+
+def _chunk_of(pos):
+    return int(pos[0] // CHUNK_SIZE), int(pos[2] // CHUNK_SIZE)
+
+
+class _Player:
+    """伺服器上的一個連線玩家"""
+    def __init__(self, pid, name, writer):
+        self.id = pid
+        self.name = name
+        self.writer = writer
+        self.physics = GameXPhysics()
+        self.inputs = deque()     # 還沒處理的 (序號, 按鍵位元, 抬頭, 轉身)
+        self.ack = 0              # 最後處理的輸入序號
+        self.sent = set()         # 已經送給這個客戶端的區塊
+        self.wanted = {}          # 範圍內還沒送的區塊 -> 開始等待的時間 (算區塊延遲)
+        self.center = None
+        self.seen = {}            # 上次送給這個客戶端的其他玩家狀態 {ID: (x, y, z, 轉身)}
+        self.last_state = None    # 上次送出的自己的狀態 (沒變就不送)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def send(self, msg_type, payload, stats):
+        data = pack(msg_type, payload)
+        self.writer.write(data)
+        self.bytes_sent += len(data)
+        stats[msg_type] = stats.get(msg_type, 0) + len(data)
+
+    @property
+    def backlog(self):
+        return self.writer.transport.get_write_buffer_size()
+
+
+class GameXServer:
+    """
+    無頭的權威伺服器。
+    世界生成、區塊儲存、流體與光照、以及每個玩家的物理都只在伺服器上算；
+    asyncio 上的固定 tick 迴圈處理每個玩家的輸入，再只送出這個 tick 的變化：
+    方塊變動、有移動的玩家狀態，以及依距離由近到遠、受每 tick 位元組預算限制的壓縮區塊。
+    """
+    def __init__(self, seed=888, world_dir="world_server", view_radius=SERVER_VIEW_RADIUS,
+                 workers=False, tick_rate=TICK_RATE):
+        self.seed = seed
+        self.world_dir = world_dir
+        self.view_radius = view_radius
+        self.tick_dt = 1 / tick_rate
+        self.world_gen = GameXWorldGen(seed)
+        if world_dir is not None:
+            self.world_gen.attach_store(open_store(world_dir))
+        if workers:
+            self.world_gen.start_workers(None if workers is True else workers)
+        self.world_map = GameXWorldMap()
+
+        self.lighting = GameXLighting(self.world_map)
+        self.lighting.on_change.append(self._chunk_changed)
+        self.fluids = GameXFluids(self.world_map)
+        self.fluids.on_change.append(self._block_changed)
+        self.fluids.on_change.append(self.lighting.block_changed)
+
+        self.players = {}
+        self.next_id = 1
+        self.changes = {}         # 這個 tick 改變的方塊 (dict 當有序集合用)
+        self.chunk_bytes = {}     # 區塊 -> (版本, 壓縮資料)，多個客戶端共用同一份
+        self.server = None
+        self.port = None
+        self.running = False
+        self.tick_task = None
+        self.tick_count = 0
+        self.log = None           # 選用的 fn(message)，例如 print
+
+        # 統計數據
+        self.tick_ms = deque(maxlen=STATS_WINDOW)
+        self.chunk_latency_ms = deque(maxlen=STATS_WINDOW)
+        self.bytes_by_type = {}
+        self.bytes_received = 0
+        self.chunks_sent = 0
+        self.late_ticks = 0
+        self.rejected_edits = 0
+        self.tick_errors = 0
+        self.last_error = None
+
+    # --- 啟動與關閉 ---
+    async def start(self, host=SERVER_HOST, port=SERVER_PORT):
+        """開始接受連線並啟動 tick 迴圈 (port=0 讓系統挑一個空的埠)"""
+        self.server = await asyncio.start_server(self._handle, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.running = True
+        self.tick_task = asyncio.create_task(self._tick_loop())
+        return self.port
+
+    async def close(self):
+        self.running = False
+        if self.tick_task is not None:
+            await self.tick_task
+        if self.server is not None:
+            self.server.close()
+            for player in list(self.players.values()):
+                player.writer.close()
+            await self.server.wait_closed()
+        self.world_gen.stop_workers()
+        if self.world_dir is not None:
+            self.world_gen.save_dirty(background=False)
+            close_store(self.world_dir)
+
+    async def _tick_loop(self):
+        """
+        固定 tick：依排定的時間點前進，落後太多時放棄補算 (不會越補越慢)。
+        某個 tick 丟出例外時記錄下來繼續跑，模擬不會就此停住。
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while self.running:
+            try:
+                self.tick()
+            except Exception as e:
+                self.tick_errors += 1
+                self.last_error = f"Tick {self.tick_count} failed: {type(e).__name__}: {e}"
+                if self.log is not None:
+                    self.log(self.last_error)
+            deadline += self.tick_dt
+            delay = deadline - loop.time()
+            if delay < -MAX_LAG_TICKS * self.tick_dt:
+                deadline = loop.time()
+                self.late_ticks += 1
+            await asyncio.sleep(max(0.0, delay))
+
+    # --- 連線 ---
+    async def _handle(self, reader, writer):
+        player = None
+        try:
+            msg_type, payload = await read_message(reader)
+            if msg_type != MSG_HELLO:
+                return
+            player = self._join(payload.decode("utf-8", "replace"), writer)
+            while True:
+                msg_type, payload = await read_message(reader)
+                size = HEADER.size + len(payload)
+                player.bytes_received += size
+                self.bytes_received += size
+                if msg_type == MSG_INPUT:
+                    player.inputs.append(INPUT.unpack(payload))
+                elif msg_type == MSG_EDIT:
+                    self._edit(player, payload)
+        except (asyncio.IncompleteReadError, ConnectionError, struct.error):
+            pass
+        finally:
+            if player is not None:
+                self._leave(player)
+            writer.close()
+
+    def _join(self, name, writer):
+        player = _Player(self.next_id, name, writer)
+        self.next_id += 1
+        # 出生點所在的區塊要先載入，物理才找得到地面
+        x, z = random.uniform(-4, 4), random.uniform(-4, 4)
+        self._ensure_loaded(_chunk_of((x, 0, z)))
+        player.physics.spawn(self.world_map, x, z)
+        self.players[player.id] = player
+        player.send(MSG_WELCOME, WELCOME.pack(player.id, self.seed, self.view_radius,
+                                              *player.physics.pos), self.bytes_by_type)
+        return player
+
+    def _leave(self, player):
+        self.players.pop(player.id, None)
+
+    def _edit(self, player, payload):
+        """
+        客戶端挖掘/放置：只接受觸及距離內、世界高度內、已載入區塊裡的改動，
+        方塊名稱必須是已知的方塊。格式錯誤的內容當成被拒絕的改動，不會中斷連線。
+        """
+        try:
+            (pos, name), = decode_blocks(COUNT.pack(1) + payload)
+        except (struct.error, UnicodeDecodeError):
+            self.rejected_edits += 1
+            return
+        eye = player.physics.pos
+        if (math.dist(eye, pos) > REACH + 1 or not CHUNK_MIN_Y <= pos[1] < CHUNK_MIN_Y + CHUNK_HEIGHT
+                or (name is not None and name not in BLOCK_COLORS)
+                or self.world_map.chunk_at(pos[0], pos[2]) is None):
+            self.rejected_edits += 1
+            return
+        if name is None:
+            if self.world_map.get(pos) is None:
+                return
+            del self.world_map[pos]
+        else:
+            self.world_map[pos] = name
+        self._block_changed(pos)
+        self.lighting.block_changed(pos)
+        self.fluids.block_changed(pos)
+
+    def _block_changed(self, pos):
+        self.changes[tuple(pos)] = None
+
+    def _chunk_changed(self, cx, cz):
+        """
+        光照改變的區塊：快取的壓縮資料作廢 (還沒送的客戶端會拿到新的)；
+        已經有這個區塊的客戶端收到 MSG_BLOCKS 後自己用同一套 GameXLighting 重算。
+        """
+        self.chunk_bytes.pop((cx, cz), None)
+
+    # --- 每 tick 更新 ---
+    def tick(self):
+        start = time.perf_counter()
+        self.tick_count += 1
+        for player in self.players.values():
+            self._simulate(player)
+        self.fluids.tick()
+        self._load_chunks()
+        self._send_updates()
+        self.tick_ms.append((time.perf_counter() - start) * 1000)
+
+    def _simulate(self, player):
+        """套用玩家排隊的輸入，每個輸入剛好一個物理 tick (與客戶端的預測一致)"""
+        physics = player.physics
+        for _ in range(min(len(player.inputs), MAX_INPUTS_PER_TICK)):
+            seq, mask, look_x, look_y = player.inputs.popleft()
+            physics.look_x, physics.look_y = look_x, look_y
+            physics.step(InputKeys(mask), self.world_map)
+            player.ack = seq
+        physics.take_damage() # 血量由客戶端的 HUD 處理
+
+    # --- 區塊管理 ---
+    def _view_keys(self, center, radius):
+        r2 = radius * radius
+        return {(center[0] + dx, center[1] + dz) for dx in range(-radius, radius + 1)
+                for dz in range(-radius, radius + 1) if dx * dx + dz * dz <= r2}
+
+    def _ensure_loaded(self, key):
+        if key not in self.world_map.chunks:
+            self._add_chunk(self.world_gen.request_chunk(*key))
+
+    def _add_chunk(self, chunk):
+        self.world_map.add_chunk(chunk)
+        self.world_gen.chunks.pin((chunk.cx, chunk.cz))
+        self.lighting.on_chunk_loaded(chunk)
+
+    def _load_chunks(self):
+        """載入所有玩家範圍內缺少的區塊 (由近到遠、有時間預算)，卸載沒有人需要的區塊"""
+        need, keep = {}, set()
+        for player in self.players.values():
+            center = _chunk_of(player.physics.pos)
+            for key in self._view_keys(center, self.view_radius):
+                d2 = (key[0] - center[0]) ** 2 + (key[1] - center[1]) ** 2
+                need[key] = min(d2, need.get(key, d2))
+            keep |= self._view_keys(center, self.view_radius + SERVER_UNLOAD_MARGIN)
+
+        for key in [k for k in self.world_map.chunks if k not in keep]:
+            self.world_map.remove_chunk(*key)
+            self.world_gen.chunks.unpin(key)
+            self.chunk_bytes.pop(key, None)
+
+        for chunk in self.world_gen.collect_chunks():
+            key = (chunk.cx, chunk.cz)
+            if key in need and key not in self.world_map.chunks:
+                self._add_chunk(chunk)
+
+        missing = sorted((k for k in need if k not in self.world_map.chunks), key=need.get)
+        deadline = time.perf_counter() + GEN_BUDGET_MS / 1000
+        batch = []
+        for key in missing:
+            chunk = self.world_gen.lookup_chunk(*key)
+            if chunk is not None:
+                self._add_chunk(chunk)
+            elif self.world_gen.workers is not None:
+                self.world_gen.request_chunk(*key, block=False)
+            else:
+                batch.append(key)
+            if len(batch) == GEN_BATCH or (batch and key == missing[-1]):
+                if time.perf_counter() >= deadline:
+                    break
+                for chunk in self.world_gen.generate_chunks(batch):
+                    self.world_gen.chunks[(chunk.cx, chunk.cz)] = chunk
+                    self._add_chunk(chunk)
+                batch = []
+
+    def _chunk_payload(self, chunk):
+        key = (chunk.cx, chunk.cz)
+        cached = self.chunk_bytes.get(key)
+        if cached is None or cached[0] != chunk.version:
+            cached = self.chunk_bytes[key] = (chunk.version, chunk.to_bytes())
+        return cached[1]
+
+    # --- 送出這個 tick 的變化 ---
+    def _send_updates(self):
+        changes = [(pos, self.world_map.get(pos)) for pos in self.changes]
+        self.changes = {}
+        states = {pid: (*p.physics.pos, p.physics.look_y) for pid, p in self.players.items()}
+        now = time.perf_counter()
+        for player in self.players.values():
+            if player.writer.is_closing():
+                continue
+            center = _chunk_of(player.physics.pos)
+            self._send_state(player, center, states)
+            if changes:
+                mine = [c for c in changes if _chunk_of(c[0]) in player.sent]
+                if mine:
+                    player.send(MSG_BLOCKS, encode_blocks(mine), self.bytes_by_type)
+            self._send_chunks(player, center, now)
+
+    def _send_state(self, player, center, states):
+        """自己的權威狀態 (有變才送) 加上範圍內有移動的其他玩家、離開範圍的玩家"""
+        r2 = (self.view_radius * CHUNK_SIZE) ** 2
+        px, _, pz = player.physics.pos
+        moved, gone = [], []
+        for pid, state in states.items():
+            if pid == player.id:
+                continue
+            if (state[0] - px) ** 2 + (state[2] - pz) ** 2 > r2:
+                if pid in player.seen:
+                    del player.seen[pid]
+                    gone.append(pid)
+            elif player.seen.get(pid) != state:
+                player.seen[pid] = state
+                moved.append(PLAYER.pack(pid, *state))
+        for pid in [pid for pid in player.seen if pid not in states]: # 斷線的玩家
+            del player.seen[pid]
+            gone.append(pid)
+
+        physics = player.physics
+        flags = (FLAG_GROUNDED * physics.is_grounded | FLAG_WATER * physics.in_water
+                 | FLAG_FLYING * physics.is_flying)
+        own = (player.ack, *physics.pos, *physics.vel, flags)
+        if own == player.last_state and not moved and not gone:
+            return
+        player.last_state = own
+        payload = (STATE.pack(self.tick_count, *own, len(moved)) + b"".join(moved)
+                   + COUNT.pack(len(gone)) + b"".join(struct.pack("<H", pid) for pid in gone))
+        player.send(MSG_STATE, payload, self.bytes_by_type)
+
+    def _send_chunks(self, player, center, now):
+        """卸載離開範圍的區塊，再依距離由近到遠送出範圍內的區塊，直到用完這個 tick 的預算"""
+        if center != player.center:
+            player.center = center
+            view = self._view_keys(center, self.view_radius)
+            keep = self._view_keys(center, self.view_radius + SERVER_UNLOAD_MARGIN)
+            for key in [k for k in player.sent if k not in keep]:
+                player.sent.discard(key)
+                player.send(MSG_UNLOAD, CHUNK_KEY.pack(*key), self.bytes_by_type)
+            player.wanted = {k: player.wanted.get(k, now) for k in view if k not in player.sent}
+        if not player.wanted or player.backlog > WRITE_BUFFER_LIMIT:
+            return
+        budget = CHUNK_SEND_BUDGET
+        for key in sorted(player.wanted, key=lambda k: (k[0] - center[0]) ** 2 + (k[1] - center[1]) ** 2):
+            chunk = self.world_map.chunks.get(key)
+            if chunk is None: # 還在生成
+                continue
+            payload = self._chunk_payload(chunk)
+            if len(payload) > budget and budget < CHUNK_SEND_BUDGET:
+                break
+            player.send(MSG_CHUNK, payload, self.bytes_by_type)
+            player.sent.add(key)
+            self.chunk_latency_ms.append((now - player.wanted.pop(key)) * 1000)
+            self.chunks_sent += 1
+            budget -= len(payload)
+            if budget <= 0:
+                break
+
+    # --- 監控數據 ---
+    def stats(self):
+        tick_p50, tick_p99 = _percentiles(self.tick_ms)
+        lat_p50, lat_p99 = _percentiles(self.chunk_latency_ms)
+        return {
+            "players": len(self.players),
+            "ticks": self.tick_count,
+            "late_ticks": self.late_ticks,
+            "tick_ms_p50": tick_p50,
+            "tick_ms_p99": tick_p99,
+            "chunk_latency_ms_p50": lat_p50,
+            "chunk_latency_ms_p99": lat_p99,
+            "chunks_loaded": len(self.world_map.chunks),
+            "chunks_sent": self.chunks_sent,
+            "rejected_edits": self.rejected_edits,
+            "tick_errors": self.tick_errors,
+            "bytes_sent": {MSG_NAMES[t]: n for t, n in sorted(self.bytes_by_type.items())},
+            "bytes_received": self.bytes_received,
+        }
+
+
+class GameXClient:
+    """
+    GameXServer 的客戶端。
+    收下區塊、方塊變動與其他玩家的狀態；自己的移動在本地立刻用同一套物理預測，
+    伺服器回報的權威狀態到了以後，從那個輸入之後的輸入重新模擬一次 (校正)。
+    區塊帶著伺服器算好的光照，之後的方塊變動由本地的 GameXLighting 跟伺服器一樣增量更新。
+    """
+    def __init__(self, name="player"):
+        self.name = name
+        self.world_map = GameXWorldMap()
+        self.physics = GameXPhysics()
+        self.player_id = None
+        self.seed = None
+        self.lighting = GameXLighting(self.world_map)   # on_change 通知光照改變的區塊
+        self.players = {}         # 其他玩家 {ID: (x, y, z, 轉身)}
+        self.history = deque()    # 還沒被伺服器確認的 (序號, 按鍵位元, 抬頭, 轉身, 預測後的位置)
+        self.seq = 0
+        self.server_tick = 0
+        self.reader = None
+        self.writer = None
+        self.read_task = None
+        self.on_chunk = []        # 收到區塊 fn(chunk)
+        self.on_unload = []       # 區塊卸載 fn(chunk)
+        self.on_block = []        # 方塊變動 fn(pos)
+
+        # 統計數據
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.chunks_received = 0
+        self.corrections = 0
+        self.max_error = 0.0
+
+    async def connect(self, host=SERVER_HOST, port=SERVER_PORT):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self._send(MSG_HELLO, self.name.encode("utf-8"))
+        msg_type, payload = await read_message(self.reader)
+        if msg_type != MSG_WELCOME:
+            raise ConnectionError("Unexpected handshake from server")
+        self.player_id, self.seed, _, *pos = WELCOME.unpack(payload)
+        self.physics.pos = list(pos)
+        self.physics.prev_pos = list(pos)
+        self.read_task = asyncio.create_task(self._read_loop())
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.read_task is not None:
+            await asyncio.gather(self.read_task, return_exceptions=True)
+
+    def _send(self, msg_type, payload):
+        data = pack(msg_type, payload)
+        self.writer.write(data)
+        self.bytes_sent += len(data)
+
+    # --- 輸入與預測 ---
+    def send_input(self, mask, look_x=None, look_y=None):
+        """送出一個 tick 的輸入，同時在本地先模擬 (不用等伺服器回覆)"""
+        physics = self.physics
+        if look_x is not None:
+            physics.look_x = look_x
+        if look_y is not None:
+            physics.look_y = look_y
+        self.seq += 1
+        physics.step(InputKeys(mask), self.world_map)
+        self.history.append((self.seq, mask, physics.look_x, physics.look_y, tuple(physics.pos)))
+        self._send(MSG_INPUT, INPUT.pack(self.seq, mask, physics.look_x, physics.look_y))
+
+    def send_edit(self, pos, name=None):
+        """要求挖掘 (name=None) 或放置方塊，結果由伺服器的 MSG_BLOCKS 決定"""
+        raw = name.encode("utf-8") if name else b""
+        self._send(MSG_EDIT, BLOCK.pack(*pos, len(raw)) + raw)
+
+    def _reconcile(self, ack, pos, vel, flags):
+        """丟掉伺服器已處理的輸入；預測跟權威位置不同時從權威狀態重播剩下的輸入"""
+        predicted = None
+        while self.history and self.history[0][0] <= ack:
+            entry = self.history.popleft()
+            if entry[0] == ack:
+                predicted = entry[4]
+        if predicted is None: # 這個輸入已經校正過 (或還沒送過任何輸入)
+            if self.history or ack < self.seq:
+                return
+            predicted = tuple(self.physics.pos)
+        error = math.dist(predicted, pos)
+        if error <= RECONCILE_EPSILON:
+            return
+        self.corrections += 1
+        self.max_error = max(self.max_error, error)
+        physics = self.physics
+        physics.pos, physics.vel = list(pos), list(vel)
+        physics.is_grounded = bool(flags & FLAG_GROUNDED)
+        physics.in_water = bool(flags & FLAG_WATER)
+        physics.is_flying = bool(flags & FLAG_FLYING)
+        look = physics.look_x, physics.look_y
+        replay = list(self.history)
+        self.history.clear()
+        for seq, mask, look_x, look_y, _ in replay:
+            physics.look_x, physics.look_y = look_x, look_y
+            physics.step(InputKeys(mask), self.world_map)
+            self.history.append((seq, mask, look_x, look_y, tuple(physics.pos)))
+        physics.look_x, physics.look_y = look
+        physics.prev_pos = list(physics.pos)
+
+    # --- 接收 ---
+    async def _read_loop(self):
+        try:
+            while True:
+                msg_type, payload = await read_message(self.reader)
+                self.bytes_received += HEADER.size + len(payload)
+                self._dispatch(msg_type, payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def _dispatch(self, msg_type, payload):
+        if msg_type == MSG_STATE:
+            tick, ack, x, y, z, vx, vy, vz, flags, count = STATE.unpack_from(payload)
+            self.server_tick = tick
+            offset = STATE.size
+            for _ in range(count):
+                pid, *state = PLAYER.unpack_from(payload, offset)
+                self.players[pid] = tuple(state)
+                offset += PLAYER.size
+            (gone,) = COUNT.unpack_from(payload, offset)
+            for pid in struct.unpack_from(f"<{gone}H", payload, offset + COUNT.size):
+                self.players.pop(pid, None)
+            self._reconcile(ack, (x, y, z), (vx, vy, vz), flags)
+        elif msg_type == MSG_CHUNK:
+            chunk = GameXChunk.from_bytes(payload)
+            self.world_map.add_chunk(chunk)
+            self.lighting.on_chunk_loaded(chunk)
+            self.chunks_received += 1
+            for fn in self.on_chunk:
+                fn(chunk)
+        elif msg_type == MSG_UNLOAD:
+            chunk = self.world_map.remove_chunk(*CHUNK_KEY.unpack(payload))
+            if chunk is not None:
+                for fn in self.on_unload:
+                    fn(chunk)
+        elif msg_type == MSG_BLOCKS:
+            for pos, name in decode_blocks(payload):
+                if name is None:
+                    if self.world_map.get(pos) is not None:
+                        del self.world_map[pos]
+                else:
+                    self.world_map[pos] = name
+                self.lighting.block_changed(pos)
+                for fn in self.on_block:
+                    fn(pos)
+
+    # --- 監控數據 ---
+    def stats(self):
+        return {
+            "chunks": self.chunks_received,
+            "bytes_received": self.bytes_received,
+            "bytes_sent": self.bytes_sent,
+            "pending_inputs": len(self.history),
+            "corrections": self.corrections,
+            "max_error": self.max_error,
+        }
+
+
+# --- 負載測試：同一個事件迴圈裡跑伺服器與許多模擬客戶端 ---
+async def _load_test(clients, seconds, seed, radius, edit_interval):
+    server = GameXServer(seed=seed, world_dir=None, view_radius=radius)
+    port = await server.start(SERVER_HOST, 0)
+    bots = [GameXClient(f"bot{i}") for i in range(clients)]
+    for bot in bots:
+        await bot.connect(SERVER_HOST, port)
+
+    rng = random.Random(seed)
+    headings = [rng.uniform(0, 360) for _ in bots]
+    walk = KEY_BITS[pygame.K_w]
+    jump = KEY_BITS[pygame.K_SPACE]
+    loop = asyncio.get_running_loop()
+    start = deadline = loop.time()
+    ticks = 0
+    while loop.time() - start < seconds:
+        ticks += 1
+        for i, bot in enumerate(bots):
+            if rng.random() < 0.01: # 偶爾轉向
+                headings[i] += rng.uniform(-90, 90)
+            bot.send_input(walk | (jump if rng.random() < 0.05 else 0), 0.0, headings[i])
+            if edit_interval and (ticks + i) % edit_interval == 0: # 在面前放一個方塊再挖掉
+                x, y, z = bot.physics.pos
+                target = (round(x) + 2, round(y), round(z))
+                bot.send_edit(target, "stone" if (ticks + i) // edit_interval % 2 else None)
+        deadline += TICK_DT
+        await asyncio.sleep(max(0.0, deadline - loop.time()))
+    elapsed = loop.time() - start
+
+    await asyncio.sleep(0.2) # 讓最後的回覆送達
+    stats = server.stats()
+    client_stats = [bot.stats() for bot in bots]
+    for bot in bots:
+        await bot.close()
+    await server.close()
+
+    down = sum(c["bytes_received"] for c in client_stats)
+    up = sum(c["bytes_sent"] for c in client_stats)
+    state_bytes = stats["bytes_sent"].get("state", 0) + stats["bytes_sent"].get("blocks", 0)
+    return {
+        "clients": clients,
+        "seconds": elapsed,
+        "server_ticks": stats["ticks"],
+        "late_ticks": stats["late_ticks"],
+        "tick_ms_p50": stats["tick_ms_p50"],
+        "tick_ms_p99": stats["tick_ms_p99"],
+        "chunk_latency_ms_p50": stats["chunk_latency_ms_p50"],
+        "chunk_latency_ms_p99": stats["chunk_latency_ms_p99"],
+        "chunks_sent": stats["chunks_sent"],
+        "down_kbps_per_client": down * 8 / 1000 / elapsed / clients,
+        "up_kbps_per_client": up * 8 / 1000 / elapsed / clients,
+        "delta_bytes_per_tick_per_client": state_bytes / max(1, stats["ticks"]) / clients,
+        "bytes_sent": stats["bytes_sent"],
+        "corrections": sum(c["corrections"] for c in client_stats),
+        "max_prediction_error": max(c["max_error"] for c in client_stats),
+    }
+
+def run_load_test(clients=16, seconds=10.0, seed=888, radius=SERVER_VIEW_RADIUS, edit_interval=120):
+    """跑一次負載測試，回傳頻寬、tick 時間與區塊延遲等數據"""
+    return asyncio.run(_load_test(clients, seconds, seed, radius, edit_interval))
+
+async def _serve(args):
+    server = GameXServer(seed=args.seed, world_dir=args.world, view_radius=args.radius, workers=args.workers)
+    server.log = print
+    port = await server.start(args.host, args.port)
+    print(f"Game X server listening on {args.host}:{port} (seed {args.seed})")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            s = server.stats()
+            print(f"players {s['players']}  tick p50 {s['tick_ms_p50']:.2f} ms  p99 {s['tick_ms_p99']:.2f} ms  "
+                  f"chunks sent {s['chunks_sent']}")
+    finally:
+        await server.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Game X 無頭伺服器")
+    sub = parser.add_subparsers(dest="command")
+    serve = sub.add_parser("serve", help="啟動伺服器 (預設)")
+    serve.add_argument("--host", default=SERVER_HOST)
+    serve.add_argument("--port", type=int, default=SERVER_PORT)
+    serve.add_argument("--seed", type=int, default=888)
+    serve.add_argument("--world", default="world_server", help="存檔目錄")
+    serve.add_argument("--radius", type=int, default=SERVER_VIEW_RADIUS)
+    serve.add_argument("--workers", action="store_true", help="用背景行程生成區塊")
+    load = sub.add_parser("loadtest", help="同一個行程裡跑伺服器與模擬客戶端")
+    load.add_argument("--clients", type=int, default=16)
+    load.add_argument("--seconds", type=float, default=10.0)
+    load.add_argument("--seed", type=int, default=888)
+    load.add_argument("--radius", type=int, default=SERVER_VIEW_RADIUS)
+    load.add_argument("--out", help="結果 JSON 路徑")
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in ("serve", "loadtest", "-h", "--help"): # 沒給子指令就是 serve
+        argv.insert(0, "serve")
+    args = parser.parse_args(argv)
+
+    if args.command == "loadtest":
+        result = run_load_test(args.clients, args.seconds, args.seed, args.radius)
+        for key, value in result.items():
+            print(f"{key:34s} {value:.3f}" if isinstance(value, float) else f"{key:34s} {value}")
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+        return 0
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import time
+from chunk_data import CHUNK_SIZE
+
+# --- 區塊串流常數 (Streaming Constants) ---
+VIEW_DISTANCE = 4           # [功能 11] 玩家周圍保持載入的半徑 (區塊)
+UNLOAD_MARGIN = 2           # 滯後區間：超出半徑這麼多才卸載，避免邊界來回抖動
+INTEGRATE_BUDGET_MS = 2.0   # 每幀把新區塊併入世界的時間上限
+
+class GameXChunkStreamer:
+    """
+    [功能 11, 44] 建立在 GameXWorldGen.request_chunk 之上的區塊串流管理。
+    在玩家周圍維持一圈已載入的區塊，完成的區塊依時間預算逐幀併入 world_map。
+    """
+    def __init__(self, world_gen, world_map, radius=VIEW_DISTANCE,
+                 unload_margin=UNLOAD_MARGIN, budget_ms=INTEGRATE_BUDGET_MS):
+        self.world_gen = world_gen
+        self.world_map = world_map
+        self.radius = radius
+        self.unload_margin = unload_margin
+        self.budget_ms = budget_ms
+
+        self.center = None
+        self.ready = {}          # 生成完成、等待併入的區塊
+        self.sync_queue = []     # 沒有工作行程時，留到時間預算內同步生成
+        self.on_load = []        # 區塊併入後的回呼 fn(chunk)
+        self.on_unload = []      # 區塊卸載後的回呼 fn(chunk)
+
+        # 統計數據
+        self.integrated = 0
+        self.unloaded = 0
+        self.last_integrate_ms = 0.0
+
+    # --- 範圍計算 ---
+    def _offsets(self, radius):
+        """半徑內的區塊偏移，由近到遠排序"""
+        r2 = radius * radius
+        offsets = [(dx, dz) for dx in range(-radius, radius + 1)
+                   for dz in range(-radius, radius + 1) if dx * dx + dz * dz <= r2]
+        return sorted(offsets, key=lambda o: o[0] * o[0] + o[1] * o[1])
+
+    def _distance2(self, key):
+        dx, dz = key[0] - self.center[0], key[1] - self.center[1]
+        return dx * dx + dz * dz
+
+    def set_radius(self, radius):
+        """改變載入半徑 (下次 update 時生效)"""
+        if radius != self.radius:
+            self.radius = radius
+            self.center = None
+
+    # --- 每幀更新 ---
+    def update(self, pos):
+        cx, cz = int(pos[0] // CHUNK_SIZE), int(pos[2] // CHUNK_SIZE)
+        if (cx, cz) != self.center:
+            self.center = (cx, cz)
+            self._refresh()
+
+        keep2 = (self.radius + self.unload_margin) ** 2
+        for chunk in self.world_gen.collect_chunks():
+            key = (chunk.cx, chunk.cz)
+            if self._distance2(key) <= keep2 and key not in self.world_map.chunks:
+                self._set_ready(key, chunk)
+        self.integrate()
+
+    def _refresh(self):
+        """玩家換區塊時：排入缺少的區塊，卸載超出滯後範圍的區塊"""
+        keep = self.radius + self.unload_margin
+        keep2 = keep * keep
+        workers = self.world_gen.workers
+        if workers is not None:
+            workers.set_center(*self.center, max_distance=keep)
+
+        # 1. 卸載 (只有超過 radius + margin 才會卸載)
+        for key in [k for k in self.world_map.chunks if self._distance2(k) > keep2]:
+            chunk = self.world_map.remove_chunk(*key)
+            self.world_gen.chunks.unpin(key) # 卸載後才允許快取淘汰
+            self.unloaded += 1
+            for fn in self.on_unload:
+                fn(chunk)
+        for key in [k for k in self.ready if self._distance2(k) > keep2]:
+            del self.ready[key]
+            self.world_gen.chunks.unpin(key)
+
+        # 2. 請求半徑內缺少的區塊 (由近到遠)
+        self.sync_queue = []
+        for dx, dz in self._offsets(self.radius):
+            key = (self.center[0] + dx, self.center[1] + dz)
+            if key in self.world_map.chunks or key in self.ready:
+                continue
+            # 快取或存檔裡有就直接用，否則排入背景生成
+            chunk = self.world_gen.request_chunk(*key, block=False)
+            if chunk is not None:
+                self._set_ready(key, chunk)
+            elif workers is None:
+                self.sync_queue.append(key)
+
+    # --- 併入 (有時間預算) ---
+    def integrate(self):
+        """把完成的區塊依距離併入 world_map，超過每幀時間預算就留到下一幀"""
+        start = time.perf_counter()
+        deadline = start + self.budget_ms / 1000
+        for key in sorted(self.ready, key=self._distance2):
+            self._add(self.ready.pop(key))
+            if time.perf_counter() >= deadline:
+                break
+        while self.sync_queue and time.perf_counter() < deadline:
+            key = self.sync_queue.pop(0)
+            if key not in self.world_map.chunks:
+                self._add(self.world_gen.request_chunk(*key))
+        self.last_integrate_ms = (time.perf_counter() - start) * 1000
+
+    def generate_pending(self, budget_ms):
+        """
+        [功能 46] 還沒送進工作行程的請求改由主執行緒直接生成 (由近到遠)。
+        給啟動畫面這種主執行緒有空、工作行程還在暖機的時候用；回傳生成的數量。
+        """
+        workers = self.world_gen.workers
+        if workers is None or self.center is None:
+            return 0
+        deadline = time.perf_counter() + budget_ms / 1000
+        done = 0
+        for key in sorted(workers.pending, key=self._distance2):
+            if time.perf_counter() >= deadline:
+                break
+            self._set_ready(key, self.world_gen.request_chunk(*key)) # 同步生成會取消工作行程的請求
+            done += 1
+        return done
+
+    def _set_ready(self, key, chunk):
+        """等待併入的區塊也要釘選，不然快取可能先把它淘汰 (之後的修改就不會被存檔)"""
+        self.ready[key] = chunk
+        self.world_gen.chunks.pin(key)
+
+    def _add(self, chunk):
+        key = (chunk.cx, chunk.cz)
+        self.world_map.add_chunk(chunk)
+        cache = self.world_gen.chunks
+        cache.pin(key)
+        if cache.get(key) is not chunk: # 釘選前就被淘汰了：放回快取，save_dirty 才看得到它
+            cache[key] = chunk
+        self.integrated += 1
+        for fn in self.on_load:
+            fn(chunk)
+
+    def load_now(self, cx, cz):
+        """同步載入單一區塊 (例如出生點)"""
+        chunk = self.world_gen.request_chunk(cx, cz)
+        if (cx, cz) not in self.world_map.chunks:
+            self.ready.pop((cx, cz), None)
+            self._add(chunk)
+        return chunk
+
+    # --- 監控數據 ---
+    @property
+    def loaded_count(self):
+        return len(self.world_map.chunks)
+
+    @property
+    def pending_count(self):
+        queued = 0
+        if self.world_gen.workers is not None:
+            stats = self.world_gen.workers.stats()
+            queued = stats["queue_depth"] + stats["in_flight"]
+        return queued + len(self.ready) + len(self.sync_queue)
+
+    def stats(self):
+        return {
+            "loaded": self.loaded_count,
+            "pending": self.pending_count,
+            "ready": len(self.ready),
+            "integrated": self.integrated,
+            "unloaded": self.unloaded,
+            "integrate_ms": self.last_integrate_ms,
+        }
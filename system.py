@@ -2,6 +2,14 @@ import pygame
 import time
 import threading
 import os
+from collections import deque
+from mods import GameXEventBus, CommandEvent, MOD_BUDGET_MS
+
+# --- [功能 46] 啟動畫面常數 ---
+SPLASH_MIN_TIME = 1.0   # 啟動畫面至少顯示幾秒
+SPLASH_FADE_TIME = 0.5  # Logo 淡入時間 (秒)
+SPLASH_TIMEOUT = 15.0   # 載入再久也不會卡在啟動畫面超過這個時間 (秒)
+SPLASH_FPS = 60
 
 class GameXSystem:
     def __init__(self, engine):
@@ -10,6 +18,7 @@ class GameXSystem:
         # --- [功能 48] 性能設置 ---
         self.fps_cap = 60
         self.is_loading = False
+        self.load_queue = deque()   # [功能 44] 載入中時排隊的任務
         self.last_error = None
         
         # --- [功能 45] 指令台系統 ---
@@ -18,11 +27,16 @@ class GameXSystem:
         
         # --- [功能 49] 日誌路徑 ---
         self.log_file = "game_x_log.txt"
+
+        # --- [功能 50] Mod 事件匯流排 ---
+        self.events = GameXEventBus()
     
     # --- [功能 46] 自定義啟動畫面 (取代 Pygame Logo) ---
-    def show_splash_screen(self, screen, logo_path="logo.png"):
+    def show_splash_screen(self, screen, logo_path="logo.png", ready=None, min_time=SPLASH_MIN_TIME):
         """
-        顯示你的專屬 Logo。改為純白色背景，並修正變數未定義問題。
+        顯示你的專屬 Logo (白色背景淡入)。
+        不再空等：每一幀都會呼叫 ready() 做一點載入工作 (例如出生點區塊)，
+        顯示滿 min_time 秒且 ready() 回傳 True 就結束。回傳顯示的秒數。
         """
         screen_w, screen_h = screen.get_size()
         logo_exists = os.path.exists(logo_path) # ✅ 先定義變數
@@ -32,23 +46,31 @@ class GameXSystem:
             # 自動縮放 Logo 以適應螢幕 (假設你想要 400x400)
             logo = pygame.transform.smoothscale(logo, (400, 400))
             rect = logo.get_rect(center=(screen_w // 2, screen_h // 2))
-            
-            # 淡入效果 (Fade In)
-            for alpha in range(0, 255, 4):
-                screen.fill((255, 255, 255)) # ✅ 背景改為白色
-                logo.set_alpha(alpha)
-                screen.blit(logo, rect)
-                pygame.display.flip()
-                pygame.time.delay(10)
-            time.sleep(1.2) # 展示時間
         else:
             # ✅ 如果沒有 Logo，在白色背景上顯示黑色文字提示
             font = pygame.font.SysFont("Arial", 32)
-            text = font.render("GAME X ENGINE STARTING...", True, (50, 50, 50))
+            logo = font.render("GAME X ENGINE STARTING...", True, (50, 50, 50))
+            rect = logo.get_rect(center=(screen_w // 2, screen_h // 2))
+
+        clock = pygame.time.Clock()
+        start = time.perf_counter()
+        while True:
+            elapsed = time.perf_counter() - start
+            done = ready() if ready is not None else True
+            if (done and elapsed >= min_time) or elapsed >= SPLASH_TIMEOUT:
+                break
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.engine.is_running = False
+                    return elapsed
+
+            # 淡入效果 (Fade In)，依實際經過時間計算透明度
             screen.fill((255, 255, 255)) # ✅ 背景改為白色
-            screen.blit(text, (screen_w//2 - 180, screen_h//2))
+            logo.set_alpha(min(255, int(255 * elapsed / SPLASH_FADE_TIME)))
+            screen.blit(logo, rect)
             pygame.display.flip()
-            time.sleep(1)
+            clock.tick(SPLASH_FPS)
+        return time.perf_counter() - start
 
     # --- [功能 42 & 43] 核心渲染優化 (Culling) ---
     def check_occlusion(self, world_map, pos, direction):
@@ -64,20 +86,29 @@ class GameXSystem:
     def load_data_async(self, target_func, *args):
         """
         在後台執行繁重的任務（如生成大地圖），不卡住主線程。
+        載入中時送進來的任務會排隊，不再被丟棄。(區塊生成請改用 GameXChunkWorkers)
         """
+        self.load_queue.append((target_func, args))
         if not self.is_loading:
             self.is_loading = True
-            t = threading.Thread(target=self._wrapper, args=(target_func, *args))
+            t = threading.Thread(target=self._wrapper)
             t.daemon = True # 隨主程式一起關閉
             t.start()
 
-    def _wrapper(self, func, *args):
-        try:
-            func(*args)
-        except Exception as e:
-            self.log_error(f"Async Error: {e}")
-        finally:
-            self.is_loading = False
+    def _wrapper(self):
+        while True:
+            try:
+                func, args = self.load_queue.popleft()
+            except IndexError:
+                self.is_loading = False
+                if not self.load_queue: # 再確認一次，避免與 load_data_async 競爭
+                    return
+                self.is_loading = True
+                continue
+            try:
+                func(*args)
+            except Exception as e:
+                self.log_error(f"Async Error: {e}")
 
     # --- [功能 45] 開發者指令執行器 ---
     def run_command(self, cmd_string):
@@ -95,8 +126,57 @@ class GameXSystem:
                 self.log_error(f"Teleported to {parts[1:]}")
             elif cmd == "/screenshot":
                 self.save_screenshot(self.engine.screen)
-        except ValueError:
-            self.log_error("Invalid command arguments.")
+            elif cmd in ("/fill", "/replace", "/clone"):
+                # 大範圍編輯: /fill x1 y1 z1 x2 y2 z2 方塊、/replace ... 舊 新、/clone ... 目的地x y z
+                needed = {"/fill": 8, "/replace": 9, "/clone": 10}[cmd]
+                if len(parts) < needed:
+                    raise ValueError(f"{cmd} needs {needed - 1} arguments")
+                p1 = tuple(int(v) for v in parts[1:4])
+                p2 = tuple(int(v) for v in parts[4:7])
+                edit = self.engine.world_edit
+                if cmd == "/fill":
+                    changed = edit.fill(p1, p2, parts[7])
+                elif cmd == "/replace":
+                    changed = edit.replace(p1, p2, parts[7], parts[8])
+                else:
+                    changed = edit.clone(p1, p2, tuple(int(v) for v in parts[7:10]))
+                self.log_error(f"{cmd[1:].capitalize()}: {changed} blocks changed in {edit.last_ms:.0f} ms")
+            elif cmd == "/undo":
+                changed = self.engine.world_edit.undo()
+                self.log_error("Nothing to undo" if changed is None else f"Undo: {changed} blocks restored")
+            elif cmd == "/perf":
+                # 效能分析: /perf [on|off|overlay|檔名.json]，不加參數時匯出 trace
+                profiler = self.engine.profiler
+                arg = parts[1].lower() if len(parts) > 1 else None
+                if arg in ("on", "off"):
+                    profiler.enabled = arg == "on"
+                elif arg == "overlay":
+                    profiler.toggle_overlay()
+                else:
+                    path = profiler.export(parts[1] if arg else None)
+                    self.log_error(f"Perf trace ({profiler.stats()['spans']} spans) saved as {path}")
+            elif cmd == "/quality":
+                # 畫質: /quality [auto|等級]，不加參數時顯示目前的狀態
+                governor = self.engine.governor
+                arg = parts[1].lower() if len(parts) > 1 else None
+                if arg == "auto":
+                    governor.enabled = True
+                elif arg is not None:
+                    governor.enabled = False
+                    governor.set_level(int(arg))
+                self.log_error(governor.status())
+            elif cmd == "/mods":
+                # 各 mod 的累計成本
+                for name, s in self.events.stats().items():
+                    self.log_error(f"Mod {name}: {s['calls']} calls, {s['total_ms']:.1f} ms, max {s['max_ms']:.2f} ms, "
+                                   f"skipped {s['skipped']}, deferred {s['deferred']}, errors {s['errors']}")
+            else:
+                # 其他指令交給 mod 處理
+                event = self.events.emit(CommandEvent, cmd, parts[1:])
+                if event is None or not event.handled:
+                    self.log_error(f"Unknown command: {cmd}")
+        except ValueError as e:
+            self.log_error(f"Invalid command arguments: {e}")
 
     # --- [功能 47] 截圖功能 ---
     def save_screenshot(self, screen):
@@ -112,9 +192,13 @@ class GameXSystem:
             f.write(f"[{time.ctime()}] {message}\n")
 
     # --- [功能 50] 插件 Mod API 接口 ---
-    def register_mod(self, mod_func):
+    def register_mod(self, mod_func, name=None, budget_ms=MOD_BUDGET_MS):
         """
-        開放給外部 Python 腳本的掛鉤 (Hook)
+        開放給外部 Python 腳本的掛鉤 (Hook)。
+        mod_func(mod) 在註冊時呼叫一次，用 mod.on(事件型別, 函式) 訂閱事件；
+        每個 mod 每幀最多用 budget_ms 毫秒。
         """
-        print(f"Mod System: Registering {mod_func.__name__}")
-        # 在這裡可以把 mod 函數加入執行列表
\ No newline at end of file
+        mod = self.events.register_mod(name or mod_func.__name__, budget_ms)
+        print(f"Mod System: Registering {mod.name}")
+        mod_func(mod)
+        return mod
@@ -1,11 +1,50 @@
 import pygame
 import math
 import random
+import numpy as np
+from fluids import WATER, WATER_FLOWS
 
 # --- 視覺常數 ---
 FOG_MAX_DIST = 18    # [功能 22] 霧氣完全遮蔽距離
 WATER_ALPHA = 160    # [功能 23] 水的透明度 (0-255)
 
+# [功能 29] 方塊基本顏色 (尚未載入貼圖時使用)
+BLOCK_COLORS = {
+    "grass": (95, 159, 53),
+    "dirt": (134, 96, 67),
+    "stone": (125, 125, 125),
+    "sand": (219, 207, 163),
+    "wood": (102, 81, 51),
+    "leaves": (60, 130, 40),
+    "torch": (255, 200, 90),
+    WATER: (48, 96, 200),
+}
+BLOCK_COLORS.update((name, BLOCK_COLORS[WATER]) for name in WATER_FLOWS) # 流動的水同色
+DEFAULT_BLOCK_COLOR = (255, 0, 255)  # 未知方塊用洋紅色標示
+
+# [功能 21, 24] 建網格時烘焙進頂點的光照
+SUN_DIRECTION = (0.3, 0.9, 0.3)      # 太陽方向 (會正規化)
+MIN_SHADE = 0.4                      # 背光面的最低亮度
+AO_LEVELS = (0.5, 0.7, 0.85, 1.0)    # 頂點周圍被擋住 3/2/1/0 個方塊時的亮度
+FOG_STEPS = 64                       # [功能 22] 霧氣查表的距離分段數
+LIGHT_FALLOFF = 0.8                  # [功能 21] 光照等級每少一級，亮度乘上這個比例
+MIN_LIGHT = 0.08                     # 完全沒有光的地方也留一點亮度
+
+# [功能 28] 天空圖層 (預先畫好，跨過門檻才重畫)
+STAR_COUNT = 150
+STAR_ALPHA_STEPS = 16    # 星星亮度分成幾階，太陽高度跨過一階才重畫天空
+SKY_TOP_SHADE = 0.6      # 畫面頂端相對於地平線天空色的亮度
+
+def face_shades(sun_direction=SUN_DIRECTION):
+    """六個面方向 (+x, -x, +y, -y, +z, -z) 的方向光亮度，建網格時一次烘焙"""
+    sun = np.array(sun_direction) / np.linalg.norm(sun_direction)
+    dots = np.array([sun[0], -sun[0], sun[1], -sun[1], sun[2], -sun[2]])
+    return np.maximum(MIN_SHADE, dots)
+
+def light_levels():
+    """光照等級 0..15 對應的亮度倍率"""
+    return np.maximum(MIN_LIGHT, LIGHT_FALLOFF ** (15 - np.arange(16))).astype(np.float32)
+
 class GameXVisuals:
     def __init__(self, screen_w, screen_h):
         self.w = screen_w
@@ -13,8 +52,16 @@ class GameXVisuals:
         # [功能 30] FOV 視野調整 API
         self.fov = 600
         
-        # [功能 28] 初始化星空數據
-        self.stars = [(random.randint(0, self.w), random.randint(0, self.h)) for _ in range(150)]
+        # [功能 28] 初始化星空數據 (0-1 的相對座標，視窗縮放後位置不變)
+        self.stars = [(random.random(), random.random()) for _ in range(STAR_COUNT)]
+        self.sky_layers = {}   # 尺寸 -> (快取鍵, 天空陣列, pygame 表面)
+        self.sky_renders = 0
+
+        # [功能 22] 霧氣查表 (天空顏色改變才重建)
+        self.fog_dist = FOG_MAX_DIST   # 目前的霧距 (畫質調整會改)
+        self.fog_sky = None
+        self.fog_table = None
+        self.fog_rebuilds = 0
 
     # --- [功能 21] 動態光影 API (Directional Lighting) ---
     def get_shaded_color(self, base_color, normal, sun_pos):
@@ -26,9 +73,31 @@ class GameXVisuals:
     # --- [功能 22] 距離起霧 API (Distance Fog) ---
     def apply_fog(self, color, distance, sky_color):
         """將方塊顏色與背景色依距離混合"""
-        factor = min(1.0, distance / FOG_MAX_DIST)
+        factor = min(1.0, distance / self.fog_dist)
         return [int(color[i] * (1 - factor) + sky_color[i] * factor) for i in range(3)]
 
+    def get_fog_table(self, sky_color):
+        """
+        距離 -> 顏色查表 (FOG_STEPS, 256, 3)：table[距離分段, 原色值, 色版] = 混霧後的色值。
+        只有天空顏色改變時才重建，之後整批頂點只需要一次索引。
+        """
+        sky = tuple(sky_color)
+        if sky != self.fog_sky:
+            factor = np.arange(FOG_STEPS) / (FOG_STEPS - 1)
+            value = np.arange(256)
+            table = (value[None, :, None] * (1 - factor)[:, None, None] +
+                     np.array(sky)[None, None, :] * factor[:, None, None])
+            self.fog_table = np.rint(table).astype(np.uint8)
+            self.fog_sky = sky
+            self.fog_rebuilds += 1
+        return self.fog_table
+
+    def fog_colors(self, colors, distance, sky_color):
+        """批次起霧：colors (..., 3) uint8 與同形狀前綴的距離 (...)，回傳混霧後的 uint8 顏色"""
+        table = self.get_fog_table(sky_color)
+        step = np.minimum(FOG_STEPS - 1, (distance * ((FOG_STEPS - 1) / self.fog_dist) + 0.5).astype(np.intp))
+        return table[step[..., None], colors, np.arange(3)]
+
     # --- [功能 25] 動態水波 API (Water Waving) ---
     def get_water_offset(self, t, x, z):
         """讓水面方塊產生 Sine 波起伏"""
@@ -54,15 +123,51 @@ class GameXVisuals:
             pygame.draw.polygon(screen, (255, 255, 255), pts, 3)
 
     # --- [功能 28] 星空與天體 API ---
+    def star_level(self, sun_y):
+        """星星亮度階數 (0 = 白天看不到)"""
+        if sun_y >= 0:
+            return 0
+        return min(STAR_ALPHA_STEPS, int(-sun_y * STAR_ALPHA_STEPS + 0.5))
+
+    def get_sky_layer(self, size, sky_color, sun_y):
+        """
+        天空漸層加星空的預繪圖層 (w, h, 3) uint8。
+        只有尺寸、天空顏色或星星亮度階數改變時才重畫，其餘幀直接沿用。
+        """
+        key = (tuple(sky_color), self.star_level(sun_y))
+        cached = self.sky_layers.get(size)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        w, h = size
+        sky = np.array(sky_color, dtype=np.float32)
+        # 上半部由暗到亮，地平線以下與霧色 (天空色) 相同
+        t = np.minimum(1.0, np.arange(h) / max(1, h / 2 - 1))
+        shade = SKY_TOP_SHADE + (1 - SKY_TOP_SHADE) * t
+        layer = np.empty((w, h, 3), dtype=np.uint8)
+        layer[:] = np.rint(shade[:, None] * sky).astype(np.uint8)
+
+        if key[1]:
+            alpha = key[1] / STAR_ALPHA_STEPS
+            stars = np.array(self.stars)
+            sx = np.minimum(w - 1, (stars[:, 0] * w).astype(np.intp))
+            sy = np.minimum(h - 1, (stars[:, 1] * h).astype(np.intp))
+            base = layer[sx, sy].astype(np.float32)
+            layer[sx, sy] = np.rint(base + (255 - base) * alpha).astype(np.uint8)
+
+        self.sky_layers[size] = (key, layer, None)
+        self.sky_renders += 1
+        return layer
+
     def draw_celestial(self, screen, sky_color, sun_y):
-        # 畫星星 (只有晚上畫)
-        if sun_y < 0:
-            for star in self.stars:
-                alpha = int(abs(sun_y) * 255)
-                s = pygame.Surface((2, 2))
-                s.fill((255, 255, 255))
-                s.set_alpha(alpha)
-                screen.blit(s, star)
+        """把快取的天空圖層貼到 screen (星星只有晚上看得到)"""
+        size = screen.get_size()
+        layer = self.get_sky_layer(size, sky_color, sun_y)
+        key, _, surface = self.sky_layers[size]
+        if surface is None:
+            surface = pygame.surfarray.make_surface(layer)
+            self.sky_layers[size] = (key, layer, surface)
+        screen.blit(surface, (0, 0))
 
     # --- [功能 24] 環境光遮蔽 (AO) 模擬 ---
     def apply_ao(self, color, is_edge):
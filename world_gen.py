@@ -1,93 +1,267 @@
 import math
 import random
+import numpy as np
+from chunk_data import GameXChunk, CHUNK_SIZE, CHUNK_HEIGHT, CHUNK_MIN_Y, AIR
+from noise import GameXNoise, chunk_seed
+from chunk_cache import GameXChunkCache, CACHE_BUDGET
+from mods import ChunkGeneratedEvent
+from fluids import WATER
+from lighting import light_chunks
 
 # --- 地圖生成常數 (Generation Constants) ---
-CHUNK_SIZE = 8          # [功能 11] 區塊大小
 SEA_LEVEL = 0           # [功能 20] 水面高度
-CAVE_THRESHOLD = 0.1    # [功能 16] 洞穴生成閾值
+CAVE_THRESHOLD = 0.03   # [功能 16] 3D 雜訊絕對值低於此閾值的地方挖空成洞穴 (約一成地底)
+CAVE_SCALE = 1 / 14     # [功能 16] 洞穴雜訊頻率
+CAVE_STEP = 4           # [功能 16] 洞穴雜訊取樣間距 (其餘格子三線性內插)
+TERRAIN_SCALE = 1 / 48  # [功能 12] 地形起伏頻率
+TERRAIN_AMPLITUDE = 8   # [功能 12] 一般地形振幅
+MOUNTAIN_AMPLITUDE = 14 # [功能 13] 山地額外振幅
+BIOME_SCALE = 1 / 160   # [功能 13] 生物群系雜訊頻率
+SOIL_DEPTH = 10         # [功能 19] 地表往下填充的厚度
+TREE_CHANCE = 0.01      # [功能 15] 每個森林地表格長樹的機率
+
+# 生成器使用的方塊，依序佔用每個區塊調色盤的 1..N 號
+GEN_PALETTE = ["grass", "sand", "dirt", "stone", "wood", "leaves", WATER]
+GEN_IDS = {name: i + 1 for i, name in enumerate(GEN_PALETTE)}
 
 class GameXWorldGen:
-    def __init__(self, seed=12345):
+    def __init__(self, seed=12345, cache_budget=CACHE_BUDGET):
         # [功能 14] 隨機種子系統
         self.seed = seed
         self.random_gen = random.Random(seed)
         
-        # 儲存已生成的區塊數據
-        self.chunks = {} 
+        # 儲存已生成的區塊數據 (有記憶體預算的 LRU 快取)
+        self.chunks = GameXChunkCache(cache_budget)
         self.biomes = ["forest", "desert", "mountains"] # [功能 13] 生物群系
 
-    # --- [功能 12] 簡易雜訊演算法 (Simulated Perlin Noise) ---
+        # [功能 12, 13, 16] 各自獨立的雜訊場 (只依賴 seed，跨區塊連續)
+        self.height_noise = GameXNoise(seed, salt=1)
+        self.biome_noise = GameXNoise(seed, salt=2)
+        self.cave_noise = GameXNoise(seed, salt=3)
+
+        # [功能 44] 背景生成行程池 (start_workers 後才啟用)
+        self.workers = None
+        # [功能 40] 區塊存檔 (attach_store 後才啟用)
+        self.store = None
+        # [功能 50] Mod 事件匯流排 (選用)
+        self.events = None
+
+    # --- [功能 13] 生物群系 API ---
+    def get_biome_map(self, xs, zs):
+        """回傳每個 (x, z) 欄位的群系索引 (對應 self.biomes) 與原始群系雜訊值"""
+        b = self.biome_noise.fbm2(np.multiply(xs, BIOME_SCALE), np.multiply(zs, BIOME_SCALE), octaves=2)
+        biome = np.zeros(np.shape(b), dtype=np.int8)   # forest
+        biome[b < -0.15] = 1                           # desert
+        biome[b > 0.15] = 2                            # mountains
+        return biome, b
+
+    # --- [功能 12] 柏林雜訊地形 (Perlin Noise) ---
+    def get_height_map(self, xs, zs, biome_noise=None):
+        """批次計算整片欄位的地表高度，確保平滑過渡"""
+        xs, zs = np.asarray(xs, dtype=np.float64), np.asarray(zs, dtype=np.float64)
+        b = self.get_biome_map(xs, zs)[1] if biome_noise is None else biome_noise
+        h = self.height_noise.fbm2(xs * TERRAIN_SCALE, zs * TERRAIN_SCALE, octaves=4) * TERRAIN_AMPLITUDE
+        # 山地：群系雜訊越高，山脊疊加越多
+        weight = np.clip((b - 0.05) / 0.2, 0.0, 1.0)
+        ridge = 1.0 - np.abs(self.height_noise.noise2(xs / 32 + 100.5, zs / 32 + 100.5))
+        h = h + ridge * MOUNTAIN_AMPLITUDE * weight
+        top = CHUNK_MIN_Y + CHUNK_HEIGHT - 6   # 保留樹木的高度空間
+        return np.clip(np.floor(h), CHUNK_MIN_Y + SOIL_DEPTH, top).astype(np.int64)
+
+    # --- [功能 16] 3D 洞穴遮罩 ---
+    def get_cave_mask(self, origins, y0, y1):
+        """
+        回傳多個區塊在 y0..y1 範圍內的洞穴遮罩 (N, CHUNK_SIZE, y1 - y0 + 1, CHUNK_SIZE)。
+        雜訊只在對齊世界座標的粗網格上取樣再內插，相鄰區塊的邊界完全一致。
+        """
+        origins = np.asarray(origins, dtype=np.int64).reshape(-1, 2)
+        gy0 = (y0 // CAVE_STEP) * CAVE_STEP
+        gy1 = -(-y1 // CAVE_STEP) * CAVE_STEP
+        steps = np.arange(0, CHUNK_SIZE + 1, CAVE_STEP)
+        gx = origins[:, 0, None, None, None] + steps[None, :, None, None]
+        gy = np.arange(gy0, gy1 + 1, CAVE_STEP)[None, None, :, None]
+        gz = origins[:, 1, None, None, None] + steps[None, None, None, :]
+        n = self.cave_noise.fbm3(gx * CAVE_SCALE, gy * CAVE_SCALE * 1.5, gz * CAVE_SCALE)
+
+        def lerp_axis(arr, offsets, axis):
+            i0 = offsets // CAVE_STEP
+            shape = [1, 1, 1, 1]
+            shape[axis] = -1
+            t = ((offsets % CAVE_STEP) / CAVE_STEP).reshape(shape)
+            lo = np.take(arr, i0, axis=axis)
+            hi = np.take(arr, np.minimum(i0 + 1, arr.shape[axis] - 1), axis=axis)
+            return lo + (hi - lo) * t
+
+        n = lerp_axis(n, np.arange(CHUNK_SIZE), 1)
+        n = lerp_axis(n, np.arange(CHUNK_SIZE), 3)
+        n = lerp_axis(n, np.arange(y0, y1 + 1) - gy0, 2)
+        return np.abs(n) < CAVE_THRESHOLD
+
     def get_noise_height(self, x, z):
         """根據座標計算地形高度，確保平滑過渡"""
-        # 使用多個正弦波疊加來模擬複雜地形
-        h = math.sin(x * 0.1 + self.seed) * 2
-        h += math.cos(z * 0.15 + self.seed) * 2
-        h += math.sin((x + z) * 0.05) * 4  # 大規模起伏
-        return int(h)
+        return int(self.get_height_map([x], [z])[0])
 
     # --- [功能 11] 區塊管理 API ---
-    def request_chunk(self, cx, cz):
-        """當玩家靠近時，動態生成區塊資料"""
-        chunk_key = (cx, cz)
-        if chunk_key in self.chunks:
-            return self.chunks[chunk_key]
+    def request_chunk(self, cx, cz, block=True):
+        """
+        當玩家靠近時，動態生成區塊資料。
+        block=False 時不在主執行緒生成：有工作行程就排入背景，回傳 None，完成後由 collect_chunks 取回。
+        """
+        chunk = self.lookup_chunk(cx, cz)
+        if chunk is not None:
+            return chunk
+
+        if not block:
+            if self.workers is not None:
+                self.workers.request(cx, cz)
+            return None
+        if self.workers is not None:
+            self.workers.cancel(cx, cz)
         
         # 如果沒生成過，就「農」出一個新的
         return self.generate_chunk(cx, cz)
 
+    def lookup_chunk(self, cx, cz):
+        """只查快取與存檔，不生成"""
+        chunk = self.chunks.get((cx, cz))
+        if chunk is None and self.store is not None:
+            chunk = self.store.load_chunk(cx, cz)
+            if chunk is not None:
+                self.chunks[(cx, cz)] = chunk
+        return chunk
+
+    # --- [功能 40] 存檔 API ---
+    def attach_store(self, store):
+        """掛上 region 存檔：快取淘汰未存檔的區塊時直接寫進存檔"""
+        self.store = store
+        self.chunks.spill = lambda chunk: store.save_dirty([chunk])
+
+    def save_dirty(self, background=True):
+        """增量存檔：寫入快取內所有上次存檔後改動過的區塊"""
+        if self.store is None:
+            return 0
+        return self.store.save_dirty(list(self.chunks.values()), background)
+
+    # --- [功能 44] 背景生成 API ---
+    def start_workers(self, workers=None):
+        """啟動區塊生成行程池 (預設使用所有核心)"""
+        if self.workers is None:
+            from chunk_workers import GameXChunkWorkers # 用到才載入 multiprocessing
+            self.workers = GameXChunkWorkers(self.seed, workers)
+        return self.workers
+
+    def collect_chunks(self):
+        """取回背景生成完成的區塊，放進快取並回傳"""
+        if self.workers is None:
+            return []
+        done = []
+        for chunk in self.workers.poll():
+            key = (chunk.cx, chunk.cz)
+            if key in self.chunks: # 期間已被同步生成
+                continue
+            if self.store is not None and self.store.has_chunk(*key):
+                chunk = self.store.load_chunk(*key) # 存檔優先於重新生成
+            elif self.events is not None: # 工作行程生成的區塊在主執行緒發出事件
+                version = chunk.version
+                self.events.emit(ChunkGeneratedEvent, chunk)
+                if chunk.version != version: # mod 改了方塊：工作行程算的光照作廢，併入時重算
+                    chunk.lit = False
+            self.chunks[key] = chunk
+            done.append(chunk)
+        return done
+
+    def stop_workers(self):
+        if self.workers is not None:
+            self.workers.shutdown()
+            self.workers = None
+
     def generate_chunk(self, cx, cz):
         """[功能 11, 12, 13, 15, 16, 19] 核心生成邏輯"""
-        new_chunk_data = {}
-        
-        # 決定這個區塊的群系 [功能 13]
-        biome = self.random_gen.choice(self.biomes)
-
-        for x in range(cx * CHUNK_SIZE, (cx + 1) * CHUNK_SIZE):
-            for z in range(cz * CHUNK_SIZE, (cz + 1) * CHUNK_SIZE):
-                # 1. 獲取地表高度 [功能 12]
-                base_h = self.get_noise_height(x, z)
-                
-                # 2. 填充方塊層次 [功能 19]
-                for y in range(base_h - 10, base_h + 1):
-                    # [功能 16] 洞穴系統：使用隨機機率在地底挖空
-                    if y < base_h - 2 and self.random_gen.random() < CAVE_THRESHOLD:
-                        continue # 留空，形成洞穴
-                    
-                    # 決定方塊類型
-                    if y == base_h:
-                        block_type = "grass" if biome == "forest" else "sand"
-                    elif y > base_h - 3:
-                        block_type = "dirt"
-                    else:
-                        block_type = "stone" # 深處是石頭 [功能 19]
-                        
-                    new_chunk_data[(x, y, z)] = block_type
-
-                # 3. 自動種樹 [功能 15]
-                if biome == "forest" and self.random_gen.random() < 0.01:
-                    self.add_tree(new_chunk_data, x, base_h + 1, z)
-
-        self.chunks[(cx, cz)] = new_chunk_data
-        return new_chunk_data
+        return self.generate_chunks([(cx, cz)])[0]
+
+    def generate_chunks(self, keys):
+        """
+        一次生成多個區塊：高度、群系與洞穴遮罩全部在同一次陣列運算中完成。
+        每個區塊的內容只取決於 (seed, cx, cz)，與請求順序無關 [功能 14]。
+        """
+        keys = [(int(cx), int(cz)) for cx, cz in keys]
+        origins = np.array(keys, dtype=np.int64).reshape(-1, 2) * CHUNK_SIZE
+        n = len(keys)
+        lx = np.arange(CHUNK_SIZE)
+        xs = np.broadcast_to(origins[:, 0, None, None] + lx[None, :, None], (n, CHUNK_SIZE, CHUNK_SIZE))
+        zs = np.broadcast_to(origins[:, 1, None, None] + lx[None, None, :], (n, CHUNK_SIZE, CHUNK_SIZE))
+
+        # 1. 地表高度與群系 [功能 12, 13]
+        biome, biome_noise = self.get_biome_map(xs, zs)
+        heights = self.get_height_map(xs, zs, biome_noise)
+
+        ys = np.arange(CHUNK_MIN_Y, CHUNK_MIN_Y + CHUNK_HEIGHT)[None, None, :, None]
+        h = heights[:, :, None, :]
+
+        # 2. 填充方塊層次 [功能 19]
+        solid = (ys >= h - SOIL_DEPTH) & (ys <= h)
+
+        # [功能 16] 洞穴系統：3D 雜訊在地底挖空 (只算可能有洞穴的高度帶)
+        y0, y1 = int(heights.min()) - SOIL_DEPTH, int(heights.max()) - 3
+        band = slice(y0 - CHUNK_MIN_Y, y1 - CHUNK_MIN_Y + 1)
+        cave = self.get_cave_mask(origins, y0, y1)
+        solid[:, :, band, :] &= ~((ys[:, :, band, :] < h - 2) & cave)
+
+        # 生成用的方塊 ID 在每個區塊的調色盤裡都固定；水邊與水底的地表是沙
+        shore = heights <= SEA_LEVEL
+        surface = np.where((biome == 0) & ~shore, GEN_IDS["grass"], GEN_IDS["sand"])[:, :, None, :]
+        layers = np.where(ys == h, surface, np.where(ys > h - 3, GEN_IDS["dirt"], GEN_IDS["stone"]))
+        # [功能 20] 低於水面的地表上方填滿水源 (靜止的水不需要模擬)
+        fill = np.where((ys > h) & (ys <= SEA_LEVEL), GEN_IDS[WATER], AIR)
+        volume = np.where(solid, layers, fill).astype(np.uint8)
+
+        inner = np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=bool)
+        inner[1:-1, 1:-1] = True  # 樹葉不能超出區塊
+        result = []
+        for i, (cx, cz) in enumerate(keys):
+            chunk = GameXChunk(cx, cz)
+            for name in GEN_PALETTE:
+                chunk.block_id(name)
+            chunk.blocks[...] = volume[i]
+
+            # 3. 自動種樹 [功能 15]：亂數只看 (seed, cx, cz)
+            roll = np.random.default_rng(chunk_seed(self.seed, cx, cz)).random((CHUNK_SIZE, CHUNK_SIZE))
+            for tx, tz in zip(*np.nonzero((roll < TREE_CHANCE) & (biome[i] == 0) & ~shore[i] & inner)):
+                self.add_tree(chunk, int(xs[i, tx, tz]), int(heights[i, tx, tz]) + 1, int(zs[i, tx, tz]))
+
+            chunk.recount()
+            chunk.modified = chunk.unsaved = False # 生成結果可由種子重現，不算玩家改動
+            if self.events is not None: # [功能 50] mod 可以在併入世界前修改區塊
+                self.events.emit(ChunkGeneratedEvent, chunk)
+            result.append(chunk)
+
+        # 4. 區塊內部的天空光與方塊光 [功能 21] (在 mod 修改之後)
+        light_chunks(result)
+        for chunk in result:
+            self.chunks[(chunk.cx, chunk.cz)] = chunk
+        return result
 
     # --- [功能 15] 樹木生成演算法 ---
     def add_tree(self, chunk_data, x, y, z):
         """在指定座標種下一棵由木頭與葉子組成的樹"""
         # 樹幹 (Trunk)
         for i in range(3):
-            chunk_data[(x, y + i, z)] = "wood"
-        # 樹葉 (Leaves)
+            if chunk_data.in_bounds((x, y + i, z)):
+                chunk_data[(x, y + i, z)] = "wood"
+        # 樹葉 (Leaves)：超出區塊邊界的部分略過
         for lx in range(-1, 2):
             for lz in range(-1, 2):
-                chunk_data[(x + lx, y + 3, z + lz)] = "leaves"
+                if chunk_data.in_bounds((x + lx, y + 3, z + lz)):
+                    chunk_data[(x + lx, y + 3, z + lz)] = "leaves"
 
     # --- [功能 17, 18] 環境數據 API ---
     def get_environment_state(self, game_time):
-        """回傳當前時間的天空顏色與雲朵位置"""
+        """回傳當前時間的天空顏色、太陽高度與雲朵位置"""
         # 這裡可以根據時間計算晝夜顏色
         day_progress = (game_time % 60) / 60
         return {
             "sky_color": self.calculate_sky(day_progress),
+            "sun_y": math.sin((day_progress - 0.25) * 2 * math.pi), # [功能 28] 白天為正、晚上為負
             "cloud_offset": game_time * 0.5 # [功能 18] 雲朵移動速度
         }
 
@@ -0,0 +1,244 @@
+import time
+import zlib
+from collections import deque
+import numpy as np
+from chunk_data import CHUNK_SIZE, CHUNK_HEIGHT, CHUNK_MIN_Y, AIR
+from fluids import FLUIDS
+from visuals import BLOCK_COLORS
+
+# --- 世界編輯常數 (World Edit Constants) ---
+EDIT_MAX_VOLUME = 8_000_000   # 單一指令最多改動的格數
+UNDO_DEPTH = 32               # 最多保留幾個可以復原的指令
+UNDO_BUDGET = 64 << 20        # 復原紀錄最多佔用的記憶體 (bytes，壓縮後)
+LIGHT_MARGIN = 2              # 重算光照時往外多算幾圈區塊 (光最多傳 14 格 < 2 個區塊)
+
+AIR_NAMES = {"air", "none"}
+
+def _box(p1, p2):
+    """兩個角落 (含) 正規化成 (最小角, 最大角)，y 限制在區塊高度內"""
+    lo = [min(a, b) for a, b in zip(p1, p2)]
+    hi = [max(a, b) for a, b in zip(p1, p2)]
+    lo[1], hi[1] = max(lo[1], CHUNK_MIN_Y), min(hi[1], CHUNK_MIN_Y + CHUNK_HEIGHT - 1)
+    if lo[1] > hi[1]:
+        raise ValueError("Region is outside the world height")
+    volume = (hi[0] - lo[0] + 1) * (hi[1] - lo[1] + 1) * (hi[2] - lo[2] + 1)
+    if volume > EDIT_MAX_VOLUME:
+        raise ValueError(f"Region too large ({volume} blocks, max {EDIT_MAX_VOLUME})")
+    return tuple(lo), tuple(hi)
+
+def _check_block(name):
+    """指令裡的方塊名稱必須是已知的方塊或空氣 (打錯字不會寫出一整片新的未知方塊)"""
+    if name.lower() not in AIR_NAMES and name not in BLOCK_COLORS:
+        raise ValueError(f"Unknown block: {name}")
+
+def _chunk_regions(lo, hi):
+    """
+    範圍 [lo, hi] 跨過的每個區塊：((cx, cz), 區塊內的三個 slice, 這塊在範圍陣列裡的三個 slice)
+    """
+    S = CHUNK_SIZE
+    ys = slice(lo[1] - CHUNK_MIN_Y, hi[1] - CHUNK_MIN_Y + 1)
+    box_ys = slice(0, hi[1] - lo[1] + 1)
+    for cx in range(lo[0] // S, hi[0] // S + 1):
+        x0, x1 = max(lo[0], cx * S), min(hi[0], cx * S + S - 1)
+        for cz in range(lo[2] // S, hi[2] // S + 1):
+            z0, z1 = max(lo[2], cz * S), min(hi[2], cz * S + S - 1)
+            local = (slice(x0 - cx * S, x1 - cx * S + 1), ys, slice(z0 - cz * S, z1 - cz * S + 1))
+            box = (slice(x0 - lo[0], x1 - lo[0] + 1), box_ys, slice(z0 - lo[2], z1 - lo[2] + 1))
+            yield (cx, cz), local, box
+
+
+class GameXWorldEdit:
+    """
+    [功能 45] 大範圍編輯指令 (/fill、/replace、/clone、/undo)。
+    每個區塊只做一次陣列切片寫入，不經過逐格的 dict 介面；
+    每個受影響的區塊每個指令只通知一次 (網格重建)，光照整區重算一次，流體只排程範圍邊緣。
+    改動前的方塊 ID 以區塊為單位壓縮存進復原紀錄。
+    """
+    def __init__(self, world_map):
+        self.world_map = world_map
+        self.on_change = []       # 方塊改變的區塊 fn(cx, cz)，例如標記網格重建
+        self.lighting = None      # [功能 21] 選用的 GameXLighting
+        self.fluids = None        # [功能 20] 選用的 GameXFluids
+        self.journal = deque()    # [(指令名稱, [(區塊鍵, 區塊內 slice, dtype, 壓縮的舊 ID)], bytes)]
+        self.journal_bytes = 0
+
+        # 統計數據
+        self.commands = 0
+        self.blocks_changed = 0
+        self.last_ms = 0.0
+
+    # --- 指令 ---
+    def fill(self, p1, p2, name):
+        """把範圍內全部設成 name ("air" 代表清空)，回傳改變的格數"""
+        _check_block(name)
+        lo, hi = _box(p1, p2)
+        def ids(chunk, view, box):
+            return self._block_id(chunk, name)
+        return self._apply("fill", lo, hi, ids)
+
+    def replace(self, p1, p2, old, new):
+        """把範圍內的 old 方塊換成 new，回傳改變的格數"""
+        _check_block(old)
+        _check_block(new)
+        lo, hi = _box(p1, p2)
+        def ids(chunk, view, box):
+            if old.lower() in AIR_NAMES:
+                old_id = AIR
+            elif old in chunk.palette_ids:
+                old_id = chunk.palette_ids[old]
+            else: # 這個區塊沒有 old 方塊
+                return None
+            return np.where(view == old_id, self._block_id(chunk, new), view)
+        return self._apply("replace", lo, hi, ids)
+
+    def clone(self, p1, p2, dest):
+        """把範圍 [p1, p2] 複製到以 dest 為最小角的位置 (重疊也沒問題)，回傳改變的格數"""
+        lo, hi = _box(p1, p2)
+        # 先把來源讀成共用調色盤的陣列 (-1 = 來源區塊沒載入，目的地保持原樣)
+        names = [None]
+        name_ids = {None: 0}
+        shape = tuple(h - l + 1 for l, h in zip(lo, hi))
+        source = np.full(shape, -1, dtype=np.int32)
+        for key, local, box in _chunk_regions(lo, hi):
+            chunk = self.world_map.chunks.get(key)
+            if chunk is None:
+                continue
+            lut = np.zeros(len(chunk.palette), dtype=np.int32)
+            for bid, block in enumerate(chunk.palette):
+                if block not in name_ids:
+                    name_ids[block] = len(names)
+                    names.append(block)
+                lut[bid] = name_ids[block]
+            source[box] = lut[chunk.blocks[local]]
+
+        offset = tuple(d - l for d, l in zip(dest, lo))
+        dst_lo, dst_hi = _box(tuple(l + o for l, o in zip(lo, offset)), tuple(h + o for h, o in zip(hi, offset)))
+        # 目的地被世界高度截掉的部分，來源也要跟著截
+        src_y0 = dst_lo[1] - (lo[1] + offset[1])
+        source = source[:, src_y0:src_y0 + dst_hi[1] - dst_lo[1] + 1]
+        def ids(chunk, view, box):
+            part = source[box]
+            lut = np.array([chunk.block_id(n) if n is not None else AIR for n in names], dtype=np.int64)
+            return np.where(part >= 0, lut[np.maximum(part, 0)], view)
+        return self._apply("clone", dst_lo, dst_hi, ids)
+
+    def undo(self):
+        """復原上一個指令，回傳復原的格數 (沒有可復原的指令時回傳 None)"""
+        if not self.journal:
+            return None
+        start = time.perf_counter()
+        label, entries, size = self.journal.pop()
+        self.journal_bytes -= size
+        changed, restored = 0, []
+        for entry in entries:
+            key, local, dtype, data = entry
+            chunk = self.world_map.chunks.get(key)
+            if chunk is None: # 已經卸載的區塊無法復原
+                continue
+            old = np.frombuffer(zlib.decompress(data), dtype=dtype).reshape(chunk.blocks[local].shape)
+            changed += chunk.write_region(local, old)
+            restored.append(entry)
+        if restored:
+            self._after_edit(restored, *self._bounds(restored))
+        self.blocks_changed += changed
+        self.last_ms = (time.perf_counter() - start) * 1000
+        return changed
+
+    # --- 共用流程 ---
+    def _block_id(self, chunk, name):
+        return AIR if name is None or name.lower() in AIR_NAMES else chunk.block_id(name)
+
+    def _apply(self, label, lo, hi, make_ids):
+        """
+        對範圍內每個已載入的區塊：算出新的 ID 陣列、存下舊的、一次寫入。
+        make_ids(chunk, 目前的 ID, 範圍陣列 slice) 回傳新 ID (純量或陣列)，None 代表略過這個區塊。
+        """
+        start = time.perf_counter()
+        entries, changed, size = [], 0, 0
+        for key, local, box in _chunk_regions(lo, hi):
+            chunk = self.world_map.chunks.get(key)
+            if chunk is None: # 沒載入的區塊不改
+                continue
+            ids = make_ids(chunk, chunk.blocks[local], box)
+            if ids is None:
+                continue
+            old = chunk.blocks[local].copy() # make_ids 可能讓調色盤升級，重新取一次
+            n = chunk.write_region(local, ids)
+            if not n:
+                continue
+            data = zlib.compress(old.tobytes(), 1)
+            entries.append((key, local, old.dtype.str, data))
+            size += len(data)
+            changed += n
+        if entries:
+            self._record(label, entries, size)
+            self._after_edit(entries, lo, hi)
+        self.commands += 1
+        self.blocks_changed += changed
+        self.last_ms = (time.perf_counter() - start) * 1000
+        return changed
+
+    def _record(self, label, entries, size):
+        self.journal.append((label, entries, size))
+        self.journal_bytes += size
+        while len(self.journal) > UNDO_DEPTH or (self.journal_bytes > UNDO_BUDGET and len(self.journal) > 1):
+            self.journal_bytes -= self.journal.popleft()[2]
+
+    @staticmethod
+    def _bounds(entries):
+        """復原紀錄涵蓋的世界座標範圍 (最小角, 最大角)"""
+        los, his = [], []
+        for (cx, cz), local, _, _ in entries:
+            los.append((cx * CHUNK_SIZE + local[0].start, local[1].start + CHUNK_MIN_Y, cz * CHUNK_SIZE + local[2].start))
+            his.append((cx * CHUNK_SIZE + local[0].stop - 1, local[1].stop - 1 + CHUNK_MIN_Y, cz * CHUNK_SIZE + local[2].stop - 1))
+        return tuple(np.min(los, axis=0).tolist()), tuple(np.max(his, axis=0).tolist())
+
+    def _after_edit(self, entries, lo, hi):
+        """每個改動過的區塊 (與改動碰到共用邊界的鄰居) 通知一次，光照整區重算，邊緣的水重新排程"""
+        keys = {entry[0] for entry in entries}
+        notify = set()
+        for (cx, cz), local, _, _ in entries:
+            dxs = [0] + [-1] * (local[0].start == 0) + [1] * (local[0].stop == CHUNK_SIZE)
+            dzs = [0] + [-1] * (local[2].start == 0) + [1] * (local[2].stop == CHUNK_SIZE)
+            notify.update((cx + dx, cz + dz) for dx in dxs for dz in dzs)
+        for key in notify:
+            for fn in self.on_change:
+                fn(*key)
+        if self.lighting is not None:
+            area = {(cx + dx, cz + dz) for cx, cz in keys
+                    for dx in range(-LIGHT_MARGIN, LIGHT_MARGIN + 1) for dz in range(-LIGHT_MARGIN, LIGHT_MARGIN + 1)}
+            self.lighting.relight_area(area)
+        if self.fluids is not None:
+            self._wake_fluids(lo, hi)
+
+    def _wake_fluids(self, lo, hi):
+        """範圍邊界內外各一層的水可能要流動 (範圍內部的水彼此平衡，不用排程)"""
+        outer_lo = (lo[0] - 1, max(lo[1] - 1, CHUNK_MIN_Y), lo[2] - 1)
+        outer_hi = (hi[0] + 1, min(hi[1] + 1, CHUNK_MIN_Y + CHUNK_HEIGHT - 1), hi[2] + 1)
+        for key, local, box in _chunk_regions(outer_lo, outer_hi):
+            chunk = self.world_map.chunks.get(key)
+            if chunk is None:
+                continue
+            fluid_ids = [bid for bid, name in enumerate(chunk.palette) if name in FLUIDS]
+            if not fluid_ids:
+                continue
+            found = np.isin(chunk.blocks[local], fluid_ids)
+            # 只留邊界兩層 (範圍陣列座標裡離邊緣 1 格以內)
+            idx = [np.arange(s.start, s.stop) for s in box]
+            shape = [h - l + 1 for l, h in zip(outer_lo, outer_hi)]
+            edge = [(i <= 1) | (i >= n - 2) for i, n in zip(idx, shape)]
+            found &= edge[0][:, None, None] | edge[1][None, :, None] | edge[2][None, None, :]
+            for lx, ly, lz in zip(*np.nonzero(found)):
+                self.fluids.block_changed((key[0] * CHUNK_SIZE + local[0].start + int(lx),
+                                           CHUNK_MIN_Y + local[1].start + int(ly),
+                                           key[1] * CHUNK_SIZE + local[2].start + int(lz)))
+
+    # --- 監控數據 ---
+    def stats(self):
+        return {
+            "commands": self.commands,
+            "blocks_changed": self.blocks_changed,
+            "undo_depth": len(self.journal),
+            "undo_bytes": self.journal_bytes,
+            "last_ms": self.last_ms,
+        }